@@ -1,107 +1,133 @@
-import pandas as pd
-from itertools import combinations
-from geopy.distance import geodesic
 import numpy as np
-from .utils import distances_table
+from .base import BaseSolver
+from .candidates import CandidateGraph, sparse_nearest_neighbour_tour
+from .local_search import get_local_search, improve_path
+from .shared import PackedMatrix
+from .tour import TOUR_DTYPE, tour_lengths
+from .utils import get_oracle, get_candidates
 
 
-class NearestNeighbour:
+def nearest_neighbour_tours(matrix, starts, stats=None) -> np.ndarray:
+    """
+    Nearest neighbour tours for a batch of start nodes at once
+    Each step is one masked argmin over the rows of the current nodes, O(k * n^2) in total
+    :param matrix: n x n distance matrix, a memory map or a PackedMatrix (the rows are read on demand)
+    :param starts: k start ids
+    :param stats: Instrumentation the operations are counted in
+    :return: k x (n + 1) int array of closed tours (start ... start)
+    """
+    if not isinstance(matrix, PackedMatrix):
+        matrix = np.asarray(matrix)
+    n = len(matrix)
+    starts = np.atleast_1d(np.asarray(starts, dtype=np.intp))
+    rows = np.arange(len(starts))
+    tours = np.empty((len(starts), n + 1), dtype=TOUR_DTYPE)
+    tours[:, 0] = tours[:, -1] = starts
+    visited = np.zeros((len(starts), n), dtype=bool)
+    visited[rows, starts] = True
+    current = starts
+    for step in range(1, n):
+        candidates = np.where(visited, np.inf, matrix[current])
+        current = np.argmin(candidates, axis=1)
+        visited[rows, current] = True
+        tours[:, step] = current
+    if stats is not None:
+        # every step reads the whole rows and compares all their entries
+        stats.count(distance_evaluations=len(starts) * n * (n - 1), comparisons=len(starts) * (n - 1) * (n - 1))
+    return tours
+
+
+def nearest_neighbour_tour(matrix, start, stats=None) -> np.ndarray:
+    """
+    Nearest neighbour tour from one start node
+    :param matrix: n x n distance matrix
+    :param start: start id
+    :param stats: Instrumentation the operations are counted in
+    :return: int array of the closed tour (start ... start)
+    """
+    return nearest_neighbour_tours(matrix, [start], stats)[0]
+
+
+def best_nearest_neighbour(matrix, starts=None, batch=256, stats=None):
+    """
+    The shortest nearest neighbour tour over the start nodes
+    :param matrix: n x n distance matrix
+    :param starts: start ids to try, all the nodes by default
+    :param batch: number of starts processed together (bounds the k x n working arrays)
+    :param stats: Instrumentation the operations are counted in
+    :return: the best closed tour as int array and its length
+    """
+    if not isinstance(matrix, PackedMatrix):
+        matrix = np.asarray(matrix)
+    starts = np.arange(len(matrix)) if starts is None else np.asarray(starts, dtype=np.intp)
+    best_tour, best_length = None, np.inf
+    for i in range(0, len(starts), batch):
+        tours = nearest_neighbour_tours(matrix, starts[i:i + batch], stats)
+        lengths = tour_lengths(matrix, tours)
+        k = np.argmin(lengths)
+        if stats is not None:
+            stats.count(distance_evaluations=lengths.size * (tours.shape[1] - 1), comparisons=lengths.size)
+        if lengths[k] < best_length:
+            best_tour, best_length = tours[k], float(lengths[k])
+    return best_tour, best_length
+
+
+class NearestNeighbour(BaseSolver):
     """
     Nearest neighbour algorithm implementation for Tradesman problem
     Returns necessary data via properties
     """
 
-    def __init__(self, nodes, start):
+    def __init__(self, nodes, start, oracle=None, candidates=None, local_search=None, instrumentation=None,
+                 starts=None, time_limit=10, workers=1):
         """
         Class constructor
         :param nodes: the list of nodes as DataFrame:
             index - city name
             columns - lat, long
-        :param start: the start point (is significant for the Nearest neighbour
+        :param start: the start point (is significant for the Nearest neighbour),
+            None - the best tour over all the start points
+        :param oracle: DistanceOracle built for the selection (is built from nodes if omitted)
+        :param candidates: CandidateGraph or the candidate list length k; the search runs
+            on the sparse graph then and the dense distance matrix is never built
+            (start None means the first node in this mode)
+        :param local_search: improvement stage run after the construction
+            (True, LocalSearch arguments as dict or LocalSearch object)
+        :param instrumentation: Instrumentation of the run (a new one by default,
+            True - a new one with the memory tracing)
+        :param starts: number of the start points of the multi-start run (multistart.multi_start:
+            the nearest neighbour tours improved by 2-opt / Or-opt from the spread starts, the first
+            one is start), None - a single construction; not used with the candidates
+        :param time_limit: wall-clock budget of the multi-start run, seconds
+        :param workers: number of processes of the multi-start run (None - all the cores)
         """
-        self.df = nodes
+        super().__init__(nodes, instrumentation)
         self.start = start
-        self._path = []
-        self._path_sequence = []
-        self._nodes_sequence = {}
-        self._distance = 0
-        self._complexity = 0
+        self.starts = starts
+        self.time_limit = time_limit
+        self.workers = workers
+        # MultiStartResult of the multi-start run
+        self.runs = None
 
         self.df = self.df.sort_values(by='city', ascending=True)
         self.df['city'] = self.df.index
-        self.distances = self.get_distances()
+        self._oracle = oracle
+        self.candidates = None
+        if candidates is not None:
+            with self.instrumentation.phase('candidates'):
+                self.candidates = get_candidates(self.df, candidates)
+                if not isinstance(candidates, CandidateGraph):
+                    self.instrumentation.count(distance_evaluations=self.candidates.neighbours.size)
+        self.local_search = get_local_search(local_search)
 
     @property
-    def complexity(self):
-        return self._complexity
-
-    @complexity.setter
-    def complexity(self, value):
-        raise Exception("The property is read only")
-
-    @complexity.getter
-    def complexity(self):
-        if self._complexity == 0:
-            self.get_scenario()
-        return self._complexity
-
-    @property
-    def distance(self):
-        return self._distance
-
-    @distance.setter
-    def distance(self, value):
-        raise Exception("The property is read only")
-
-    @distance.getter
-    def distance(self):
-        if self._distance == 0:
-            self.get_scenario()
-        return self._distance
+    def oracle(self):
+        self._oracle = get_oracle(self.df, self._oracle)
+        return self._oracle
 
     @property
-    def path(self):
-        return self._path
-
-    @path.setter
-    def path(self, value):
-        raise Exception("The property can't be set")
-
-    @path.getter
-    def path(self):
-        if not self._path:
-            self.get_scenario()
-        return self._path
-
-    @property
-    def path_sequence(self):
-        return self._path_sequence
-
-    @path_sequence.setter
-    def path_sequence(self, value):
-        raise Exception("The property can't be set")
-
-    @path_sequence.getter
-    def path_sequence(self):
-        if not self._path_sequence:
-            self.get_scenario()
-        return self._path_sequence
-
-    @property
-    def nodes_sequence(self):
-        if not self._path_sequence:
-            self.get_scenario()
-        return self._nodes_sequence
-
-    @nodes_sequence.setter
-    def nodes_sequence(self, value):
-        raise Exception("The property can't be set")
-
-    @nodes_sequence.getter
-    def nodes_sequence(self):
-        if not self._path_sequence:
-            self.get_scenario()
-        return self._nodes_sequence
+    def distances(self):
+        return self.get_distances()
 
     def neighbour(self, current, visited):
         """
@@ -110,62 +136,89 @@ class NearestNeighbour:
         :param visited: already visited nodes (excluded from the search list)
         :return:
         """
-        df1 = self.distances.loc[(self.distances['city1'] == current) & (
-            self.distances['city2'].isin([item for item in self.df.index if item not in visited]))].copy()
-        df2 = self.distances.loc[(self.distances['city2'] == current) & (
-            self.distances['city1'].isin([item for item in self.df.index if item not in visited]))].copy()
-        res = pd.Series(data=list(df1.dist) + list(df2.dist), index=list(df1['city2']) + list(df2['city1']))
-        self._complexity += len(res)
-        return res.idxmin()
+        mask = np.zeros(len(self.oracle), dtype=bool)
+        mask[self.oracle.ids(visited)] = True
+        candidates = np.where(mask, np.inf, self.oracle.matrix[self.oracle.index[current]])
+        self.instrumentation.count(distance_evaluations=len(mask), comparisons=len(mask) - 1)
+        return self.oracle.names[int(np.argmin(candidates))]
 
     def get_distances(self):
         """
-        Defines distances for all the cities combinations using geopy
-        :return: the DataFrame with distances
+        Defines distances for all the cities combinations
+        :return: the DataFrame with distances (long-form view of the oracle)
         """
-        cities = self.df.copy()
-        return distances_table(cities)
+        return self.oracle.df_dist
 
     def get_distance(self, city1, city2):
         """
-        Defines distance between the city1 and city2 using geopy
+        Defines distance between the city1 and city2
         :param city1: city 1
         :param city2: city 2
         :return:
         """
-        if len(self.distances) > 0:
-            df_loc = self.distances.loc[(self.distances['city1'] == city1) & (self.distances['city2'] == city2)].copy()
-            if len(df_loc) == 0:
-                df_loc = self.distances.loc[(self.distances['city1'] == city2) & (self.distances['city2'] == city1)].copy()
-            return df_loc.at[df_loc.index[0], 'dist']
-        else:
-            return 0
+        return self.oracle.distance(city1, city2)
 
     def find_path(self):
         """
         The main method which looks for the path
         :return:
         """
-        sequence = []
-        current = self.start
-        while len([self.start] + sequence) < len(self.df):
-            current = self.neighbour(current, [self.start] + sequence)
-            sequence.append(current)
-
-        return [self.start] + sequence + [self.start]
+        if self.candidates is not None:
+            start = 0 if self.start is None else self.df.index.get_loc(self.start)
+            tour = sparse_nearest_neighbour_tour(self.candidates, start, self.instrumentation)
+            return [self.df.index[i] for i in tour]
+        if self.starts is not None:
+            return self.multi_start_path()
+        if self.start is None:
+            tour, _ = best_nearest_neighbour(self.oracle.matrix, stats=self.instrumentation)
+        else:
+            tour = nearest_neighbour_tour(self.oracle.matrix, self.oracle.index[self.start], self.instrumentation)
+        return [self.oracle.names[i] for i in tour]
 
-    def get_scenario(self):
+    def multi_start_path(self):
         """
-        Updates all the properties basing on current df
-        :return:
+        The best tour of the multi-start run, from the start point if it is set
+        :return: closed path of the city names
         """
-        self._distance = 0
-        self._path = self.find_path()
-        self._path_sequence = {i: self._path[:i + 2] for i in range(len(self._path) - 1)}
-
-        self._nodes_sequence = {i: self._path[: i + 2] for i in range(len(self._path) - 2)}
-        self._nodes_sequence.update({len(self._nodes_sequence.keys()):
-                                         self._nodes_sequence[len(self._nodes_sequence.keys()) - 1]})
-
-        self._distance = np.sum([self.get_distance(self._path[i],
-                                                   self._path[i + 1]) for i in range(len(self._path) - 1)])
+        # multistart builds on the constructions of this module
+        from .multistart import multi_start, spread_starts
+        matrix = self.oracle.matrix
+        first = 0 if self.start is None else self.oracle.index[self.start]
+        self.runs = multi_start(matrix, starts=spread_starts(matrix, int(self.starts), first), variants=('nn+ls',),
+                                workers=self.workers, time_limit=self.time_limit, stats=self.instrumentation)
+        tour = self.runs.tour[:-1]
+        if self.start is not None:
+            tour = np.roll(tour, -int(np.flatnonzero(tour == first)[0]))
+        return [self.oracle.names[i] for i in tour] + [self.oracle.names[tour[0]]]
+
+    def _solve(self):
+        if self.candidates is None:
+            with self.instrumentation.phase('distances'):
+                if self._oracle is None:
+                    self.instrumentation.count(distance_evaluations=len(self.df) ** 2)
+                self._oracle = get_oracle(self.df, self._oracle)
+        with self.instrumentation.phase('construction'):
+            path = self.find_path()
+        path_sequence = {i: path[:i + 2] for i in range(len(path) - 1)}
+
+        nodes_sequence = {i: path[: i + 2] for i in range(len(path) - 2)}
+        nodes_sequence.update({len(nodes_sequence): nodes_sequence.get(len(nodes_sequence) - 1, path)})
+
+        # improvement stage, every accepted move is a frame
+        if self.local_search is not None:
+            with self.instrumentation.phase('local_search'):
+                if self.candidates is not None:
+                    path, frames = improve_path(self.local_search, path, self.df.index,
+                                                candidates=self.candidates, stats=self.instrumentation)
+                else:
+                    path, frames = improve_path(self.local_search, path, self.oracle.names,
+                                                matrix=self.oracle.matrix, stats=self.instrumentation)
+            for frame, changed in frames:
+                path_sequence.update({len(path_sequence): frame})
+                nodes_sequence.update({len(nodes_sequence): changed})
+
+        if self.candidates is not None:
+            distance = self.candidates.tour_length([self.df.index.get_loc(city) for city in path])
+        else:
+            distance = self.oracle.tour_length(path)
+        return self._result_of(path, distance, path_sequence, {step: [] for step in path_sequence}, nodes_sequence)
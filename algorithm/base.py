@@ -0,0 +1,103 @@
+import threading
+from collections import namedtuple
+from .instrumentation import get_instrumentation
+
+# outcome of a solver run, built once by solve() and never changed afterwards:
+# path - closed tour of the city names, distance - its length, km
+# path_sequence, second_path_sequence, nodes_sequence - animation frames by the step number
+# complexity - operations count, stats - Instrumentation.as_dict of the run
+# lower_bound, gap - optimality bound of the exact solver, None for the heuristics
+SolverResult = namedtuple('SolverResult', ['path', 'distance', 'path_sequence', 'second_path_sequence',
+                                           'nodes_sequence', 'complexity', 'stats', 'lower_bound', 'gap'],
+                          defaults=(None, None))
+
+
+class BaseSolver:
+    """
+    Common part of the solvers
+    The preparation (distances, candidates, MST) is done by the constructor, the
+    algorithm runs on the first solve() call only and its SolverResult is kept, the
+    properties are views of the result. The result is shared by all the callers and
+    must be treated as read-only.
+    """
+
+    def __init__(self, df, instrumentation=None):
+        """
+        Class constructor
+        :param df: DataFrame, index - city names, columns - lat, long
+        :param instrumentation: Instrumentation of the run (a new one by default,
+            True - a new one with the memory tracing)
+        """
+        self.df = df
+        self.instrumentation = get_instrumentation(instrumentation)
+        self._result = None
+        self._lock = threading.Lock()
+
+    def _solve(self) -> SolverResult:
+        """
+        Runs the algorithm, implemented by the solvers
+        """
+        raise NotImplementedError
+
+    def _result_of(self, path, distance, path_sequence, second_path_sequence, nodes_sequence, **kwargs):
+        """
+        SolverResult with the counters and the stats of the run
+        """
+        return SolverResult(path, distance, path_sequence, second_path_sequence, nodes_sequence,
+                            self.instrumentation.operations, self.instrumentation.as_dict(), **kwargs)
+
+    def solve(self) -> SolverResult:
+        """
+        Runs the algorithm once, the next calls return the same result
+        :return: SolverResult
+        """
+        if self._result is None:
+            with self._lock:
+                if self._result is None:
+                    self._result = self._solve()
+        return self._result
+
+    def get_scenario(self) -> SolverResult:
+        """
+        Alias of solve()
+        """
+        return self.solve()
+
+    @property
+    def solved(self):
+        return self._result is not None
+
+    @property
+    def result(self):
+        return self.solve()
+
+    @property
+    def path(self):
+        return self.solve().path
+
+    @property
+    def distance(self):
+        return self.solve().distance
+
+    @property
+    def complexity(self):
+        return self.solve().complexity
+
+    @property
+    def stats(self):
+        """
+        Operation counters, times and peak memory of the run (see Instrumentation.as_dict)
+        """
+        return self.solve().stats
+
+    @property
+    def path_sequence(self):
+        return self.solve().path_sequence
+
+    @property
+    def second_path_sequence(self):
+        return self.solve().second_path_sequence
+
+    @property
+    def nodes_sequence(self):
+        return self.solve().nodes_sequence
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+from .distances import DEFAULT_METRIC
+from .oracle import DistanceOracle
+from .shared import storage_options
+from .tiles import compute_matrix, open_matrix
+
+CACHE_DIR = os.environ.get('DISTANCE_CACHE', os.path.join(tempfile.gettempdir(), 'graphs2-distances'))
+# coordinates are rounded before hashing, 1e-7 degree is about 1 cm
+PRECISION = 7
+# matrices of the other catalogues (or of the older coordinates) kept on the disk
+MAX_ENTRIES = 4
+# matrix storage of the cache files (see shared.STORAGES)
+STORAGE = os.environ.get('DISTANCE_STORAGE', 'float64')
+
+
+def catalogue_key(names, lat, long, metric=DEFAULT_METRIC) -> str:
+    """
+    Hash of the catalogue: names, rounded coordinates and the metric
+    :param names: city names
+    :param lat: latitudes, degrees
+    :param long: longitudes, degrees
+    :param metric: distance metric name
+    :return: hex digest
+    """
+    digest = hashlib.sha256(metric.encode())
+    digest.update('\x00'.join(map(str, names)).encode())
+    digest.update(np.round(np.asarray(lat, dtype=np.float64), PRECISION).tobytes())
+    digest.update(np.round(np.asarray(long, dtype=np.float64), PRECISION).tobytes())
+    return digest.hexdigest()[:32]
+
+
+class DistanceCache:
+    """
+    On-disk store of the catalogue distance matrices
+    A matrix is computed once per catalogue and saved as .npy next to the list of the names,
+    the file name is the hash of the coordinates, so changed coordinates get a new matrix.
+    The matrix is opened memory-mapped read-only: the gunicorn workers share the pages,
+    and a selection is served by slicing (DistanceOracle.subset).
+    The float32 and the packed storages cut the file (and the mapped pages) to a half or a quarter.
+    A missing matrix is computed tile by tile straight into the file (see tiles.compute_matrix).
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_entries=MAX_ENTRIES, on_lookup=None, storage=STORAGE, workers=1,
+                 on_progress=None):
+        """
+        Class constructor
+        :param directory: cache folder, created if missing
+        :param max_entries: number of matrices kept, the least recently used are removed
+        :param on_lookup: callback(hit) called on every load
+        :param storage: 'float64', 'float32', 'packed' or 'packed32' (see shared.STORAGES)
+        :param workers: processes computing a missing matrix (None - all the cores)
+        :param on_progress: callback(done, total) called after every computed tile
+        """
+        storage_options(storage)
+        self.directory = directory
+        self.max_entries = max_entries
+        self.on_lookup = on_lookup
+        self.storage = storage
+        self.workers = workers
+        self.on_progress = on_progress
+
+    def paths(self, key):
+        return os.path.join(self.directory, f'{key}.npy'), os.path.join(self.directory, f'{key}.json')
+
+    def load(self, df, metric=DEFAULT_METRIC) -> DistanceOracle:
+        """
+        Oracle of the catalogue with the memory-mapped matrix, computes and saves it if it isn't cached
+        :param df: DataFrame, index - city names, columns - lat, long
+        :param metric: distance metric name (see distances.METRICS)
+        :return: DistanceOracle
+        """
+        names = list(df.index)
+        key = catalogue_key(names, df['lat'].values, df['long'].values, metric)
+        if self.storage != 'float64':
+            key = f'{key}-{self.storage}'
+        matrix_path, names_path = self.paths(key)
+        try:
+            with open(names_path) as file:
+                cached = json.load(file)
+            if cached != names:
+                raise ValueError("The cached names don't match")
+            matrix = open_matrix(matrix_path, len(names))
+            os.utime(matrix_path)
+            hit = True
+        except (OSError, ValueError):
+            matrix = self.save(key, names, df['lat'].values, df['long'].values, metric)
+            hit = False
+        if self.on_lookup is not None:
+            self.on_lookup(hit)
+        return DistanceOracle(names, matrix)
+
+    def save(self, key, names, lat, long, metric=DEFAULT_METRIC):
+        """
+        Computes the matrix into a temporary file in the storage of the cache, the files appear
+        atomically (the workers may warm the cache at once)
+        :return: the memory-mapped matrix (see tiles.open_matrix)
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        matrix_path, names_path = self.paths(key)
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(handle)
+        try:
+            compute_matrix(lat, long, temporary, metric=metric, storage=self.storage, workers=self.workers,
+                           on_progress=self.on_progress)
+            os.replace(temporary, matrix_path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(handle, 'wb') as file:
+            file.write(json.dumps(names).encode())
+        os.replace(temporary, names_path)
+        self.prune()
+        return open_matrix(matrix_path, len(names))
+
+    def prune(self):
+        matrices = sorted((entry for entry in os.scandir(self.directory) if entry.name.endswith('.npy')),
+                          key=lambda entry: entry.stat().st_mtime, reverse=True)
+        for entry in matrices[self.max_entries:]:
+            for path in self.paths(entry.name[:-len('.npy')]):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def clear(self):
+        if not os.path.isdir(self.directory):
+            return
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(('.npy', '.json', '.tmp')):
+                os.remove(entry.path)
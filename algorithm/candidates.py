@@ -0,0 +1,282 @@
+import numpy as np
+from scipy.spatial import cKDTree, ConvexHull, QhullError
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import minimum_spanning_tree, connected_components
+from .distances import distance_matrix, get_metric, DEFAULT_METRIC
+from .tour import TOUR_DTYPE
+
+CANDIDATE_METHODS = ('knn', 'delaunay', 'both')
+
+
+def unit_vectors(lat, long) -> np.ndarray:
+    """
+    Points on the unit sphere
+    Chord length between them is monotonic in the great-circle distance,
+    so the euclidean KD-tree gives the geographic nearest neighbours
+    :param lat: latitudes, degrees
+    :param long: longitudes, degrees
+    :return: n x 3 array
+    """
+    phi, lam = np.radians(np.asarray(lat, dtype=np.float64)), np.radians(np.asarray(long, dtype=np.float64))
+    return np.column_stack((np.cos(phi) * np.cos(lam), np.cos(phi) * np.sin(lam), np.sin(phi)))
+
+
+class CandidateGraph:
+    """
+    Sparse candidate graph: a short list of neighbours for every node
+    Memory grows with n * k instead of n^2; the distances beyond the lists are
+    computed from the coordinates on demand
+    """
+
+    def __init__(self, lat, long, neighbours, metric=DEFAULT_METRIC, tree=None):
+        """
+        Class constructor
+        :param lat: latitudes, degrees
+        :param long: longitudes, degrees
+        :param neighbours: n x k int array of the candidate ids, -1 pads the shorter lists
+        :param metric: distance metric name (see distances.METRICS)
+        :param tree: KD-tree over the unit vectors (built if omitted)
+        """
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.long = np.asarray(long, dtype=np.float64)
+        self.metric = metric
+        self.tree = tree if tree is not None else cKDTree(unit_vectors(self.lat, self.long))
+        self.neighbours = np.asarray(neighbours, dtype=np.intp)
+        self.weights = self.pair_distances(np.repeat(np.arange(len(self.lat)), self.neighbours.shape[1]),
+                                           self.neighbours.ravel()).reshape(self.neighbours.shape)
+        self.weights[self.neighbours < 0] = np.inf
+        # candidate lists are kept sorted by distance
+        order = np.argsort(self.weights, axis=1, kind='stable')
+        self.neighbours = np.take_along_axis(self.neighbours, order, axis=1)
+        self.weights = np.take_along_axis(self.weights, order, axis=1)
+
+    def __len__(self):
+        return len(self.lat)
+
+    @property
+    def k(self):
+        return self.neighbours.shape[1]
+
+    def pair_distances(self, ids1, ids2) -> np.ndarray:
+        """
+        Distances between the nodes ids1[i] and ids2[i]
+        :return: float array
+        """
+        ids1, ids2 = np.asarray(ids1, dtype=np.intp), np.asarray(ids2, dtype=np.intp)
+        return np.asarray(get_metric(self.metric)(self.lat[ids1], self.long[ids1], self.lat[ids2], self.long[ids2]),
+                          dtype=np.float64)
+
+    def distance(self, id1, id2) -> float:
+        """
+        Distance between two nodes
+        :return: distance, km
+        """
+        return float(get_metric(self.metric)(self.lat[id1], self.long[id1], self.lat[id2], self.long[id2]))
+
+    def submatrix(self, ids) -> np.ndarray:
+        """
+        Dense distance matrix for a part of the nodes
+        :param ids: node ids
+        :return: len(ids) x len(ids) matrix
+        """
+        return distance_matrix(self.lat[ids], self.long[ids], metric=self.metric)
+
+    def tour_length(self, tour) -> float:
+        """
+        Length of the route through the node ids in order
+        :param tour: sequence of ids
+        :return: distance, km
+        """
+        tour = np.asarray(tour, dtype=np.intp)
+        if len(tour) < 2:
+            return 0.0
+        return float(self.pair_distances(tour[:-1], tour[1:]).sum())
+
+    def edges(self) -> np.ndarray:
+        """
+        Unique undirected candidate edges
+        :return: m x 2 int array with i < j
+        """
+        rows = np.repeat(np.arange(len(self)), self.k)
+        cols = self.neighbours.ravel()
+        valid = cols >= 0
+        pairs = np.sort(np.column_stack((rows[valid], cols[valid])), axis=1)
+        return np.unique(pairs, axis=0)
+
+    def to_csr(self) -> csr_matrix:
+        """
+        Symmetric sparse adjacency matrix weighted by the distances
+        """
+        edges = self.edges()
+        weights = self.pair_distances(edges[:, 0], edges[:, 1])
+        # explicit zeros are dropped by csgraph, keep coincident points connected
+        weights = np.maximum(weights, np.finfo(np.float64).tiny)
+        rows = np.concatenate((edges[:, 0], edges[:, 1]))
+        cols = np.concatenate((edges[:, 1], edges[:, 0]))
+        return csr_matrix((np.concatenate((weights, weights)), (rows, cols)), shape=(len(self), len(self)))
+
+    def nearest_unvisited(self, current, visited, stats=None):
+        """
+        Nearest node which is not visited yet
+        Looks through the candidate list first and queries the KD-tree with
+        a growing k when the whole list is visited
+        :param current: node id
+        :param visited: boolean mask of the visited nodes
+        :param stats: Instrumentation the operations are counted in
+        :return: node id or -1 if everything is visited
+        """
+        ids = self.neighbours[current]
+        free = ids[(ids >= 0) & ~visited[np.maximum(ids, 0)]]
+        if stats is not None:
+            stats.count(comparisons=len(ids))
+        if len(free) > 0:
+            # candidate lists are sorted by distance
+            return int(free[0])
+        k = 2 * self.k + 1
+        point = unit_vectors(self.lat[current], self.long[current])
+        while True:
+            k = min(k, len(self))
+            _, ids = self.tree.query(point, k=k)
+            ids = np.atleast_1d(ids.ravel())
+            free = ids[~visited[ids]]
+            if stats is not None:
+                stats.count(distance_evaluations=len(free), comparisons=len(ids) + len(free))
+            if len(free) > 0:
+                return int(free[np.argmin(self.pair_distances(np.full(len(free), current), free))])
+            if k == len(self):
+                return -1
+            k *= 2
+
+
+def knn_candidates(lat, long, k=8, metric=DEFAULT_METRIC) -> CandidateGraph:
+    """
+    k nearest neighbours of every node by the KD-tree on the unit sphere
+    :param lat: latitudes, degrees
+    :param long: longitudes, degrees
+    :param k: list length
+    :param metric: distance metric name
+    :return: CandidateGraph
+    """
+    points = unit_vectors(lat, long)
+    tree = cKDTree(points)
+    k = min(k, len(points) - 1)
+    if k < 1:
+        return CandidateGraph(lat, long, np.zeros((len(points), 0), dtype=np.intp), metric=metric, tree=tree)
+    # chord order is spherical, a few spare neighbours let the ellipsoidal metric reorder the tail
+    extra = min(k + max(2, k // 2), len(points) - 1)
+    _, ids = tree.query(points, k=extra + 1)
+    # the closest point is the node itself (unless there are duplicates), move it to the end and cut
+    order = np.argsort(ids == np.arange(len(points))[:, None], axis=1, kind='stable')
+    graph = CandidateGraph(lat, long, np.take_along_axis(ids, order, axis=1)[:, :extra], metric=metric, tree=tree)
+    graph.neighbours, graph.weights = graph.neighbours[:, :k], graph.weights[:, :k]
+    return graph
+
+
+def delaunay_edges(lat, long) -> np.ndarray:
+    """
+    Edges of the spherical Delaunay triangulation (convex hull of the unit vectors)
+    The triangulation contains the minimum spanning tree
+    :return: m x 2 int array with i < j
+    """
+    points = unit_vectors(lat, long)
+    n = len(points)
+    if n < 4:
+        rows, cols = np.triu_indices(n, 1)
+        return np.column_stack((rows, cols))
+    try:
+        simplices = ConvexHull(points).simplices
+    except QhullError:
+        # degenerate (e.g. all the points on one great circle) - joggled input
+        simplices = ConvexHull(points, qhull_options='QJ').simplices
+    pairs = np.concatenate((simplices[:, [0, 1]], simplices[:, [1, 2]], simplices[:, [0, 2]]))
+    return np.unique(np.sort(pairs, axis=1), axis=0)
+
+
+def delaunay_candidates(lat, long, k=None, metric=DEFAULT_METRIC, knn=0) -> CandidateGraph:
+    """
+    Candidate lists from the Delaunay neighbours (optionally merged with k nearest)
+    :param lat: latitudes, degrees
+    :param long: longitudes, degrees
+    :param k: cut every list to k closest neighbours, keeps all if None
+    :param metric: distance metric name
+    :param knn: number of nearest neighbours added to the Delaunay ones
+    :return: CandidateGraph
+    """
+    n = len(lat)
+    edges = delaunay_edges(lat, long)
+    lists = [set() for _ in range(n)]
+    for i, j in edges:
+        lists[i].add(j)
+        lists[j].add(i)
+    if knn:
+        for i, row in enumerate(knn_candidates(lat, long, knn, metric).neighbours):
+            lists[i].update(row[row >= 0].tolist())
+    width = max((len(item) for item in lists), default=0)
+    neighbours = np.full((n, width), -1, dtype=np.intp)
+    for i, item in enumerate(lists):
+        neighbours[i, :len(item)] = sorted(item)
+    graph = CandidateGraph(lat, long, neighbours, metric=metric)
+    if k is not None and k < graph.k:
+        graph.neighbours, graph.weights = graph.neighbours[:, :k], graph.weights[:, :k]
+    return graph
+
+
+def candidate_graph(lat, long, k=8, method='knn', metric=DEFAULT_METRIC) -> CandidateGraph:
+    """
+    Candidate graph factory
+    :param lat: latitudes, degrees
+    :param long: longitudes, degrees
+    :param k: list length
+    :param method: 'knn', 'delaunay' or 'both' (Delaunay neighbours plus k nearest)
+    :param metric: distance metric name
+    :return: CandidateGraph
+    """
+    if method == 'knn':
+        return knn_candidates(lat, long, k, metric)
+    elif method == 'delaunay':
+        return delaunay_candidates(lat, long, metric=metric)
+    elif method == 'both':
+        return delaunay_candidates(lat, long, metric=metric, knn=k)
+    raise ValueError(f"Unknown candidate method '{method}', expected one of {CANDIDATE_METHODS}")
+
+
+def sparse_nearest_neighbour_tour(graph, start, stats=None) -> np.ndarray:
+    """
+    Nearest neighbour tour on the candidate graph, O(n * k) memory
+    :param graph: CandidateGraph
+    :param start: start id
+    :param stats: Instrumentation the operations are counted in
+    :return: int array of the closed tour (start ... start)
+    """
+    n = len(graph)
+    visited = np.zeros(n, dtype=bool)
+    tour = np.empty(n + 1, dtype=TOUR_DTYPE)
+    tour[0] = tour[-1] = current = start
+    visited[start] = True
+    for step in range(1, n):
+        current = graph.nearest_unvisited(current, visited, stats)
+        visited[current] = True
+        tour[step] = current
+    return tour
+
+
+def sparse_minimum_spanning_tree(graph, stats=None) -> np.ndarray:
+    """
+    Minimum spanning tree over the candidate edges
+    A disconnected k-nearest graph is completed with the Delaunay edges first
+    :param graph: CandidateGraph
+    :param stats: Instrumentation, the edge weights computed are counted (the scipy MST itself is not)
+    :return: (n - 1) x 2 int array of the tree edges
+    """
+    adjacency = graph.to_csr()
+    if stats is not None:
+        stats.count(distance_evaluations=adjacency.nnz // 2)
+    components, _ = connected_components(adjacency, directed=False)
+    if components > 1:
+        extra = delaunay_edges(graph.lat, graph.long)
+        weights = np.maximum(graph.pair_distances(extra[:, 0], extra[:, 1]), np.finfo(np.float64).tiny)
+        if stats is not None:
+            stats.count(distance_evaluations=len(extra))
+        adjacency = adjacency.maximum(csr_matrix((weights, (extra[:, 0], extra[:, 1])), shape=adjacency.shape))
+    tree = minimum_spanning_tree(adjacency).tocoo()
+    return np.column_stack((tree.row, tree.col)).astype(np.intp)
@@ -1,238 +1,232 @@
-import networkx as nx
-from itertools import combinations, product
+from itertools import combinations
 import numpy as np
-from networkx.algorithms.bipartite import minimum_weight_full_matching as mwfm
-from .utils import distances_table, get_distance
+from .base import BaseSolver
+from .euler import SHORTCUT_MODES, euler_circuit, odd_vertices, shortcut, to_networkx
+from .exact import dense_prim
+from .matching import MATCHING_MODES, min_weight_matching, resolve_mode, sparse_greedy_matching
+from .oracle import DistanceOracle
+from .candidates import CandidateGraph, candidate_graph, sparse_minimum_spanning_tree
+from .local_search import get_local_search, improve_path
+from .utils import get_distance, get_oracle, get_candidates
 import logging
 
-logging.basicConfig(filename='app.log', level=logging.INFO)
-
-
-def create_graph(df, df_dist) -> nx.Graph():
-    G = nx.Graph()
-    G.add_nodes_from(list(df.index))
-    edge_list = []
-    for index, row in df_dist.iterrows():
-        edge_list.append((row.city1, row.city2, {'weight': row.dist}))
-    G.add_edges_from(edge_list)
-    return G
-
-
-def optimal_matching(nodes, df_dist):
-    # algorithm can't be applied on odd number of vertices
-    choices = {}
-    if len(nodes) % 2 != 0:
-        raise ValueError
-    for nodes_set_1 in combinations(nodes, int(len(nodes) / 2)):
-        nodes_set_2 = [node for node in nodes if node not in nodes_set_1]
-        bipart_graph = nx.Graph()
-        bipart_graph.add_nodes_from(nodes_set_1, bipartite=0)
-        bipart_graph.add_nodes_from(nodes_set_2, bipartite=1)
-        for node1, node2 in product(nodes_set_1, nodes_set_2):
-            bipart_graph.add_edge(node1, node2, weight=get_distance(node1, node2, df_dist))
-        mwm = mwfm(bipart_graph, weight='weight')
-        tmp_nodes = []
-        final_mwm = []
-        for k in mwm.keys():
-            if k not in tmp_nodes:
-                final_mwm.append([k, mwm[k]])
-                tmp_nodes.extend([k, mwm[k]])
-        dist = sum([get_distance(edge[0], edge[1], df_dist) for edge in final_mwm])
-        choices.update({dist: final_mwm})
-    minimal = min(choices.keys())
-    return choices[minimal]
-
-
-class ChristAlgorithm:
+
+def optimal_matching(nodes, df_dist, mode='auto', stats=None):
+    """
+    Minimal weight perfect matching of the nodes
+    :param nodes: the list of nodes (even number)
+    :param df_dist: DistanceOracle or the long-form distances table
+    :param mode: matching mode (see matching.min_weight_matching)
+    :param stats: Instrumentation the operations are counted in
+    :return: the list of matched pairs
+    """
+    if isinstance(df_dist, DistanceOracle):
+        ids = df_dist.ids(nodes)
+        matrix = df_dist.matrix[np.ix_(ids, ids)]
+    else:
+        matrix = np.zeros((len(nodes), len(nodes)))
+        for (i, node1), (j, node2) in combinations(enumerate(nodes), 2):
+            matrix[i, j] = matrix[j, i] = get_distance(node1, node2, df_dist)
+    pairs = min_weight_matching(matrix, mode=mode, stats=stats)
+    return [[nodes[i], nodes[j]] for i, j in pairs]
+
+
+class ChristAlgorithm(BaseSolver):
     """
+    Christofides algorithm on the arrays: the MST (dense Prim or the scipy MST of the
+    candidate graph), the odd vertices and the Euler circuit work with the node ids,
+    the names are used for the animation frames only
     Class constructor uses DataFrame as initial data.
     Index = cities
     Columns = longitude, latitude
     """
 
-    def __init__(self, df):
-
-        self.logger = logging.getLogger('main_flow')
-        self.logger.setLevel('INFO')
-
-        self.df = df
-        self.df_dist = distances_table(df)
-        self.G = create_graph(self.df, self.df_dist)
-
-        self._complexity = 0
-        self.subG = None
-
-        # minimum spanning tree
-        self._MST = nx.minimum_spanning_tree(self.G)
-        E = len(self.G.edges)
-        self._complexity += int(E * np.log(E))
+    def __init__(self, df, oracle=None, matching='auto', candidates=None, local_search=None, instrumentation=None,
+                 shortcut='first'):
+        """
+        Class constructor
+        :param df: DataFrame, index - city names, columns - lat, long
+        :param oracle: DistanceOracle built for the selection (is built from df if omitted)
+        :param matching: 'exact', 'greedy' or 'auto' (exact up to matching.EXACT_MATCHING_LIMIT
+            odd vertices) matching of the odd vertices; with the candidates the greedy one runs
+            on the candidate graph of the odd vertices
+        :param shortcut: 'first' - every city at its first visit of the Euler circuit,
+            'best' - at the visit whose skipping saves the least
+        :param candidates: CandidateGraph or the candidate list length k; the MST is built
+            on the sparse graph then and the dense distance matrix is never built
+        :param local_search: improvement stage run after the construction
+            (True, LocalSearch arguments as dict or LocalSearch object)
+        :param instrumentation: Instrumentation of the run (a new one by default,
+            True - a new one with the memory tracing)
+        """
+        super().__init__(df, instrumentation)
+        self.logger = logging.getLogger(__name__)
+
+        self._oracle = oracle
+        if matching not in MATCHING_MODES:
+            raise ValueError(f"Unknown matching mode '{matching}', expected one of {MATCHING_MODES}")
+        self.matching_mode = matching
+        if shortcut not in SHORTCUT_MODES:
+            raise ValueError(f"Unknown shortcut mode '{shortcut}', expected one of {SHORTCUT_MODES}")
+        self.shortcut_mode = shortcut
+        self.local_search = get_local_search(local_search)
+
+        self.candidates = None
+        if candidates is not None:
+            with self.instrumentation.phase('candidates'):
+                self.candidates = get_candidates(df, candidates)
+                if not isinstance(candidates, CandidateGraph):
+                    self.instrumentation.count(distance_evaluations=self.candidates.neighbours.size)
+
+        # minimum spanning tree, (n - 1) x 2 array of the node ids
+        with self.instrumentation.phase('mst'):
+            if self.candidates is None:
+                if self._oracle is None:
+                    self.instrumentation.count(distance_evaluations=len(self.df) ** 2)
+                parent, _ = dense_prim(self.oracle.matrix, self.instrumentation)
+                self.tree = np.column_stack((np.arange(1, len(parent)), parent[1:])).astype(np.intp)
+            else:
+                self.tree = sparse_minimum_spanning_tree(self.candidates, self.instrumentation)
+        # names by the node id: the oracle order for the dense matrix, the df order for the candidates
+        self.names = list(self.oracle.names if self.candidates is None else self.df.index)
 
         self.odd_vertexes = []
-        self.matching = None
-
-        self._path = []
-        self._path_sequence = {}
-        self._second_path_sequence = {}
-        self._nodes_sequence = {}
-        self._distance = 0
-        self._complexity = 0
-
-    @property
-    def MST(self):
-        return self._MST
-
-    @property
-    def complexity(self):
-        return self._complexity
-
-    @complexity.setter
-    def complexity(self, value):
-        raise Exception("The property is read only")
-
-    @complexity.getter
-    def complexity(self):
-        if self._complexity == 0:
-            self.get_scenario()
-        return self._complexity
-
-    @property
-    def distance(self):
-        return self._distance
-
-    @distance.setter
-    def distance(self, value):
-        raise Exception("The property is read only")
-
-    @distance.getter
-    def distance(self):
-        if self._distance == 0:
-            self.get_scenario()
-        return self._distance
+        self._MST = None
 
     @property
-    def path(self):
-        return self._path
-
-    @path.setter
-    def path(self, value):
-        raise Exception("The property can't be set")
-
-    @path.getter
-    def path(self):
-        if not self._path:
-            self.get_scenario()
-        return self._path
+    def oracle(self):
+        self._oracle = get_oracle(self.df, self._oracle)
+        return self._oracle
 
     @property
-    def path_sequence(self):
-        return self._path_sequence
-
-    @path_sequence.setter
-    def path_sequence(self, value):
-        raise Exception("The property can't be set")
-
-    @path_sequence.getter
-    def path_sequence(self):
-        if not self._path_sequence:
-            self.get_scenario()
-        return self._path_sequence
+    def df_dist(self):
+        return self.oracle.df_dist
 
     @property
-    def second_path_sequence(self):
-        return self._second_path_sequence
-
-    @second_path_sequence.setter
-    def second_path_sequence(self, value):
-        raise Exception("The property can't be set")
-
-    @second_path_sequence.getter
-    def second_path_sequence(self):
-        if not self._second_path_sequence:
-            self.get_scenario()
-        return self._second_path_sequence
-
-    @property
-    def nodes_sequence(self):
-        if not self._second_path_sequence:
-            self.get_scenario()
-        return self._nodes_sequence
-
-    @nodes_sequence.setter
-    def nodes_sequence(self, value):
-        raise Exception("The property can't be set")
-
-    @nodes_sequence.getter
-    def nodes_sequence(self):
-        if not self._path_sequence:
-            self.get_scenario()
-        return self._nodes_sequence
-
-    def get_scenario(self):
+    def MST(self):
+        """
+        The minimum spanning tree as networkx Graph of the city names (needs networkx)
+        """
+        if self._MST is None:
+            self._MST = to_networkx(self.names, self.tree)
+        return self._MST
 
-        self._distance = 0
+    def odd_matrix(self, odd):
+        """
+        Distances between the odd vertices only
+        :param odd: node ids
+        :return: len(odd) x len(odd) matrix
+        """
+        if self.candidates is None:
+            return self.oracle.matrix[np.ix_(odd, odd)]
+        return self.candidates.submatrix(odd)
+
+    def match_odd(self, odd, stats=None):
+        """
+        Perfect matching of the odd vertices
+        With the candidates the dense matrix of the odd vertices is built for the exact matching
+        only, the greedy one runs on their own candidate graph, O(m * k) memory
+        :param odd: node ids
+        :param stats: Instrumentation the operations are counted in
+        :return: (len(odd) / 2) x 2 array of the matched node ids
+        """
+        mode = resolve_mode(self.matching_mode, len(odd))
+        if self.candidates is None or mode == 'exact':
+            if self.candidates is not None and stats is not None:
+                # the distances between the odd vertices are computed from the coordinates
+                stats.count(distance_evaluations=len(odd) ** 2)
+            return odd[min_weight_matching(self.odd_matrix(odd), mode=mode, stats=stats)]
+        graph = candidate_graph(self.candidates.lat[odd], self.candidates.long[odd], k=self.candidates.k,
+                                metric=self.candidates.metric)
+        if stats is not None:
+            stats.count(distance_evaluations=graph.neighbours.size)
+        return odd[sparse_greedy_matching(graph, stats)]
+
+    def edge_names(self, edges):
+        """
+        Edges as the pairs of the city names (animation frames)
+        """
+        return [[self.names[i], self.names[j]] for i, j in np.asarray(edges).reshape(-1, 2).tolist()]
+
+    def tour_length(self, sequence):
+        """
+        Length of the closed tour through the cities
+        :param sequence: city names
+        :return: distance, km
+        """
+        if self.candidates is None:
+            return self.oracle.tour_length(sequence, closed=True)
+        ids = [self.df.index.get_loc(node) for node in sequence]
+        return self.candidates.tour_length(ids + ids[:1])
+
+    def _solve(self):
+        stats = self.instrumentation
+        size = len(self.names)
 
         # build a minimum spanning tree
-        tmp_sequence = [[item[0], item[1]] for item in self.MST.edges]
-        mst_path_sequence = {i: n for i, n in enumerate(tmp_sequence)}
-        self._path_sequence = {0: []}
-        self._second_path_sequence = {0: mst_path_sequence}
-        self._nodes_sequence = {0: []}
-
-        # find odd vertexes
-        for node in self.MST.degree:
-            if node[1] % 2 != 0:
-                self.odd_vertexes.append(node[0])
-                self._complexity += len(self.G.nodes)
-
-        self.odd_vertexes = list(set(self.odd_vertexes))
-        self._path_sequence.update({1: []})
-        self._second_path_sequence.update({1: mst_path_sequence})
-        self._nodes_sequence.update({1: self.odd_vertexes})
-
-        # build subgraph only with odd vertices from the previous step
-        self.subG = nx.Graph()
-        self.subG.add_nodes_from(self.odd_vertexes)
-        for node1, node2 in combinations(self.odd_vertexes, 2):
-            self.subG.add_edge(node1, node2)
-            self._complexity += 1
-
-        opt_matching = optimal_matching(self.odd_vertexes, self.df_dist)
-        self._complexity += len(self.odd_vertexes)**3
-
-        self._path_sequence.update({2: {i: n for i, n in enumerate(opt_matching)}})
-        self._second_path_sequence.update({2: mst_path_sequence})
-        self._nodes_sequence.update({2: []})
-
-        # adding matching edges to MST
-        self._MST.add_edges_from(opt_matching)
-        tmp_sequence = [[item[0], item[1]] for item in self._MST.edges]
-        self._path_sequence.update({3: {i: n for i, n in enumerate(tmp_sequence)}})
-        self._second_path_sequence.update({3: []})
-        self._nodes_sequence.update({3: []})
-        self._complexity += len(opt_matching)
-
-        # final path
-        euler_steps = []
-        for edge in nx.algorithms.eulerian_path(self._MST):
-            euler_steps.append(edge[1])
-
-        self._complexity += len(list(self._MST.edges))**2
-
-        self.logger.info(euler_steps)
-
-        final_sequence = []
-        for node in euler_steps:
-            if node not in final_sequence:
-                final_sequence.append(node)
-
-        self.logger.info(final_sequence)
+        mst_path_sequence = {i: n for i, n in enumerate(self.edge_names(self.tree))}
+        path_sequence = {0: []}
+        second_path_sequence = {0: mst_path_sequence}
+        nodes_sequence = {0: []}
+
+        # find odd vertexes by the degree array
+        with stats.phase('odd'):
+            odd = odd_vertices(size, self.tree)
+            self.odd_vertexes = [self.names[i] for i in odd]
+            stats.count(comparisons=size)
+
+        path_sequence.update({1: []})
+        second_path_sequence.update({1: mst_path_sequence})
+        nodes_sequence.update({1: self.odd_vertexes})
+
+        with stats.phase('matching'):
+            matching = self.match_odd(odd, stats)
+
+        path_sequence.update({2: {i: n for i, n in enumerate(self.edge_names(matching))}})
+        second_path_sequence.update({2: mst_path_sequence})
+        nodes_sequence.update({2: []})
+
+        # adding matching edges to MST, an edge in both of them is doubled
+        with stats.phase('euler'):
+            multigraph = np.concatenate((self.tree, matching))
+            euler_steps = euler_circuit(size, multigraph)
+            stats.count(comparisons=2 * len(multigraph))
+        path_sequence.update({3: {i: n for i, n in enumerate(self.edge_names(multigraph))}})
+        second_path_sequence.update({3: []})
+        nodes_sequence.update({3: []})
+
+        self.logger.info('euler tour', extra={'event': 'euler_tour', 'data': {'tour': euler_steps}})
+
+        # final path, every node on its first visit
+        with stats.phase('shortcut'):
+            tour = shortcut(euler_steps, size, self.shortcut_mode, candidates=self.candidates, stats=stats,
+                            matrix=self.oracle.matrix if self.candidates is None else None)
+        final_sequence = [self.names[i] for i in tour]
+
+        self.logger.info('shortcut tour', extra={'event': 'shortcut_tour', 'data': {'tour': final_sequence}})
 
         final_path = [(node1, node2) for node1, node2 in zip(final_sequence[:-1], final_sequence[1:])]
         final_path.append((final_sequence[0], final_sequence[-1]))
-        self._path_sequence.update({4: []})
-        self._second_path_sequence.update({4: {i: n for i, n in enumerate(final_path)}})
-        self._nodes_sequence.update({4: final_sequence})
+        path_sequence.update({4: []})
+        second_path_sequence.update({4: {i: n for i, n in enumerate(final_path)}})
+        nodes_sequence.update({4: final_sequence})
+
+        # improvement stage, every accepted move is a frame
+        if self.local_search is not None:
+            with stats.phase('local_search'):
+                if self.candidates is not None:
+                    path, frames = improve_path(self.local_search, final_sequence + final_sequence[:1],
+                                                self.df.index, candidates=self.candidates, stats=stats)
+                else:
+                    path, frames = improve_path(self.local_search, final_sequence + final_sequence[:1],
+                                                self.oracle.names, matrix=self.oracle.matrix, stats=stats)
+            final_sequence = path[:-1]
+            for frame, changed in frames:
+                step = len(path_sequence)
+                path_sequence.update({step: []})
+                second_path_sequence.update({step: {i: n for i, n in enumerate(zip(frame[:-1], frame[1:]))}})
+                nodes_sequence.update({step: changed})
 
         # distance calculation
-        self._distance = sum([get_distance(node1, node2, df_dist=self.df_dist) for node1, node2 in final_path])
-
+        return self._result_of(final_sequence + final_sequence[:1], self.tour_length(final_sequence),
+                               path_sequence, second_path_sequence, nodes_sequence)
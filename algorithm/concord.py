@@ -1,131 +1,90 @@
-from tsp_solver.greedy import solve_tsp
-from .utils import distances_table, get_distance
+from .base import BaseSolver
+from .exact import solve
+from .local_search import get_local_search, improve_path
+from .utils import get_oracle
 import logging
 
-logging.basicConfig(filename='app.log', level=logging.INFO)
 
-
-class ConcordAlgorithm:
+class ConcordAlgorithm(BaseSolver):
     """
+    Exact / near-optimal solver: Held-Karp dynamic programming for small selections,
+    chained local search with the Held-Karp lower bound for the larger ones
     Class constructor uses DataFrame as initial data.
     Index = cities
     Columns = longitude, latitude
     """
 
-    def __init__(self, df):
-        self.logger = logging.getLogger('main_flow')
-        self.logger.setLevel('INFO')
-
-        self.df = df
-        self.df_dist = distances_table(df)
-        self.distance_matrix = self.df_dist.pivot(index='city1', columns='city2', values='dist').fillna(0)
-        self.cities_index = {i: city for i, city in enumerate(self.distance_matrix.index.tolist())}
-        self.logger.info(self.cities_index)
-
-        self._complexity = 0
-
-        self._path = []
-        self._path_sequence = []
-        self._second_path_sequence = []
-        self._nodes_sequence = {}
-        self._distance = 0
-        self._complexity = '-999'
+    def __init__(self, df, oracle=None, local_search=None, time_limit=10, workers=1, instrumentation=None):
+        """
+        Class constructor
+        :param df: DataFrame, index - city names, columns - lat, long
+        :param oracle: DistanceOracle built for the selection (is built from df if omitted)
+        :param time_limit: wall-clock budget of the search, seconds
+        :param workers: number of processes used by one solve (None - all the cores)
+        :param local_search: improvement stage run after the construction
+            (True, LocalSearch arguments as dict or LocalSearch object)
+        :param instrumentation: Instrumentation of the run (a new one by default,
+            True - a new one with the memory tracing)
+        """
+        super().__init__(df, instrumentation)
+        self.logger = logging.getLogger(__name__)
+
+        with self.instrumentation.phase('distances'):
+            if oracle is None:
+                self.instrumentation.count(distance_evaluations=len(df) ** 2)
+            self.oracle = get_oracle(df, oracle)
+        self.distance_matrix = self.oracle.matrix
+        self.cities_index = {i: city for i, city in enumerate(self.oracle.names)}
+        self.local_search = get_local_search(local_search)
+        self.time_limit = time_limit
+        self.workers = workers
+        self.logger.info('cities', extra={'event': 'cities', 'data': {'cities': self.cities_index}})
 
     @property
-    def complexity(self):
-        return self._complexity
-
-    @complexity.setter
-    def complexity(self, value):
-        raise Exception("The property is read only")
-
-    @complexity.getter
-    def complexity(self):
-        return self._complexity
+    def df_dist(self):
+        return self.oracle.df_dist
 
     @property
-    def distance(self):
-        return self._distance
-
-    @distance.setter
-    def distance(self, value):
-        raise Exception("The property is read only")
-
-    @distance.getter
-    def distance(self):
-        if self._distance == 0:
-            self.get_scenario()
-        return self._distance
-
-    @property
-    def path(self):
-        return self._path
-
-    @path.setter
-    def path(self, value):
-        raise Exception("The property can't be set")
-
-    @path.getter
-    def path(self):
-        if not self._path:
-            self.get_scenario()
-        return self._path
+    def lower_bound(self):
+        return self.solve().lower_bound
 
     @property
-    def path_sequence(self):
-        return self._path_sequence
-
-    @path_sequence.setter
-    def path_sequence(self, value):
-        raise Exception("The property can't be set")
-
-    @path_sequence.getter
-    def path_sequence(self):
-        if not self._path_sequence:
-            self.get_scenario()
-        return self._path_sequence
-
-    @property
-    def second_path_sequence(self):
-        return self._second_path_sequence
-
-    @second_path_sequence.setter
-    def second_path_sequence(self, value):
-        raise Exception("The property can't be set")
-
-    @second_path_sequence.getter
-    def second_path_sequence(self):
-        if not self._second_path_sequence:
-            self.get_scenario()
-        return self._second_path_sequence
-
-    @property
-    def nodes_sequence(self):
-        if not self._second_path_sequence:
-            self.get_scenario()
-        return self._nodes_sequence
-
-    @nodes_sequence.setter
-    def nodes_sequence(self, value):
-        raise Exception("The property can't be set")
-
-    @nodes_sequence.getter
-    def nodes_sequence(self):
-        if not self._path_sequence:
-            self.get_scenario()
-        return self._nodes_sequence
-
-    def get_scenario(self):
-        numeric_path = solve_tsp(self.distance_matrix.values, endpoints=(0, 0))
-        self._path = [self.cities_index[i] for i in numeric_path]
-        self._path_sequence = {0: self._path}
-        self._nodes_sequence = {0: self._path}
-        self._second_path_sequence = {0: None}
-
-        self.logger.info(numeric_path)
-
-        final_path = [(node1, node2) for node1, node2 in zip(self._path[:-1], self._path[1:])]
-        self.logger.info(final_path)
+    def gap(self):
+        """
+        Relative optimality gap: (distance - lower_bound) / lower_bound, 0 for the proven optimum
+        """
+        return self.solve().gap
+
+    def _solve(self):
+        solution = solve(self.distance_matrix, time_limit=self.time_limit, workers=self.workers,
+                         stats=self.instrumentation)
+        numeric_path = solution.tour.tolist()
+        lower_bound = solution.lower_bound
+        path = [self.cities_index[i] for i in numeric_path]
+        path_sequence = {0: path}
+        nodes_sequence = {0: path}
+        second_path_sequence = {0: None}
+
+        self.logger.info('exact tour', extra={'event': 'exact_tour',
+                                              'data': {'tour': numeric_path, 'lower_bound': solution.lower_bound,
+                                                       'gap': solution.gap}})
+
+        # improvement stage, every accepted move is a frame
+        if self.local_search is not None:
+            with self.instrumentation.phase('local_search'):
+                path, frames = improve_path(self.local_search, path, self.oracle.names,
+                                            matrix=self.oracle.matrix, stats=self.instrumentation)
+            for frame, changed in frames:
+                step = len(path_sequence)
+                path_sequence.update({step: frame})
+                second_path_sequence.update({step: None})
+                nodes_sequence.update({step: changed})
+
+        final_path = [(node1, node2) for node1, node2 in zip(path[:-1], path[1:])]
+        self.logger.info('final path', extra={'event': 'final_path', 'data': {'path': final_path}})
 
         # distance calculation
-        self._distance = sum([get_distance(node1, node2, df_dist=self.df_dist) for node1, node2 in final_path])
+        distance = self.oracle.tour_length(path)
+        gap = max(0.0, (distance - lower_bound) / lower_bound) if lower_bound > 0 else 0.0
+        return self._result_of(path, distance, path_sequence, second_path_sequence, nodes_sequence,
+                               lower_bound=lower_bound, gap=gap)
@@ -0,0 +1,201 @@
+import numpy as np
+import pandas as pd
+
+# mean Earth radius (IUGG) and WGS-84 ellipsoid parameters, kilometres
+EARTH_RADIUS = 6371.0088
+WGS84_A = 6378.137
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+
+def haversine(lat1, long1, lat2, long2):
+    """
+    Great-circle distance on a sphere of the mean Earth radius
+    All the arguments are in degrees and are broadcast against each other
+    :return: distances in km
+    """
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = np.radians(long2) - np.radians(long1)
+    a = np.sin(d_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def equirectangular(lat1, long1, lat2, long2):
+    """
+    Equirectangular (flat) approximation, the cheapest one
+    Good enough for short distances far from the poles
+    :return: distances in km
+    """
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    d_lambda = np.radians(long2) - np.radians(long1)
+    # wrap the longitude difference into [-pi, pi]
+    d_lambda = (d_lambda + np.pi) % (2 * np.pi) - np.pi
+    x = d_lambda * np.cos((phi1 + phi2) / 2)
+    y = phi2 - phi1
+    return EARTH_RADIUS * np.sqrt(x ** 2 + y ** 2)
+
+
+def vincenty(lat1, long1, lat2, long2, iterations=200, tolerance=1e-12):
+    """
+    Ellipsoidal (WGS-84) distance by the Vincenty inverse formula
+    The iteration runs on the whole array at once, converged elements are frozen.
+    Nearly antipodal pairs the method can't resolve fall back to haversine
+    :return: distances in km
+    """
+    lat1, long1, lat2, long2 = np.broadcast_arrays(*(np.asarray(v, dtype=np.float64)
+                                                     for v in (lat1, long1, lat2, long2)))
+    big_l = np.radians(long2 - long1)
+    u1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat1)))
+    u2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat2)))
+    sin_u1, cos_u1 = np.sin(u1), np.cos(u1)
+    sin_u2, cos_u2 = np.sin(u2), np.cos(u2)
+
+    lam = big_l.copy()
+    active = np.ones(lam.shape, dtype=bool)
+    sin_sigma = np.zeros(lam.shape)
+    cos_sigma = np.ones(lam.shape)
+    sigma = np.zeros(lam.shape)
+    cos_sq_alpha = np.ones(lam.shape)
+    cos_2sigma_m = np.zeros(lam.shape)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(iterations):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            s_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+            c_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sig = np.arctan2(s_sigma, c_sigma)
+            sin_alpha = np.where(s_sigma == 0, 0, cos_u1 * cos_u2 * sin_lam / s_sigma)
+            c_sq_alpha = 1 - sin_alpha ** 2
+            # equatorial lines have cos_sq_alpha == 0
+            c_2sigma_m = np.where(c_sq_alpha == 0, 0, c_sigma - 2 * sin_u1 * sin_u2 / c_sq_alpha)
+            c = WGS84_F / 16 * c_sq_alpha * (4 + WGS84_F * (4 - 3 * c_sq_alpha))
+            lam_new = big_l + (1 - c) * WGS84_F * sin_alpha * (
+                sig + c * s_sigma * (c_2sigma_m + c * c_sigma * (-1 + 2 * c_2sigma_m ** 2)))
+
+            sin_sigma = np.where(active, s_sigma, sin_sigma)
+            cos_sigma = np.where(active, c_sigma, cos_sigma)
+            sigma = np.where(active, sig, sigma)
+            cos_sq_alpha = np.where(active, c_sq_alpha, cos_sq_alpha)
+            cos_2sigma_m = np.where(active, c_2sigma_m, cos_2sigma_m)
+
+            converged = np.abs(lam_new - lam) <= tolerance
+            lam = np.where(active, lam_new, lam)
+            active &= ~converged
+            if not active.any():
+                break
+
+        u_sq = cos_sq_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+        a = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+        b = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+        delta_sigma = b * sin_sigma * (cos_2sigma_m + b / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2) - b / 6 * cos_2sigma_m *
+            (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+        res = WGS84_B * a * (sigma - delta_sigma)
+
+    failed = active | ~np.isfinite(res)
+    if failed.any():
+        res = np.where(failed, haversine(lat1, long1, lat2, long2), res)
+    return res
+
+
+METRICS = {'haversine': haversine,
+           'vincenty': vincenty,
+           'equirectangular': equirectangular}
+
+DEFAULT_METRIC = 'vincenty'
+# tile side of the matrix computation, the Vincenty formula keeps about 30 tile x tile
+# float64 temporaries (~60 MB)
+TILE = 512
+
+
+def get_metric(metric):
+    """
+    Resolves the metric name into the distance function
+    :param metric: metric name (see METRICS) or a callable (lat1, long1, lat2, long2) -> km
+    :return: callable
+    """
+    if callable(metric):
+        return metric
+    try:
+        return METRICS[metric]
+    except KeyError:
+        raise ValueError(f"Unknown metric '{metric}', expected one of {list(METRICS)}")
+
+
+def tile_bounds(n, tile=TILE):
+    """
+    Tiles of the upper triangle, row-major
+    :param n: number of nodes
+    :param tile: tile side
+    :return: list of (first row, end row, first column, end column)
+    """
+    starts = range(0, n, tile)
+    return [(i, min(i + tile, n), j, min(j + tile, n)) for i in starts for j in starts if j >= i]
+
+
+def compute_tile(lat, long, bounds, metric=DEFAULT_METRIC) -> np.ndarray:
+    """
+    Distances of a tile in one vectorized pass
+    :param lat: latitudes of all the nodes, degrees
+    :param long: longitudes of all the nodes, degrees
+    :param bounds: (first row, end row, first column, end column)
+    :param metric: distance metric name (see METRICS)
+    :return: float64 array of the tile shape
+    """
+    r0, r1, c0, c1 = bounds
+    func = get_metric(metric)
+    block = np.asarray(func(lat[r0:r1, None], long[r0:r1, None], lat[None, c0:c1], long[None, c0:c1]),
+                       dtype=np.float64)
+    if r0 == c0:
+        # the formulas are symmetric only up to rounding, mirror the upper triangle of a diagonal tile
+        lower = np.tril_indices(len(block), -1)
+        block[lower] = block.T[lower]
+        np.fill_diagonal(block, 0)
+    return block
+
+
+def distance_matrix(lat, long, metric=DEFAULT_METRIC, tile=TILE) -> np.ndarray:
+    """
+    Dense symmetric distance matrix
+    The upper triangle is computed tile by tile and mirrored, so the temporaries of the metric
+    formulas are O(tile^2) instead of O(n^2) besides the result
+    :param lat: latitudes (degrees), array-like of length n
+    :param long: longitudes (degrees), array-like of length n
+    :param metric: 'haversine', 'vincenty' or 'equirectangular'
+    :param tile: tile side
+    :return: C-contiguous float64 n x n matrix, km, zero diagonal
+    """
+    lat = np.asarray(lat, dtype=np.float64).ravel()
+    long = np.asarray(long, dtype=np.float64).ravel()
+    if lat.shape != long.shape:
+        raise ValueError("lat and long must have the same length")
+    get_metric(metric)
+    matrix = np.empty((len(lat), len(lat)))
+    for r0, r1, c0, c1 in tile_bounds(len(lat), tile):
+        block = compute_tile(lat, long, (r0, r1, c0, c1), metric)
+        matrix[r0:r1, c0:c1] = block
+        if r0 != c0:
+            matrix[c0:c1, r0:r1] = block.T
+    return matrix
+
+
+def long_form(matrix, names, permute=False) -> pd.DataFrame:
+    """
+    Long-form view (city1, city2, dist) of the distance matrix
+    The city columns are categorical: n names and small integer codes instead of a string per row
+    :param matrix: n x n distance matrix
+    :param names: n unique city names in the matrix order
+    :param permute: all the ordered pairs if True,
+        otherwise unordered pairs including the diagonal (i <= j)
+    :return: DataFrame with the columns city1, city2, dist
+    """
+    names = pd.Index(list(names))
+    n = len(names)
+    if permute:
+        rows, cols = np.divmod(np.arange(n * n), n)
+    else:
+        rows, cols = np.triu_indices(n)
+    return pd.DataFrame({'city1': pd.Categorical.from_codes(rows, categories=names),
+                         'city2': pd.Categorical.from_codes(cols, categories=names),
+                         'dist': matrix[rows, cols]})
@@ -0,0 +1,168 @@
+import numpy as np
+from .tour import TOUR_DTYPE
+
+try:
+    import networkx as nx
+except ImportError:
+    # optional, the graph export only
+    nx = None
+
+SHORTCUT_MODES = ('first', 'best')
+
+
+def odd_vertices(n, edges) -> np.ndarray:
+    """
+    Nodes of an odd degree
+    :param n: number of nodes
+    :param edges: m x 2 int array of the (multi)graph edges
+    :return: sorted int array of the node ids
+    """
+    edges = np.asarray(edges, dtype=np.intp).reshape(-1, 2)
+    return np.flatnonzero(np.bincount(edges.ravel(), minlength=n) % 2)
+
+
+def euler_circuit(n, edges, start=0) -> np.ndarray:
+    """
+    Euler circuit of a connected multigraph with all the degrees even (Hierholzer, O(n + m))
+    The adjacency is a CSR of the half-edges: the ones of a node are a slice of the arrays,
+    a per-node pointer skips the used ones, so every half-edge is looked at once
+    :param n: number of nodes
+    :param edges: m x 2 int array, an edge may repeat
+    :param start: the first (and the last) node of the walk
+    :return: int array of the m + 1 nodes of the closed walk, [start] for no edges
+    """
+    edges = np.asarray(edges, dtype=np.intp).reshape(-1, 2)
+    m = len(edges)
+    source = np.concatenate((edges[:, 0], edges[:, 1]))
+    order = np.argsort(source, kind='stable')
+    # half-edge k of the sorted order leads to target[k] over the edge edge_id[k]
+    target = np.concatenate((edges[:, 1], edges[:, 0]))[order].tolist()
+    edge_id = (order % m).tolist() if m else []
+    offsets = np.zeros(n + 1, dtype=np.intp)
+    np.cumsum(np.bincount(source, minlength=n), out=offsets[1:])
+    pointer = offsets[:-1].tolist()
+    end = offsets[1:].tolist()
+
+    used = [False] * m
+    stack = [start]
+    walk = []
+    while stack:
+        node = stack[-1]
+        k = pointer[node]
+        while k < end[node] and used[edge_id[k]]:
+            k += 1
+        if k == end[node]:
+            pointer[node] = k
+            walk.append(stack.pop())
+        else:
+            used[edge_id[k]] = True
+            pointer[node] = k + 1
+            stack.append(target[k])
+    return np.array(walk, dtype=TOUR_DTYPE)
+
+
+def shortcut(walk, n, mode='first', matrix=None, candidates=None, stats=None) -> np.ndarray:
+    """
+    Hamiltonian cycle from the closed walk, every node is kept at one of its occurrences
+    'first' - the first visit (a visited bitmap, one pass)
+    'best' - for every repeated node the occurrence whose skipping saves the least is kept,
+        the others are skipped (linked list of the walk positions, O(length of the walk))
+    :param walk: node ids of the closed walk (its first node is the first node of the tour)
+    :param n: number of nodes
+    :param mode: 'first' or 'best'
+    :param matrix: n x n distance matrix ('best' mode)
+    :param candidates: CandidateGraph for the distances without the matrix ('best' mode)
+    :param stats: Instrumentation the operations are counted in
+    :return: open tour array
+    """
+    if mode not in SHORTCUT_MODES:
+        raise ValueError(f"Unknown shortcut mode '{mode}', expected one of {SHORTCUT_MODES}")
+    walk = np.asarray(walk, dtype=TOUR_DTYPE)
+    if mode == 'first' or len(walk) < 4:
+        visited = np.zeros(n, dtype=bool)
+        tour = []
+        for node in walk.tolist():
+            if not visited[node]:
+                visited[node] = True
+                tour.append(node)
+        if stats is not None:
+            stats.count(comparisons=len(walk))
+        return np.array(tour, dtype=TOUR_DTYPE)
+    if matrix is None and candidates is None:
+        raise ValueError("The best shortcut needs the distance matrix or the candidate graph")
+    distances = (lambda ids1, ids2: matrix[ids1, ids2]) if matrix is not None else candidates.pair_distances
+
+    # the walk as a cycle of the positions, the closing repeat of the start dropped
+    if walk[0] == walk[-1]:
+        walk = walk[:-1]
+    m = len(walk)
+    nodes = walk.tolist()
+    before = [m - 1] + list(range(m - 1))
+    after = list(range(1, m)) + [0]
+    # positions of every node: a slice of the stable order
+    counts = np.bincount(walk, minlength=n)
+    offsets = np.concatenate(([0], np.cumsum(counts))).tolist()
+    positions = np.argsort(walk, kind='stable').tolist()
+
+    def pairs(node):
+        # (previous, node), (node, next) and (previous, next) of every occurrence, the smaller id first
+        for k in positions[offsets[node]:offsets[node + 1]]:
+            previous, following = nodes[before[k]], nodes[after[k]]
+            yield (min(previous, node), max(previous, node))
+            yield (min(node, following), max(node, following))
+            yield (min(previous, following), max(previous, following))
+
+    # a skip changes the neighbours of the other occurrences: every round gets the distances
+    # of the current neighbours in one call, decides the nodes and defers the ones whose
+    # neighbours have changed in the round to the next one
+    cache = {}
+    start = 0
+    pending = np.flatnonzero(counts > 1).tolist()
+    while pending:
+        missing = list({pair for node in pending for pair in pairs(node) if pair not in cache})
+        if missing:
+            ids = np.array(missing, dtype=np.intp).reshape(-1, 2)
+            cache.update(zip(missing, distances(ids[:, 0], ids[:, 1]).tolist()))
+            if stats is not None:
+                stats.count(distance_evaluations=len(missing))
+        deferred = []
+        for node in pending:
+            lengths = [cache.get(pair) for pair in pairs(node)]
+            if None in lengths:
+                deferred.append(node)
+                continue
+            occurrences = positions[offsets[node]:offsets[node + 1]]
+            # length added by the visit at the occurrence compared with its skipping
+            cost = [lengths[i] + lengths[i + 1] - lengths[i + 2] for i in range(0, len(lengths), 3)]
+            keep = occurrences[cost.index(min(cost))]
+            for k in occurrences:
+                if k != keep:
+                    after[before[k]], before[after[k]] = after[k], before[k]
+            if node == nodes[0]:
+                start = keep
+        pending = deferred
+    if stats is not None:
+        stats.count(comparisons=m)
+
+    tour = [nodes[start]]
+    k = after[start]
+    while k != start:
+        tour.append(nodes[k])
+        k = after[k]
+    return np.array(tour, dtype=TOUR_DTYPE)
+
+
+def to_networkx(names, edges, multigraph=False):
+    """
+    networkx export of the graph (visualization, analysis)
+    :param names: node names by the id
+    :param edges: m x 2 int array
+    :param multigraph: MultiGraph (the repeated edges kept) instead of Graph
+    :return: networkx Graph or MultiGraph
+    """
+    if nx is None:
+        raise ImportError('networkx is required for the graph export')
+    graph = nx.MultiGraph() if multigraph else nx.Graph()
+    graph.add_nodes_from(names)
+    graph.add_edges_from((names[i], names[j]) for i, j in np.asarray(edges).reshape(-1, 2).tolist())
+    return graph
@@ -0,0 +1,292 @@
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from .algorithm import nearest_neighbour_tour, best_nearest_neighbour
+from .instrumentation import Instrumentation
+from .local_search import LocalSearch, neighbour_lists
+from .shared import PackedMatrix, SharedMatrix
+from .tour import TOUR_DTYPE, path_length, tour_length
+
+# the largest instance solved by the dynamic programming (2^(n-1) * (n-1) states)
+HELD_KARP_LIMIT = 16
+
+Solution = namedtuple('Solution', ['tour', 'length', 'lower_bound', 'gap', 'optimal', 'operations'])
+
+
+def tour_cost(matrix, tour) -> float:
+    return path_length(matrix, tour)
+
+
+def held_karp(matrix, stats=None):
+    """
+    Exact solution by the Held-Karp dynamic programming, O(2^n * n^2)
+    The states of one subset size are processed together as arrays
+    :param matrix: n x n distance matrix
+    :param stats: Instrumentation the operations are counted in
+    :return: closed tour from the node 0 as int array, its length and the number of evaluated transitions
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    n = len(matrix)
+    if n <= 3:
+        tour = np.append(np.arange(n, dtype=TOUR_DTYPE), 0).astype(TOUR_DTYPE)
+        if stats is not None:
+            stats.count(distance_evaluations=n)
+        return tour, tour_cost(matrix, tour), n
+    m = n - 1
+    inner = matrix[1:, 1:]
+    full = 1 << m
+    subsets = np.arange(full)
+    size = np.zeros(full, dtype=np.int8)
+    for bit in range(m):
+        size += (subsets >> bit) & 1
+
+    dp = np.full((full, m), np.inf)
+    parent = np.full((full, m), -1, dtype=np.int8)
+    dp[1 << np.arange(m), np.arange(m)] = matrix[0, 1:]
+    operations = m
+    for count in range(2, m + 1):
+        layer = subsets[size == count]
+        for j in range(m):
+            states = layer[(layer >> j) & 1 == 1]
+            candidates = dp[states ^ (1 << j)] + inner[:, j]
+            best = np.argmin(candidates, axis=1)
+            dp[states, j] = candidates[np.arange(len(states)), best]
+            parent[states, j] = best
+            operations += candidates.size
+            if stats is not None:
+                # a transition reads a distance and relaxes the state, argmin compares them
+                stats.count(distance_evaluations=candidates.size, relaxations=candidates.size,
+                            comparisons=candidates.size - len(states))
+
+    closing = dp[full - 1] + matrix[1:, 0]
+    if stats is not None:
+        stats.count(distance_evaluations=2 * m, comparisons=2 * m - 1)
+    last = int(np.argmin(closing))
+    length = float(closing[last])
+    sequence, state = [], full - 1
+    while last >= 0:
+        sequence.append(last + 1)
+        state, last = state ^ (1 << last), int(parent[state, last])
+    tour = np.array([0] + sequence[::-1] + [0], dtype=TOUR_DTYPE)
+    return tour, length, operations
+
+
+def dense_prim(matrix, stats=None):
+    """
+    Minimum spanning tree by the Prim algorithm on the dense matrix, O(n^2)
+    The matrix is read a row at a time, a float32 array or a PackedMatrix isn't copied
+    :param matrix: n x n distance matrix
+    :param stats: Instrumentation the operations are counted in
+    :return: parent array (parent[0] == -1) and the tree cost
+    """
+    if not isinstance(matrix, PackedMatrix):
+        matrix = np.asarray(matrix)
+    n = len(matrix)
+    parent = np.zeros(n, dtype=np.intp)
+    parent[0] = -1
+    in_tree = np.zeros(n, dtype=bool)
+    in_tree[0] = True
+    best = matrix[0].astype(np.float64)
+    best[0] = np.inf
+    cost = 0.0
+    for _ in range(n - 1):
+        v = int(np.argmin(best))
+        cost += best[v]
+        in_tree[v] = True
+        best[v] = np.inf
+        row = matrix[v]
+        closer = (row < best) & ~in_tree
+        best[closer] = row[closer]
+        parent[closer] = v
+        if stats is not None:
+            stats.count(distance_evaluations=n, comparisons=2 * n - 1, relaxations=int(closer.sum()))
+    return parent, cost
+
+
+def one_tree_bound(matrix, upper=None, iterations=200, deadline=None, stats=None):
+    """
+    Held-Karp lower bound: the best 1-tree under the subgradient optimisation of the node penalties
+    The penalised weights are a dense float64 n x n array, a float32 matrix isn't copied before
+    :param matrix: n x n distance matrix
+    :param upper: length of a known tour, used for the step size
+    :param iterations: maximal number of the subgradient steps
+    :param deadline: perf_counter value to stop at
+    :param stats: Instrumentation the operations are counted in
+    :return: lower bound of the optimal tour length
+    """
+    matrix = np.asarray(matrix)
+    n = len(matrix)
+    if n < 3:
+        return 2 * float(matrix.max()) if n == 2 else 0.0
+    pi = np.zeros(n)
+    best = -np.inf
+    scale, stall = 2.0, 0
+    for _ in range(iterations):
+        # at least one 1-tree is always built
+        if deadline is not None and best > -np.inf and time.perf_counter() > deadline:
+            break
+        weights = matrix + pi[:, None] + pi[None, :]
+        parent, cost = dense_prim(weights[1:, 1:], stats)
+        degree = np.bincount(parent[1:], minlength=n - 1) + 1
+        degree[0] -= 1
+        two = np.argpartition(weights[0, 1:], 1)[:2]
+        cost += weights[0, 1:][two].sum()
+        degree = np.concatenate(([2], degree))
+        degree[two + 1] += 1
+        bound = cost - 2 * pi.sum()
+        if bound > best + 1e-9:
+            best, stall = bound, 0
+        else:
+            stall += 1
+            if stall >= 10:
+                scale, stall = scale / 2, 0
+        gradient = degree - 2
+        norm = float((gradient ** 2).sum())
+        if norm == 0:
+            # the 1-tree is a tour, so it is optimal
+            break
+        target = upper if upper is not None else 1.05 * bound
+        pi += scale * max(target - bound, 1e-9 * abs(bound)) / norm * gradient
+    return float(best)
+
+
+def double_bridge(tour, rng, window=50):
+    """
+    Local double bridge kick: three short consecutive segments A B C become A C B
+    :param tour: open tour
+    :param rng: numpy Generator
+    :param window: maximal segment length
+    :return: new open tour and the nodes of the changed edges
+    """
+    n = len(tour)
+    shift = int(rng.integers(n))
+    t = np.roll(tour, -shift)
+    window = max(1, min(window, (n - 1) // 3))
+    a = 1 + int(rng.integers(window))
+    b = a + 1 + int(rng.integers(window))
+    c = b + 1 + int(rng.integers(window))
+    if c >= n:
+        return t, []
+    kicked = np.concatenate((t[:a], t[b:c], t[a:b], t[c:]))
+    changed = [t[a - 1], t[a], t[b - 1], t[b], t[c - 1], t[c % n]]
+    return kicked, changed
+
+
+def chained_local_search(matrix, tour, seed=0, time_limit=None, patience=2000, neighbours=None, stats=None):
+    """
+    Iterated 2-opt / Or-opt search with double bridge kicks (a chained Lin-Kernighan style loop)
+    :param matrix: n x n distance matrix (an array or a PackedMatrix)
+    :param tour: closed start tour
+    :param seed: random seed of the kicks
+    :param time_limit: wall-clock budget, seconds
+    :param patience: stop after this number of kicks without an improvement
+    :param neighbours: precomputed neighbour lists
+    :param stats: Instrumentation the operations are counted in
+    :return: the best closed tour, its length and the number of kicks
+    """
+    if not isinstance(matrix, PackedMatrix):
+        matrix = np.asarray(matrix)
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    rng = np.random.default_rng(seed)
+    if neighbours is None:
+        neighbours = neighbour_lists(matrix, 10)
+    neighbours = [row[row >= 0].tolist() for row in np.asarray(neighbours)]
+    search = LocalSearch()
+    best = search.run(np.asarray(tour)[:-1], matrix, neighbours=neighbours, stats=stats)
+    best_length = tour_length(matrix, best)
+    kicks = stall = 0
+    while len(best) >= 8 and stall < patience:
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+        kicked, changed = double_bridge(best, rng)
+        if not changed:
+            break
+        candidate = search.run(kicked, matrix, neighbours=neighbours, active=changed, stats=stats)
+        length = tour_length(matrix, candidate)
+        kicks += 1
+        if stats is not None:
+            stats.count(distance_evaluations=len(candidate), comparisons=1)
+        if length < best_length - 1e-9:
+            best, best_length, stall = candidate, length, 0
+        else:
+            stall += 1
+    start = int(np.flatnonzero(best == tour[0])[0])
+    best = np.roll(best, -start)
+    return np.append(best, best[0]), best_length, kicks
+
+
+def _search_worker(shared, tour, seed, time_limit, patience):
+    stats = Instrumentation()
+    result = chained_local_search(shared.matrix, tour, seed=seed, time_limit=time_limit, patience=patience, stats=stats)
+    return result + (stats.counters,)
+
+
+def solve(matrix, time_limit=10, workers=1, seed=0, patience=2000, exact_limit=HELD_KARP_LIMIT,
+          stats=None) -> Solution:
+    """
+    Near-optimal tour with the lower bound
+    Up to exact_limit nodes the Held-Karp dynamic programming gives the optimum,
+    the larger instances run the chained local search from several seeds in parallel
+    processes while the 1-tree bound is computed in the calling one
+    :param matrix: n x n distance matrix, float64 or float32 (kept as it is, the workers share it in
+        the same storage); the 1-tree bound needs the dense rows, so a PackedMatrix isn't accepted
+    :param time_limit: wall-clock budget, seconds
+    :param workers: number of processes (None - all the cores)
+    :param seed: base random seed, the process i uses seed + i
+    :param patience: kicks without an improvement before a search stops
+    :param exact_limit: the largest n for the dynamic programming
+    :param stats: Instrumentation the operations and the phases (construction, search, bound) are recorded in
+    :return: Solution(tour, length, lower_bound, gap, optimal, operations), tour is closed and starts at 0
+    """
+    if isinstance(matrix, PackedMatrix):
+        raise TypeError("solve needs a dense matrix, np.asarray unpacks a PackedMatrix into one")
+    matrix = np.asarray(matrix)
+    n = len(matrix)
+    if stats is None:
+        stats = Instrumentation()
+    if n <= 1:
+        return Solution(np.zeros(min(n, 1) * 2, dtype=np.intp), 0.0, 0.0, 0.0, True, 0)
+    if n <= exact_limit:
+        with stats.phase('dynamic_programming'):
+            tour, length, operations = held_karp(matrix, stats)
+        return Solution(tour, length, length, 0.0, True, operations)
+
+    deadline = time.perf_counter() + time_limit
+    with stats.phase('construction'):
+        if n <= 500:
+            start, _ = best_nearest_neighbour(matrix, stats=stats)
+            start = np.roll(start[:-1], -int(np.flatnonzero(start == 0)[0]))
+            start = np.append(start, 0)
+        else:
+            start = nearest_neighbour_tour(matrix, 0, stats)
+        upper = tour_cost(matrix, start)
+    workers = os.cpu_count() if workers is None else max(1, workers)
+
+    if workers == 1:
+        with stats.phase('search'):
+            results = [chained_local_search(matrix, start, seed=seed, time_limit=time_limit, patience=patience,
+                                            stats=stats)]
+        # the bound gets the rest of the budget, but not less than a fifth of it
+        with stats.phase('bound'):
+            lower = one_tree_bound(matrix, upper=results[0][1],
+                                   deadline=max(deadline, time.perf_counter() + 0.2 * time_limit), stats=stats)
+    else:
+        # the workers attach the matrix instead of getting a pickled copy each
+        storage = 'float32' if matrix.dtype == np.float32 else 'float64'
+        with stats.phase('search'), SharedMatrix.create(matrix, storage) as shared, \
+                ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_search_worker, shared, start, seed + i, time_limit, patience)
+                       for i in range(workers)]
+            with stats.phase('bound'):
+                lower = one_tree_bound(matrix, upper=upper, deadline=deadline, stats=stats)
+            results = [future.result() for future in futures]
+        for result in results:
+            stats.merge(result[3])
+
+    tour, length = min(results, key=lambda item: item[1])[:2]
+    operations = sum(item[2] for item in results)
+    lower = min(lower, length)
+    gap = (length - lower) / lower if lower > 0 else 0.0
+    return Solution(tour, length, lower, gap, gap < 1e-9, operations)
@@ -0,0 +1,161 @@
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Windows
+    resource = None
+
+COUNTERS = ('distance_evaluations', 'comparisons', 'relaxations')
+
+
+class Instrumentation:
+    """
+    Operation counters and resource usage of a solver run, shared by all the solvers
+    The algorithms add the operations they actually perform: distance evaluations
+    (matrix entries read, distances computed from the coordinates), comparisons
+    (argmin candidates, gain and visited tests) and edge relaxations (key decreases
+    of Prim, transitions of the dynamic programming). The work done inside the
+    libraries (sorting, networkx blossom, scipy MST) isn't counted.
+    Every phase gets its wall-clock and CPU time and its counters. With the memory
+    tracing the phases get the peak of the memory allocated during them (tracemalloc,
+    several times slower on the allocation heavy code like networkx), otherwise the
+    peak resident set size of the process is reported.
+    """
+
+    def __init__(self, memory=False):
+        """
+        Class constructor
+        :param memory: trace the allocations of the phases
+        """
+        self.memory = memory
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.phases = {}
+        self._stack = []
+        self._started_tracing = False
+
+    def count(self, distance_evaluations=0, comparisons=0, relaxations=0):
+        counters = self.counters
+        counters['distance_evaluations'] += int(distance_evaluations)
+        counters['comparisons'] += int(comparisons)
+        counters['relaxations'] += int(relaxations)
+
+    def merge(self, counters):
+        """
+        Adds the counters of a run made elsewhere (e.g. in a worker process)
+        :param counters: dict of COUNTERS
+        """
+        self.count(**{name: counters.get(name, 0) for name in COUNTERS})
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Measures the block as the phase, a phase entered again is summed up
+        :param name: phase name
+        """
+        trace = self.memory
+        if trace and not self._stack and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if trace and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                # the peak of the enclosing phase is kept before it is reset
+                self._stack[-1][1] = max(self._stack[-1][1], peak)
+            tracemalloc.reset_peak()
+        else:
+            current = 0
+        frame = [current, 0]
+        self._stack.append(frame)
+        before = dict(self.counters)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            self._stack.pop()
+            peak = 0
+            if trace and tracemalloc.is_tracing():
+                peak = max(frame[1], tracemalloc.get_traced_memory()[1])
+                if self._stack:
+                    self._stack[-1][1] = max(self._stack[-1][1], peak)
+            record = self.phases.get(name)
+            if record is None:
+                record = self.phases[name] = {'wall_time': 0.0, 'cpu_time': 0.0, 'peak_memory': 0,
+                                              'top': not self._stack, **dict.fromkeys(COUNTERS, 0)}
+            record['wall_time'] += wall
+            record['cpu_time'] += cpu
+            record['peak_memory'] = max(record['peak_memory'], peak - frame[0])
+            for counter in COUNTERS:
+                record[counter] += self.counters[counter] - before[counter]
+            if not self._stack and self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+
+    @property
+    def operations(self):
+        return sum(self.counters.values())
+
+    @property
+    def wall_time(self):
+        return sum(record['wall_time'] for record in self.phases.values() if record['top'])
+
+    @property
+    def cpu_time(self):
+        return sum(record['cpu_time'] for record in self.phases.values() if record['top'])
+
+    @property
+    def peak_memory(self):
+        """
+        The largest traced peak of the phases or the peak RSS of the process without the tracing, bytes
+        """
+        if self.memory:
+            return max((record['peak_memory'] for record in self.phases.values()), default=0)
+        return max_rss()
+
+    def as_dict(self):
+        """
+        Plain dict of the measurements (JSON serialisable)
+        :return: dict: operations, counters, wall_time, cpu_time (seconds), peak_memory (bytes),
+            memory ('traced' or 'rss') and phases (name -> times, counters and, if traced,
+            peak memory of the phase)
+        """
+        phases = {}
+        for name, record in self.phases.items():
+            phases[name] = {key: value for key, value in record.items() if key != 'top'}
+            if not self.memory:
+                del phases[name]['peak_memory']
+        return {'operations': self.operations,
+                'counters': dict(self.counters),
+                'wall_time': self.wall_time,
+                'cpu_time': self.cpu_time,
+                'peak_memory': self.peak_memory,
+                'memory': 'traced' if self.memory else 'rss',
+                'phases': phases}
+
+
+def max_rss():
+    """
+    Peak resident set size of the process, bytes (0 where it isn't available)
+    """
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def get_instrumentation(value):
+    """
+    Instrumentation from the solver option
+    :param value: None / False - a new one, True - a new one with the memory tracing, or a ready object
+    :return: Instrumentation
+    """
+    if value is None or value is False:
+        return Instrumentation()
+    if value is True:
+        return Instrumentation(memory=True)
+    return value
@@ -0,0 +1,267 @@
+import time
+from collections import deque
+import numpy as np
+from .shared import PackedMatrix
+from .tour import TOUR_DTYPE, close, two_opt_delta, or_opt_delta, apply_or_opt
+
+EPS = 1e-9
+# rows of the matrix the neighbour lists are selected from at once
+NEIGHBOUR_BLOCK = 1024
+
+
+class _Lookup:
+    """
+    matrix[a, b] over the distance function, the move deltas of the tour module read it
+    """
+    __slots__ = ('dist',)
+
+    def __init__(self, dist):
+        self.dist = dist
+
+    def __getitem__(self, key):
+        return self.dist(*key)
+
+
+def neighbour_lists(matrix, k=8) -> np.ndarray:
+    """
+    k nearest neighbours of every node from the matrix, a block of rows at a time
+    :param matrix: n x n distance matrix (an array, a memory map or PackedMatrix)
+    :param k: list length
+    :return: n x k int array sorted by the distance
+    """
+    if not isinstance(matrix, PackedMatrix):
+        matrix = np.asarray(matrix)
+    n = len(matrix)
+    k = min(k, n - 1)
+    if k < 1:
+        return np.zeros((n, 0), dtype=np.intp)
+    out = np.empty((n, k), dtype=np.intp)
+    for first in range(0, n, NEIGHBOUR_BLOCK):
+        rows = np.arange(first, min(first + NEIGHBOUR_BLOCK, n))
+        block = np.array(matrix[rows], dtype=np.float64)
+        block[np.arange(len(rows)), rows] = np.inf
+        ids = np.argpartition(block, k - 1, axis=1)[:, :k]
+        order = np.argsort(np.take_along_axis(block, ids, axis=1), axis=1, kind='stable')
+        out[rows] = np.take_along_axis(ids, order, axis=1)
+    return out
+
+
+class LocalSearch:
+    """
+    2-opt and Or-opt improvement of a tour
+    The tour is kept as an array of ids with the positions array, the moves are
+    looked for only among the candidate neighbours, and the nodes which didn't give
+    an improving move are switched off by the don't-look bits until their
+    neighbourhood changes
+    """
+
+    def __init__(self, time_limit=None, max_moves=None, k=8, or_opt=True, max_segment=3):
+        """
+        Class constructor
+        :param time_limit: wall-clock budget, seconds (None - no limit)
+        :param max_moves: maximal number of accepted moves (None - no limit)
+        :param k: neighbour list length when the lists are built from the matrix
+        :param or_opt: run Or-opt moves together with 2-opt
+        :param max_segment: the longest segment moved by Or-opt
+        """
+        self.time_limit = time_limit
+        self.max_moves = max_moves
+        self.k = k
+        self.or_opt = or_opt
+        self.max_segment = max_segment
+
+    def run(self, tour, matrix=None, candidates=None, on_move=None, neighbours=None, active=None, stats=None):
+        """
+        Improves the tour until a local optimum or the budget end
+        :param tour: ids of the cycle, either open (each node once) or closed (first == last)
+        :param matrix: n x n distance matrix, read by the scalar lookups: a float32 array or
+            a PackedMatrix is used as it is, without a dense float64 copy
+        :param candidates: CandidateGraph, used for the neighbour lists (and the distances
+            if there is no matrix)
+        :param on_move: callback(tour, nodes) called after every accepted move with the
+            current open tour array and the nodes whose edges changed
+        :param neighbours: precomputed neighbour lists (n x k array with -1 pads,
+            or the list of id lists), for repeated runs
+        :param active: nodes to start from (all the tour nodes by default), the others
+            are switched off by the don't-look bits
+        :param stats: Instrumentation the distance evaluations and the gain tests are counted in
+        :return: improved tour in the same form (open / closed) starting from the same node
+        """
+        tour = np.asarray(tour, dtype=np.intp)
+        closed = len(tour) > 1 and tour[0] == tour[-1]
+        t = tour[:-1].copy() if closed else tour.copy()
+        n = len(t)
+        if n < 4:
+            return tour.copy()
+
+        if matrix is not None:
+            if not isinstance(matrix, PackedMatrix):
+                matrix = np.asarray(matrix)
+            size = len(matrix)
+            dist = matrix.item
+        elif candidates is not None:
+            size = len(candidates)
+            # without the matrix every distance is computed from the coordinates, keep them
+            cache = {}
+
+            def dist(i, j):
+                key = (i, j) if i < j else (j, i)
+                if key not in cache:
+                    cache[key] = candidates.distance(i, j)
+                return cache[key]
+        else:
+            raise ValueError("Either the matrix or the candidates are needed")
+        # distance evaluations and gain tests
+        tally = [0, 0]
+        if stats is not None:
+            evaluate = dist
+
+            def dist(i, j):
+                tally[0] += 1
+                return evaluate(i, j)
+        # a plain array is read directly, the rest through the counting / caching function
+        lookup = matrix if isinstance(matrix, np.ndarray) and stats is None else _Lookup(dist)
+        if neighbours is None:
+            neighbours = candidates.neighbours if candidates is not None else neighbour_lists(matrix, self.k)
+        if not isinstance(neighbours, list):
+            neighbours = [row[row >= 0].tolist() for row in np.asarray(neighbours)]
+
+        # the tour may go through a part of the nodes only, pos is -1 for the others
+        pos = np.full(size, -1, dtype=np.intp)
+        pos[t] = np.arange(n)
+        active = deque(t.tolist() if active is None else [node for node in active if pos[node] >= 0])
+        queued = np.zeros(size, dtype=bool)
+        queued[list(active)] = True
+        start = t[0]
+        deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit
+        moves = 0
+
+        def wake(*nodes):
+            for node in nodes:
+                if not queued[node]:
+                    queued[node] = True
+                    active.append(node)
+
+        def reverse(i, j):
+            # reverses t[i..j] (cyclic, inclusive), the shorter side of the cycle is flipped
+            length = (j - i) % n + 1
+            if 2 * length > n:
+                i, j = (j + 1) % n, (i - 1) % n
+                length = n - length
+            idx = (i + np.arange(length)) % n
+            t[idx] = t[idx[::-1]]
+            pos[t[idx]] = idx
+
+        while active:
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+            if self.max_moves is not None and moves >= self.max_moves:
+                break
+            a = active.popleft()
+            queued[a] = False
+            changed = self._two_opt(a, t, pos, n, lookup, neighbours, reverse, tally)
+            if changed is None and self.or_opt:
+                changed = self._or_opt(a, t, pos, n, lookup, neighbours, tally)
+            if changed is not None:
+                moves += 1
+                wake(*changed)
+                if on_move is not None:
+                    on_move(np.roll(t, -int(pos[start])), changed)
+
+        if stats is not None:
+            stats.count(distance_evaluations=tally[0], comparisons=tally[1])
+        t = np.roll(t, -int(pos[start])).astype(TOUR_DTYPE)
+        return close(t) if closed else t
+
+    @staticmethod
+    def _two_opt(a, t, pos, n, lookup, neighbours, reverse, tally):
+        """
+        The first improving 2-opt move around the node a
+        :return: the nodes of the changed edges or None
+        """
+        i = pos[a]
+        for direction in (1, -1):
+            b = t[(i + direction) % n]
+            d_ab = lookup[a, b]
+            for c in neighbours[a]:
+                tally[1] += 1
+                if lookup[a, c] >= d_ab:
+                    break
+                j = pos[c]
+                if j < 0:
+                    continue
+                d = t[(j + direction) % n]
+                if c == b or d == a:
+                    continue
+                # a b ... c d -> a c ... b d, or d c ... b a -> d b ... c a backwards
+                first, last = ((i + 1) % n, j) if direction == 1 else (j, (i - 1) % n)
+                tally[1] += 1
+                if two_opt_delta(lookup, t, first, last) < -EPS:
+                    reverse(first, last)
+                    return a, b, c, d
+        return None
+
+    def _or_opt(self, a, t, pos, n, lookup, neighbours, tally):
+        """
+        The first improving move of a segment (1..max_segment nodes) starting at the node a
+        to a place next to one of its neighbours, both orientations are tried
+        :return: the nodes of the changed edges or None
+        """
+        i = pos[a]
+        for length in range(1, min(self.max_segment, n - 3) + 1):
+            segment = [t[(i + s) % n] for s in range(length)]
+            inside = set(segment)
+            for c in neighbours[a]:
+                j = pos[c]
+                if c in inside or j < 0:
+                    continue
+                # insert so that a is next to c: after c, or reversed before it
+                for e, k, reverse in ((t[(j + 1) % n], j, False), (t[(j - 1) % n], (j - 1) % n, True)):
+                    if e in inside:
+                        continue
+                    tally[1] += 1
+                    if or_opt_delta(lookup, t, i, length, k, reverse) < -EPS:
+                        p, q = t[(i - 1) % n], t[(i + length) % n]
+                        t[:] = apply_or_opt(t, i, length, k, reverse)
+                        pos[t] = np.arange(n)
+                        return p, q, c, e, segment[0], segment[-1]
+        return None
+
+
+def get_local_search(value):
+    """
+    Local search stage from the solver option
+    :param value: None / False - no stage, True - defaults, dict - LocalSearch arguments,
+        or a ready object with the LocalSearch.run interface
+    :return: the stage object or None
+    """
+    if value is None or value is False:
+        return None
+    if value is True:
+        return LocalSearch()
+    if isinstance(value, dict):
+        return LocalSearch(**value)
+    return value
+
+
+def improve_path(local_search, path, names, matrix=None, candidates=None, stats=None):
+    """
+    Runs the improvement stage on a closed path of city names
+    :param local_search: LocalSearch
+    :param path: closed path (the first city is repeated at the end)
+    :param names: city names in the matrix / candidate graph order
+    :param matrix: n x n distance matrix
+    :param candidates: CandidateGraph
+    :param stats: Instrumentation the operations are counted in
+    :return: improved closed path and the frames: the list of (closed path, changed cities)
+        for every accepted move
+    """
+    index = {name: i for i, name in enumerate(names)}
+    frames = []
+
+    def record(tour, nodes):
+        frames.append(([names[i] for i in tour] + [names[tour[0]]], [names[i] for i in nodes]))
+
+    tour = local_search.run([index[name] for name in path], matrix=matrix, candidates=candidates, on_move=record,
+                            stats=stats)
+    return [names[i] for i in tour], frames
@@ -0,0 +1,121 @@
+import numpy as np
+
+MATCHING_MODES = ('auto', 'exact', 'greedy')
+# the largest number of vertices the 'auto' mode matches by the blossom algorithm (O(m^3),
+# about a second at this size), greedy above
+EXACT_MATCHING_LIMIT = 200
+
+
+def resolve_mode(mode, m) -> str:
+    """
+    The matching run for the mode on m vertices: 'auto' is 'exact' up to EXACT_MATCHING_LIMIT
+    vertices and 'greedy' above
+    """
+    if mode not in MATCHING_MODES:
+        raise ValueError(f"Unknown matching mode '{mode}', expected one of {MATCHING_MODES}")
+    if mode == 'auto':
+        return 'exact' if m <= EXACT_MATCHING_LIMIT else 'greedy'
+    return mode
+
+
+def exact_matching(matrix, stats=None) -> np.ndarray:
+    """
+    Minimum weight perfect matching on the complete graph by the blossom algorithm
+    (networkx max_weight_matching on the inverted weights), O(n^3)
+    :param matrix: m x m symmetric distance matrix, m is even
+    :param stats: Instrumentation, the edge weights read are counted (the blossom algorithm itself is not)
+    :return: (m / 2) x 2 int array of the matched ids
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    m = len(matrix)
+    if m == 0:
+        return np.zeros((0, 2), dtype=np.intp)
+    rows, cols = np.triu_indices(m, 1)
+    weights = matrix[rows, cols]
+    if stats is not None:
+        stats.count(distance_evaluations=len(weights))
+    # networkx is needed by the exact mode only
+    import networkx as nx
+    # maximal cardinality matching of (top - w) is the minimal perfect matching of w
+    top = weights.max() + 1
+    G = nx.Graph()
+    G.add_weighted_edges_from(zip(rows.tolist(), cols.tolist(), (top - weights).tolist()))
+    mate = nx.max_weight_matching(G, maxcardinality=True)
+    return np.array(sorted(tuple(sorted(pair)) for pair in mate), dtype=np.intp).reshape(-1, 2)
+
+
+def greedy_matching(matrix, stats=None) -> np.ndarray:
+    """
+    Greedy perfect matching: takes the shortest edges while both ends are free, O(m^2 log m)
+    Not optimal, intended for large numbers of odd vertices
+    :param matrix: m x m symmetric distance matrix, m is even
+    :param stats: Instrumentation, the edge weights and the scanned edges are counted (the sorting is not)
+    :return: (m / 2) x 2 int array of the matched ids
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    m = len(matrix)
+    rows, cols = np.triu_indices(m, 1)
+    order = np.argsort(matrix[rows, cols], kind='stable')
+    free = np.ones(m, dtype=bool)
+    pairs = []
+    scanned = 0
+    for k in order:
+        i, j = rows[k], cols[k]
+        scanned += 1
+        if free[i] and free[j]:
+            free[i] = free[j] = False
+            pairs.append((i, j))
+            if len(pairs) * 2 == m:
+                break
+    if stats is not None:
+        stats.count(distance_evaluations=len(rows), comparisons=scanned)
+    return np.array(pairs, dtype=np.intp).reshape(-1, 2)
+
+
+def sparse_greedy_matching(graph, stats=None) -> np.ndarray:
+    """
+    Greedy perfect matching over the candidate edges, O(m * k * log m) without a dense matrix
+    The vertices left without a free candidate are matched to the nearest free vertex
+    found by the KD-tree
+    :param graph: CandidateGraph of the vertices to match (an even number of them)
+    :param stats: Instrumentation, the edge weights and the scanned edges are counted (the sorting is not)
+    :return: (m / 2) x 2 int array of the matched ids
+    """
+    m = len(graph)
+    if m % 2 != 0:
+        raise ValueError("Perfect matching needs an even number of vertices")
+    edges = graph.edges()
+    order = np.argsort(graph.pair_distances(edges[:, 0], edges[:, 1]), kind='stable')
+    matched = np.zeros(m, dtype=bool)
+    pairs = []
+    for i, j in edges[order].tolist():
+        if not matched[i] and not matched[j]:
+            matched[i] = matched[j] = True
+            pairs.append((i, j))
+    if stats is not None:
+        stats.count(distance_evaluations=len(edges), comparisons=len(edges))
+    for i in np.flatnonzero(~matched).tolist():
+        if matched[i]:
+            continue
+        matched[i] = True
+        j = graph.nearest_unvisited(i, matched, stats)
+        matched[j] = True
+        pairs.append((min(i, j), max(i, j)))
+    return np.array(pairs, dtype=np.intp).reshape(-1, 2)
+
+
+def min_weight_matching(matrix, mode='auto', stats=None) -> np.ndarray:
+    """
+    Perfect matching of the vertices given by their distance matrix
+    :param matrix: m x m symmetric distance matrix
+    :param mode: 'exact' - blossom algorithm, 'greedy' - fast approximation,
+        'auto' - exact up to EXACT_MATCHING_LIMIT vertices, greedy above
+    :param stats: Instrumentation the operations are counted in
+    :return: (m / 2) x 2 int array of the matched ids
+    """
+    # algorithm can't be applied on odd number of vertices
+    if len(matrix) % 2 != 0:
+        raise ValueError("Perfect matching needs an even number of vertices")
+    if resolve_mode(mode, len(matrix)) == 'exact':
+        return exact_matching(matrix, stats)
+    return greedy_matching(matrix, stats)
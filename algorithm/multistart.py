@@ -0,0 +1,245 @@
+"""
+Multi-start runner: the constructions from many start nodes, seeds and solver variants
+
+The tasks (variant, start, seed) run in a process pool, the workers attach the distance
+matrix from the shared memory (shared.SharedMatrix) instead of getting a copy each. The run stops at the
+wall-clock budget, after `patience` finished tasks without an improvement or when a
+tour reaches the target length; the tasks not started by then are cancelled, the ones a worker
+picks up after the deadline are skipped and reported as timed out.
+"""
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from itertools import product
+import numpy as np
+import pandas as pd
+from .algorithm import nearest_neighbour_tour
+from .euler import euler_circuit, odd_vertices, shortcut
+from .exact import chained_local_search, dense_prim
+from .instrumentation import Instrumentation
+from .local_search import LocalSearch, neighbour_lists
+from .matching import min_weight_matching
+from .shared import PackedMatrix, SharedMatrix
+from .tour import TOUR_DTYPE, close, tour_length
+
+# nn - nearest neighbour from the start, ca - Christofides with the Euler circuit from the start
+# (best shortcut), random - a random permutation; +ls - followed by 2-opt / Or-opt,
+# chained - the chained local search (double bridge kicks) from the nearest neighbour tour
+VARIANTS = ('nn', 'nn+ls', 'ca', 'ca+ls', 'random+ls', 'chained')
+# the tasks submitted to the pool per worker at once
+IN_FLIGHT = 2
+# the tasks running at the deadline stop by themselves, their results are awaited this long, seconds
+GRACE = 0.5
+
+MultiStartResult = namedtuple('MultiStartResult', ['tour', 'length', 'table', 'stopped'])
+
+# the worker process: the matrix attached to the shared memory and the prepared data
+_shared = None
+_context = None
+
+
+def spread_starts(matrix, count, first=0) -> np.ndarray:
+    """
+    Start nodes far from each other (farthest point sampling), O(count * n)
+    :param matrix: n x n distance matrix
+    :param count: number of the starts (all the nodes if it is larger than n)
+    :param first: the first start
+    :return: int array of the node ids
+    """
+    n = len(matrix)
+    if count >= n:
+        return np.arange(n)
+    starts = [first]
+    nearest = np.array(matrix[first], dtype=np.float64)
+    for _ in range(count - 1):
+        node = int(np.argmax(nearest))
+        starts.append(node)
+        np.minimum(nearest, matrix[node], out=nearest)
+    return np.array(starts, dtype=np.intp)
+
+
+def prepare(matrix, variants) -> dict:
+    """
+    Data shared by all the starts of the variants, built once and handed to the workers
+    :param matrix: n x n distance matrix
+    :param variants: constructions (see VARIANTS)
+    :return: dict: neighbours - neighbour lists of the local search,
+        multigraph - MST and matching edges of Christofides
+    """
+    context = {}
+    n = len(matrix)
+    if any(variant != 'nn' for variant in variants):
+        context['neighbours'] = [row[row >= 0].tolist() for row in neighbour_lists(matrix, 10)]
+    if any(variant.startswith('ca') for variant in variants):
+        parent, _ = dense_prim(matrix)
+        tree = np.column_stack((np.arange(1, n), parent[1:]))
+        odd = odd_vertices(n, tree)
+        context['multigraph'] = np.concatenate((tree, odd[min_weight_matching(matrix[np.ix_(odd, odd)], 'auto')]))
+    return context
+
+
+def run_start(matrix, variant, start, seed, context, deadline=None, stats=None):
+    """
+    One task of the runner
+    :param matrix: n x n distance matrix
+    :param variant: construction (see VARIANTS)
+    :param start: start node
+    :param seed: random seed (random and chained variants)
+    :param context: prepare(matrix, variants) result
+    :param deadline: time.time() the task has to finish by
+    :param stats: Instrumentation the operations are counted in
+    :return: closed tour starting at the start node and its length
+    """
+    remaining = None if deadline is None else max(0.0, deadline - time.time())
+    n = len(matrix)
+    construction, _, improvement = variant.partition('+')
+    if construction == 'nn':
+        tour = nearest_neighbour_tour(matrix, start, stats)
+    elif construction == 'ca':
+        tour = close(shortcut(euler_circuit(n, context['multigraph'], start=start), n, 'best',
+                              matrix=matrix, stats=stats))
+    elif construction == 'random':
+        rest = np.random.default_rng(seed).permutation(np.delete(np.arange(n), start))
+        tour = np.concatenate(([start], rest, [start])).astype(TOUR_DTYPE)
+    elif construction == 'chained':
+        tour, length, _ = chained_local_search(matrix, nearest_neighbour_tour(matrix, start, stats), seed=seed,
+                                               time_limit=remaining, neighbours=context['neighbours'], stats=stats)
+        return tour, length
+    else:
+        raise ValueError(f"Unknown variant '{variant}', expected one of {VARIANTS}")
+    if improvement == 'ls' and n > 3:
+        tour = LocalSearch(time_limit=remaining).run(tour, matrix, neighbours=context['neighbours'], stats=stats)
+    return tour, tour_length(matrix, tour)
+
+
+def _attach(shared, context):
+    global _shared, _context
+    # unpickling has attached the block
+    _shared = shared
+    _context = context
+
+
+def _worker(variant, start, seed, deadline):
+    if time.time() >= deadline:
+        # submitted before the deadline, started after it
+        return None, np.nan, np.nan, {}
+    stats = Instrumentation()
+    begin = time.perf_counter()
+    tour, length = run_start(_shared.matrix, variant, start, seed, _context, deadline, stats)
+    return tour, length, time.perf_counter() - begin, stats.counters
+
+
+def multi_start(matrix, starts=8, seeds=(0,), variants=('nn+ls',), workers=1, time_limit=10, patience=None,
+                target=None, stats=None) -> MultiStartResult:
+    """
+    Runs the tasks (variant, start, seed) and keeps the shortest tour
+    :param matrix: n x n distance matrix (an array or a PackedMatrix), or a SharedMatrix the workers attach to
+    :param starts: start node ids, or their number (spread over the instance, see spread_starts)
+    :param seeds: random seeds, the deterministic variants (nn, ca) run once per start
+    :param variants: constructions (see VARIANTS)
+    :param workers: number of processes (None - all the cores), 1 - in the calling process
+    :param time_limit: wall-clock budget, seconds
+    :param patience: stop after this number of finished tasks without an improvement (None - no limit)
+    :param target: stop when a tour is not longer than this
+    :param stats: Instrumentation the operations of all the tasks are merged into
+    :return: MultiStartResult(tour, length, table, stopped): the best closed tour and its length,
+        DataFrame of the tasks (variant, start, seed, length, seconds, status: 'done', 'timeout' -
+        started after the deadline and skipped, or 'cancelled' - never started),
+        the stop reason: 'completed', 'time_limit', 'patience' or 'target';
+        the tour is None if no task has finished
+    """
+    shared = matrix if isinstance(matrix, SharedMatrix) else None
+    if shared is not None:
+        matrix = shared.matrix
+    elif not isinstance(matrix, PackedMatrix):
+        matrix = np.ascontiguousarray(matrix)
+    deadline = time.time() + time_limit
+    if np.isscalar(starts):
+        starts = spread_starts(matrix, int(starts))
+    # every start gets all the variants before the next one, a short budget still tries them all
+    tasks = []
+    for start, seed, variant in product(np.asarray(starts).tolist(), seeds, variants):
+        if variant not in VARIANTS:
+            raise ValueError(f"Unknown variant '{variant}', expected one of {VARIANTS}")
+        if variant.split('+')[0] in ('nn', 'ca') and seed != seeds[0]:
+            continue
+        tasks.append((variant, start, seed))
+    workers = os.cpu_count() if workers is None else max(1, workers)
+
+    rows = []
+    best = [None, np.inf]
+    state = {'stall': 0, 'stopped': 'completed'}
+
+    def finished(task, tour, length, seconds):
+        rows.append({'variant': task[0], 'start': task[1], 'seed': task[2], 'length': length,
+                     'seconds': seconds, 'status': 'done' if tour is not None else 'timeout'})
+        if tour is None:
+            state['stopped'] = 'time_limit'
+            return False
+        if length < best[1] - 1e-9:
+            best[:] = [tour, length]
+            state['stall'] = 0
+        else:
+            state['stall'] += 1
+        if target is not None and best[1] <= target:
+            state['stopped'] = 'target'
+        elif patience is not None and state['stall'] >= patience:
+            state['stopped'] = 'patience'
+        elif time.time() >= deadline:
+            state['stopped'] = 'time_limit'
+        return state['stopped'] == 'completed'
+
+    pending = list(reversed(tasks))
+    context = prepare(matrix, variants)
+    if workers == 1:
+        while pending:
+            task = pending.pop()
+            begin = time.perf_counter()
+            tour, length = run_start(matrix, *task, context, deadline, stats)
+            if not finished(task, tour, length, time.perf_counter() - begin):
+                break
+        if pending and state['stopped'] == 'completed':
+            state['stopped'] = 'time_limit'
+    else:
+        # the given block stays with the caller, a matrix is copied into a block of the run
+        owned = shared is None
+        if owned:
+            storage = 'float32' if matrix.dtype == np.float32 else 'float64'
+            if isinstance(matrix, PackedMatrix):
+                storage = 'packed32' if matrix.dtype == np.float32 else 'packed'
+            shared = SharedMatrix.create(matrix, storage=storage)
+        try:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(shared, context))
+            running = {}
+            try:
+                while pending or running:
+                    while pending and len(running) < IN_FLIGHT * workers and state['stopped'] == 'completed':
+                        task = pending.pop()
+                        running[pool.submit(_worker, *task, deadline)] = task
+                    if not running:
+                        break
+                    done, _ = wait(running, timeout=max(0.0, deadline - time.time()), return_when=FIRST_COMPLETED)
+                    if not done:
+                        state['stopped'] = 'time_limit'
+                        done, _ = wait(running, timeout=GRACE)
+                    for future in done:
+                        tour, length, seconds, counters = future.result()
+                        if stats is not None:
+                            stats.merge(counters)
+                        finished(running.pop(future), tour, length, seconds)
+                    if state['stopped'] != 'completed':
+                        break
+            finally:
+                # the queued tasks are dropped, the running ones of an early stop finish in
+                # the background by the deadline (the shared memory stays mapped until then)
+                pool.shutdown(wait=state['stopped'] == 'completed', cancel_futures=True)
+            pending.extend(running.values())
+        finally:
+            if owned:
+                shared.close()
+
+    rows.extend({'variant': task[0], 'start': task[1], 'seed': task[2], 'length': np.nan, 'seconds': np.nan,
+                 'status': 'cancelled'} for task in reversed(pending))
+    table = pd.DataFrame(rows, columns=['variant', 'start', 'seed', 'length', 'seconds', 'status'])
+    return MultiStartResult(best[0], float(best[1]), table, state['stopped'])
@@ -0,0 +1,123 @@
+import numpy as np
+from .distances import distance_matrix, long_form, DEFAULT_METRIC
+from .shared import PackedMatrix
+from .tour import path_length, tour_length
+
+
+class DistanceOracle:
+    """
+    Distance lookups for a selection of cities
+    Keeps the symmetric distance matrix as a contiguous NumPy array and maps
+    city names to the integer ids (rows of the matrix), so every lookup is O(1).
+    A float32 or a packed matrix (see shared.STORAGES) is kept as it is, without a copy,
+    the subsets are float64.
+    """
+
+    def __init__(self, names, matrix):
+        """
+        Class constructor
+        :param names: city names in the matrix order
+        :param matrix: n x n symmetric distance matrix: an array, a memory map or a PackedMatrix
+        """
+        self._names = list(names)
+        self._index = {name: i for i, name in enumerate(self._names)}
+        if len(self._index) != len(self._names):
+            raise ValueError("City names must be unique")
+        if isinstance(matrix, PackedMatrix):
+            self._matrix = matrix
+        else:
+            matrix = np.asarray(matrix)
+            dtype = matrix.dtype if matrix.dtype in (np.float32, np.float64) else np.float64
+            self._matrix = np.ascontiguousarray(matrix, dtype=dtype)
+        if self._matrix.shape != (len(self._names), len(self._names)):
+            raise ValueError("The matrix shape doesn't match the number of names")
+        self._df_dist = None
+
+    @classmethod
+    def from_frame(cls, df, metric=DEFAULT_METRIC):
+        """
+        Builds the oracle for the cities DataFrame
+        :param df: DataFrame, index - city names, columns - lat, long
+        :param metric: distance metric name (see distances.METRICS)
+        :return: DistanceOracle
+        """
+        return cls(df.index, distance_matrix(df['lat'].values, df['long'].values, metric=metric))
+
+    @property
+    def names(self):
+        return self._names
+
+    @property
+    def index(self):
+        return self._index
+
+    @property
+    def matrix(self):
+        return self._matrix
+
+    @property
+    def df_dist(self):
+        """
+        Long-form (city1, city2, dist) view, built on the first access
+        """
+        if self._df_dist is None:
+            self._df_dist = long_form(self._matrix, self._names)
+        return self._df_dist
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def ids(self, names) -> np.ndarray:
+        """
+        Converts city names into the matrix ids
+        :param names: iterable of city names
+        :return: int array of ids
+        """
+        return np.fromiter((self._index[name] for name in names), dtype=np.intp)
+
+    def subset(self, names):
+        """
+        Oracle for a part of the cities without recomputing the distances
+        :param names: city names to keep, in the required order
+        :return: DistanceOracle
+        """
+        ids = self.ids(names)
+        return DistanceOracle([self._names[i] for i in ids],
+                              np.asarray(self._matrix[np.ix_(ids, ids)], dtype=np.float64))
+
+    def distance(self, city1, city2) -> float:
+        """
+        Distance between two cities
+        :param city1: city 1 name
+        :param city2: city 2 name
+        :return: distance, km
+        """
+        return float(self._matrix[self._index[city1], self._index[city2]])
+
+    def pair_distances(self, pairs) -> np.ndarray:
+        """
+        Distances for a list of pairs
+        :param pairs: iterable of (city1, city2)
+        :return: float array of distances
+        """
+        pairs = list(pairs)
+        if not pairs:
+            return np.zeros(0)
+        first = self.ids(pair[0] for pair in pairs)
+        second = self.ids(pair[1] for pair in pairs)
+        return np.asarray(self._matrix[first, second], dtype=np.float64)
+
+    def tour_length(self, tour, closed=False) -> float:
+        """
+        Total length of the route going through the cities in order
+        :param tour: sequence of city names
+        :param closed: add the edge from the last city back to the first one
+        :return: distance, km
+        """
+        ids = self.ids(tour)
+        if closed:
+            return tour_length(self._matrix, ids)
+        return path_length(self._matrix, ids)
@@ -0,0 +1,244 @@
+"""
+Distance matrix storage shared by the processes
+
+The matrix is kept once, in a multiprocessing.shared_memory block (SharedMatrix) or in a
+memory-mapped .npy file (DistanceCache), the processes get NumPy views of it without a copy.
+The storage options trade the footprint for the precision and the access speed:
+    float64  - n x n, 8 n^2 bytes
+    float32  - n x n, 4 n^2 bytes (about 1 m of precision at the Earth scale)
+    packed   - the upper triangle without the diagonal, 4 n^2 bytes
+    packed32 - both, 2 n^2 bytes
+a packed matrix is read through PackedMatrix: rows, pairs and submatrices are gathered
+from the triangle, the dense subsets handed to the solvers are float64.
+"""
+from multiprocessing import shared_memory
+import numpy as np
+
+# storage name: (dtype, packed)
+STORAGES = {'float64': (np.float64, False),
+            'float32': (np.float32, False),
+            'packed': (np.float64, True),
+            'packed32': (np.float32, True)}
+
+
+def storage_options(storage):
+    """
+    :param storage: storage name (see STORAGES)
+    :return: (dtype, packed)
+    """
+    if storage not in STORAGES:
+        raise ValueError(f"Unknown storage '{storage}', expected one of {tuple(STORAGES)}")
+    return STORAGES[storage]
+
+
+def packed_size(n) -> int:
+    return n * (n - 1) // 2
+
+
+def packed_offset(i, n):
+    """
+    Position of the element (i, i + 1) in the packed array, the row i takes the next n - i - 1 ones
+    :param i: row id or an int array of them
+    :param n: number of nodes
+    """
+    return i * (2 * n - i - 1) // 2
+
+
+def pack(matrix, out=None, dtype=np.float64) -> np.ndarray:
+    """
+    Upper triangle of the symmetric matrix row by row, without the diagonal
+    A row at a time, so no index arrays of the triangle size are built
+    :param matrix: n x n distance matrix (an array or a memory map)
+    :param out: array of packed_size(n) to fill
+    :param dtype: dtype of the new array if out is None
+    :return: packed array
+    """
+    n = len(matrix)
+    if out is None:
+        out = np.empty(packed_size(n), dtype=dtype)
+    offset = 0
+    for i in range(n - 1):
+        out[offset:offset + n - i - 1] = matrix[i, i + 1:]
+        offset += n - i - 1
+    return out
+
+
+class PackedMatrix:
+    """
+    Read-only n x n view of a packed symmetric matrix
+    Supports the indexing the oracle and the tour helpers use: matrix[i] (a row),
+    matrix[i, j] and matrix[ids1, ids2] with broadcasting (np.ix_ included), and
+    matrix.item(i, j) as ndarray.item for the scalar loops; np.asarray unpacks it into
+    a dense copy.
+    """
+
+    def __init__(self, data, n):
+        """
+        Class constructor
+        :param data: packed array of packed_size(n) (see pack)
+        :param n: number of nodes
+        """
+        if len(data) != packed_size(n):
+            raise ValueError("The packed array size doesn't match the number of nodes")
+        self.data = data
+        self.n = n
+        # the element (i, j), i < j, is at _offsets[i] + j
+        rows = np.arange(n, dtype=np.int64)
+        self._offsets = packed_offset(rows, n) - rows - 1
+
+    @property
+    def shape(self):
+        return self.n, self.n
+
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    def __len__(self):
+        return self.n
+
+    def row(self, i) -> np.ndarray:
+        """
+        Distances from the node to all the nodes
+        :param i: node id
+        :return: float array of n
+        """
+        i = int(i)
+        ids = np.arange(i)
+        out = np.empty(self.n, dtype=self.dtype)
+        out[:i] = self.data[self._offsets[ids] + i]
+        out[i] = 0
+        out[i + 1:] = self.data[self._offsets[i] + i + 1:self._offsets[i] + self.n]
+        return out
+
+    def item(self, i, j) -> float:
+        """
+        Distance between two nodes as a Python float
+        """
+        if i == j:
+            return 0.0
+        if i > j:
+            i, j = j, i
+        return self.data.item(self._offsets[i] + j)
+
+    def pairs(self, ids1, ids2) -> np.ndarray:
+        """
+        Distances of the pairs, the id arrays are broadcast against each other
+        :return: float array of the broadcast shape
+        """
+        ids1, ids2 = np.broadcast_arrays(np.asarray(ids1, dtype=np.int64), np.asarray(ids2, dtype=np.int64))
+        if self.n < 2:
+            return np.zeros(ids1.shape, dtype=self.dtype)
+        low, high = np.minimum(ids1, ids2), np.maximum(ids1, ids2)
+        diagonal = low == high
+        values = self.data[np.where(diagonal, 0, self._offsets[low] + high)]
+        return np.where(diagonal, 0, values).astype(self.dtype, copy=False)
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            if len(key) != 2:
+                raise IndexError("A packed matrix takes one or two indices")
+            if isinstance(key[0], slice) or isinstance(key[1], slice):
+                raise IndexError("A packed matrix doesn't support slices, use row or pairs")
+            values = self.pairs(*key)
+            return values[()] if values.ndim == 0 else values
+        if np.ndim(key) == 0:
+            return self.row(key)
+        return self.pairs(np.asarray(key)[:, None], np.arange(self.n))
+
+    def __array__(self, dtype=None, copy=None):
+        dense = self.pairs(np.arange(self.n)[:, None], np.arange(self.n))
+        return dense if dtype is None else dense.astype(dtype, copy=False)
+
+
+class SharedMatrix:
+    """
+    Distance matrix in a shared memory block
+    The process that creates it owns the block and unlinks it, the pickled object carries
+    the block name only: unpickled in a worker process it attaches to the same memory.
+    """
+
+    def __init__(self, memory, n, dtype, packed, owner):
+        self._memory = memory
+        self.n = n
+        self.dtype = np.dtype(dtype)
+        self.packed = packed
+        self.owner = owner
+        shape = (packed_size(n),) if packed else (n, n)
+        self._data = np.ndarray(shape, dtype=self.dtype, buffer=memory.buf)
+        self._matrix = PackedMatrix(self._data, n) if packed else self._data
+
+    @classmethod
+    def create(cls, matrix, storage='float64'):
+        """
+        Copies the matrix into a new shared memory block
+        :param matrix: n x n distance matrix (an array, a memory map or a PackedMatrix)
+        :param storage: storage name (see STORAGES)
+        :return: SharedMatrix, the owner of the block
+        """
+        dtype, packed = storage_options(storage)
+        n = len(matrix)
+        size = (packed_size(n) if packed else n * n) * np.dtype(dtype).itemsize
+        memory = shared_memory.SharedMemory(create=True, size=max(1, size))
+        shared = cls(memory, n, dtype, packed, owner=True)
+        if packed and isinstance(matrix, PackedMatrix):
+            shared._data[...] = matrix.data
+        elif packed:
+            pack(matrix, out=shared._data)
+        else:
+            shared._data[...] = matrix
+        return shared
+
+    @classmethod
+    def attach(cls, name, n, dtype, packed):
+        """
+        Attaches to the block created by another process
+        :param name: shared memory block name
+        :return: SharedMatrix, not the owner
+        """
+        return cls(shared_memory.SharedMemory(name=name), n, dtype, packed, owner=False)
+
+    def __reduce__(self):
+        return SharedMatrix.attach, (self.name, self.n, self.dtype.str, self.packed)
+
+    @property
+    def name(self):
+        return self._memory.name
+
+    @property
+    def matrix(self):
+        """
+        Zero-copy view: n x n ndarray, or PackedMatrix for the packed storage
+        """
+        return self._matrix
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+    def __len__(self):
+        return self.n
+
+    def close(self):
+        """
+        Releases the mapping of this process, the owner removes the block as well
+        The views must not be used after that
+        """
+        self._matrix = self._data = None
+        try:
+            self._memory.close()
+        except BufferError:
+            # a view is still referenced, the mapping is released with it
+            pass
+        if self.owner:
+            self._memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,25 @@
+from .algorithm import NearestNeighbour
+from .christ import ChristAlgorithm
+from .concord import ConcordAlgorithm
+
+SOLVERS = {'NN': NearestNeighbour,
+           'CA': ChristAlgorithm,
+           'CC': ConcordAlgorithm}
+
+
+def make_solver(alg, df, oracle=None, local_search=False, **kwargs):
+    """
+    Solver object for the algorithm code
+    :param alg: algorithm code: 'NN', 'CA' or 'CC'
+    :param df: DataFrame of the cities, index - city names, columns - lat, long
+    :param oracle: DistanceOracle of the cities
+    :param local_search: improvement stage run after the construction
+    :param kwargs: other solver arguments (start for NN, the first city by default)
+    :return: NearestNeighbour, ChristAlgorithm or ConcordAlgorithm
+    """
+    if alg not in SOLVERS:
+        raise ValueError("Incorrect algorithm type")
+    if alg == 'NN':
+        return NearestNeighbour(df, kwargs.pop('start', df.index[0]), oracle=oracle, local_search=local_search,
+                                **kwargs)
+    return SOLVERS[alg](df, oracle=oracle, local_search=local_search, **kwargs)
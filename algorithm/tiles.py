@@ -0,0 +1,113 @@
+"""
+Distance matrix computed tile by tile into a memory-mapped .npy file
+
+The matrix doesn't have to fit in the memory: the upper triangle is cut into square tiles,
+a tile is computed in one vectorized pass and written to the file with its mirror (the packed
+storage keeps the triangle only). The working memory is bounded by the tile size; the tiles
+run in a process pool whose workers write to the same file. The result is opened read-only,
+the solvers read its rows on demand (see open_matrix).
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+from .distances import DEFAULT_METRIC, TILE, compute_tile, get_metric, tile_bounds
+from .shared import PackedMatrix, packed_offset, packed_size, storage_options
+
+# tiles submitted to the pool per worker at once
+IN_FLIGHT = 4
+
+# the worker process: the file memory map and the coordinates
+_target = None
+
+
+def write_tile(out, block, bounds, n, packed):
+    """
+    Writes the tile and its mirror to the n x n array, or its upper triangle part to the packed one
+    """
+    r0, r1, c0, c1 = bounds
+    if not packed:
+        out[r0:r1, c0:c1] = block
+        if r0 != c0:
+            out[c0:c1, r0:r1] = block.T
+        return
+    for i in range(r0, r1):
+        first = max(c0, i + 1)
+        if first < c1:
+            offset = packed_offset(i, n) + first - i - 1
+            out[offset:offset + c1 - first] = block[i - r0, first - c0:]
+
+
+def open_matrix(path, n):
+    """
+    Read-only memory map of the matrix file, nothing is read until used
+    :param path: .npy file (see compute_matrix)
+    :param n: number of nodes
+    :return: n x n memory-mapped array, or PackedMatrix over the packed one
+    """
+    data = np.load(path, mmap_mode='r')
+    if data.ndim == 1:
+        return PackedMatrix(data, n)
+    if data.shape != (n, n):
+        raise ValueError("The matrix file doesn't match the number of nodes")
+    return data
+
+
+def _open(path, lat, long, metric, packed):
+    global _target
+    _target = np.load(path, mmap_mode='r+'), lat, long, metric, packed
+
+
+def _tile_worker(bounds):
+    out, lat, long, metric, packed = _target
+    # a shared mapping: the pages are seen by the other processes without a flush
+    write_tile(out, compute_tile(lat, long, bounds, metric), bounds, len(lat), packed)
+
+
+def compute_matrix(lat, long, path, metric=DEFAULT_METRIC, storage='float64', tile=TILE, workers=1,
+                   on_progress=None):
+    """
+    Writes the distance matrix to the .npy file tile by tile
+    :param lat: latitudes (degrees), array-like of length n
+    :param long: longitudes (degrees), array-like of length n
+    :param path: output file, overwritten
+    :param metric: distance metric name (see distances.METRICS), a picklable callable for workers > 1
+    :param storage: 'float64', 'float32', 'packed' or 'packed32' (see shared.STORAGES)
+    :param tile: tile side, the working memory per process is O(tile^2)
+    :param workers: number of processes (None - all the cores), 1 - in the calling process
+    :param on_progress: callback(done, total) called after every written tile
+    :return: the read-only matrix (see open_matrix)
+    """
+    lat = np.asarray(lat, dtype=np.float64).ravel()
+    long = np.asarray(long, dtype=np.float64).ravel()
+    if lat.shape != long.shape:
+        raise ValueError("lat and long must have the same length")
+    get_metric(metric)
+    dtype, packed = storage_options(storage)
+    n = len(lat)
+    out = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(packed_size(n),) if packed else (n, n))
+    bounds = tile_bounds(n, tile)
+    workers = os.cpu_count() if workers is None else max(1, workers)
+    if workers == 1:
+        for done, part in enumerate(bounds, 1):
+            write_tile(out, compute_tile(lat, long, part, metric), part, n, packed)
+            if on_progress is not None:
+                on_progress(done, len(bounds))
+    else:
+        # the header is written on the creation, the workers map the file themselves
+        pending = list(reversed(bounds))
+        done = 0
+        with ProcessPoolExecutor(max_workers=workers, initializer=_open,
+                                 initargs=(path, lat, long, metric, packed)) as pool:
+            running = set()
+            while pending or running:
+                while pending and len(running) < IN_FLIGHT * workers:
+                    running.add(pool.submit(_tile_worker, pending.pop()))
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    future.result()
+                    done += 1
+                    if on_progress is not None:
+                        on_progress(done, len(bounds))
+    out.flush()
+    del out
+    return open_matrix(path, n)
@@ -0,0 +1,140 @@
+import numpy as np
+
+# tours are arrays of the node ids, int32 halves the memory of the intp ones (n < 2^31)
+TOUR_DTYPE = np.int32
+
+
+def as_tour(tour) -> np.ndarray:
+    """
+    Open tour array: each node once, the edge from the last node back to the first is implied
+    :param tour: ids of the cycle, open or closed (first == last)
+    :return: int32 array
+    """
+    tour = np.asarray(tour, dtype=TOUR_DTYPE)
+    if len(tour) > 1 and tour[0] == tour[-1]:
+        return tour[:-1]
+    return tour
+
+
+def close(tour) -> np.ndarray:
+    """
+    Closed form of an open tour (the first node repeated at the end)
+    """
+    tour = np.asarray(tour, dtype=TOUR_DTYPE)
+    return np.append(tour, tour[:1])
+
+
+def path_length(matrix, path) -> float:
+    """
+    Length of the route through the nodes in order, not closed
+    :param matrix: n x n distance matrix
+    :param path: sequence of ids
+    :return: length
+    """
+    path = np.asarray(path)
+    if len(path) < 2:
+        return 0.0
+    return float(matrix[path[:-1], path[1:]].sum())
+
+
+def tour_length(matrix, tour) -> float:
+    """
+    Length of the cycle
+    :param matrix: n x n distance matrix
+    :param tour: ids, open or closed
+    :return: length
+    """
+    tour = as_tour(tour)
+    if len(tour) < 2:
+        return 0.0
+    return float(matrix[tour, np.roll(tour, -1)].sum())
+
+
+def tour_lengths(matrix, tours, batch=4096) -> np.ndarray:
+    """
+    Lengths of many tours at once
+    :param matrix: n x n distance matrix
+    :param tours: k x m array of the tours, all open or all closed
+    :param batch: number of tours gathered together (bounds the k x m working array)
+    :return: float array of k lengths
+    """
+    tours = np.asarray(tours)
+    if tours.ndim != 2 or tours.shape[1] < 2:
+        return np.zeros(len(tours))
+    if not np.all(tours[:, 0] == tours[:, -1]):
+        tours = np.concatenate((tours, tours[:, :1]), axis=1)
+    lengths = np.empty(len(tours))
+    for i in range(0, len(tours), batch):
+        part = tours[i:i + batch]
+        lengths[i:i + batch] = matrix[part[:, :-1], part[:, 1:]].sum(axis=1)
+    return lengths
+
+
+def two_opt_delta(matrix, tour, i, j):
+    """
+    Length change of the reversal of the segment tour[i..j] (positions of the open tour, cyclic)
+    The edges (tour[i - 1], tour[i]) and (tour[j], tour[j + 1]) are replaced by
+    (tour[i - 1], tour[j]) and (tour[i], tour[j + 1])
+    :param matrix: n x n distance matrix, or any object with the matrix[a, b] lookup
+    :param tour: open tour
+    :param i: start position(s), int or int array
+    :param j: end position(s)
+    :return: delta (negative - shorter), an array for the array positions
+    """
+    n = len(tour)
+    a, b = tour[(i - 1) % n], tour[i % n]
+    c, d = tour[j % n], tour[(j + 1) % n]
+    delta = matrix[a, c] + matrix[b, d] - matrix[a, b] - matrix[c, d]
+    # the reversal of the whole cycle (or all but one node) changes nothing
+    if np.ndim(delta) == 0:
+        return 0.0 if (j - i) % n >= n - 2 else delta
+    return np.where((j - i) % n >= n - 2, 0.0, delta)
+
+
+def apply_two_opt(tour, i, j) -> np.ndarray:
+    """
+    Tour with the segment tour[i..j] reversed (i <= j)
+    """
+    tour = np.array(tour, dtype=TOUR_DTYPE)
+    tour[i:j + 1] = tour[i:j + 1][::-1]
+    return tour
+
+
+def or_opt_delta(matrix, tour, i, length, k, reverse=False):
+    """
+    Length change of moving the segment tour[i..i + length - 1] between tour[k] and tour[k + 1]
+    :param matrix: n x n distance matrix, or any object with the matrix[a, b] lookup
+    :param tour: open tour
+    :param i: segment start position(s), int or int array
+    :param length: segment length
+    :param k: position(s) of the node the segment is inserted after, outside the segment
+        and not its predecessor
+    :param reverse: insert the segment reversed
+    :return: delta (negative - shorter), an array for the array positions
+    """
+    n = len(tour)
+    first, last = tour[i % n], tour[(i + length - 1) % n]
+    p, q = tour[(i - 1) % n], tour[(i + length) % n]
+    c, e = tour[k % n], tour[(k + 1) % n]
+    removal = matrix[p, first] + matrix[last, q] - matrix[p, q]
+    if reverse:
+        first, last = last, first
+    insertion = matrix[c, first] + matrix[last, e] - matrix[c, e]
+    return insertion - removal
+
+
+def apply_or_opt(tour, i, length, k, reverse=False) -> np.ndarray:
+    """
+    Tour with the segment tour[i..i + length - 1] moved between tour[k] and tour[k + 1]
+    (the same arguments as or_opt_delta), the first node may change
+    """
+    tour = np.asarray(tour, dtype=TOUR_DTYPE)
+    n = len(tour)
+    positions = (i + np.arange(length)) % n
+    segment = tour[positions]
+    if reverse:
+        segment = segment[::-1]
+    target = tour[k % n]
+    rest = np.delete(tour, positions)
+    at = int(np.flatnonzero(rest == target)[0]) + 1
+    return np.concatenate((rest[:at], segment, rest[at:])).astype(TOUR_DTYPE)
@@ -1,27 +1,60 @@
-from geopy.distance import geodesic
-from itertools import product, combinations_with_replacement
 import pandas as pd
+from .distances import distance_matrix, long_form, DEFAULT_METRIC
+from .oracle import DistanceOracle
+from .candidates import CandidateGraph, candidate_graph
 
 
-def distances_table(df, permute=False) -> pd.DataFrame:
-    cities1, cities2, distances = [], [], []
-    if permute:
-        iterator = product(list(df.index), repeat=2)
-    else:
-        iterator = combinations_with_replacement(list(df.index), 2)
+def distances_table(df, permute=False, metric=DEFAULT_METRIC) -> pd.DataFrame:
+    """
+    Long-form distances table derived from the dense distance matrix
+    :param df: DataFrame, index - city names, columns - lat, long
+    :param permute: all the ordered pairs if True, otherwise unordered ones with the diagonal
+    :param metric: distance metric name (see distances.METRICS)
+    :return: DataFrame with the columns city1, city2, dist
+    """
+    matrix = distance_matrix(df['lat'].values, df['long'].values, metric=metric)
+    return long_form(matrix, df.index, permute=permute)
 
-    for city1, city2 in iterator:
-        cities1.append(city1)
-        cities2.append(city2)
-        g_city1 = (df.at[city1, 'lat'], df.at[city1, 'long'])
-        g_city2 = (df.at[city2, 'lat'], df.at[city2, 'long'])
-        distances.append(geodesic(g_city1, g_city2).km)
 
-    return pd.DataFrame({'city1': cities1, 'city2': cities2, 'dist': distances})
+def get_oracle(df, oracle=None) -> DistanceOracle:
+    """
+    Distance oracle for the selection
+    :param df: DataFrame, index - city names, columns - lat, long
+    :param oracle: already built DistanceOracle (may cover more cities than df)
+    :return: DistanceOracle with the cities in the df order
+    """
+    if oracle is None:
+        return DistanceOracle.from_frame(df)
+    if oracle.names != list(df.index):
+        return oracle.subset(df.index)
+    return oracle
+
+
+def get_candidates(df, candidates):
+    """
+    Candidate graph for the selection
+    :param df: DataFrame, index - city names, columns - lat, long
+    :param candidates: CandidateGraph built in the df order or the list length k
+    :return: CandidateGraph
+    """
+    if isinstance(candidates, CandidateGraph):
+        if len(candidates) != len(df):
+            raise ValueError("The candidate graph doesn't match the selection")
+        return candidates
+    return candidate_graph(df['lat'].values, df['long'].values, k=int(candidates))
 
 
 def get_distance(node1, node2, df_dist):
+    """
+    Distance between two cities
+    :param node1: city 1
+    :param node2: city 2
+    :param df_dist: DistanceOracle (O(1) lookup) or the long-form distances table
+    :return: distance, km
+    """
+    if isinstance(df_dist, DistanceOracle):
+        return df_dist.distance(node1, node2)
     df = df_dist.loc[(df_dist.city1 == node1) & (df_dist.city2 == node2)]
     if len(df) == 0:
         df = df_dist.loc[(df_dist.city1 == node2) & (df_dist.city2 == node1)]
-    return df.at[list(df.index)[0], 'dist']
\ No newline at end of file
+    return df.at[list(df.index)[0], 'dist']
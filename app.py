@@ -2,14 +2,23 @@ import dash_core_components as dcc
 import dash_html_components as html
 import dash_bootstrap_components as dbc
 import dash
-from dash.dependencies import Input, Output, State
-import pandas as pd
+from dash.dependencies import Input, Output, State, ClientsideFunction
 import dash_daq as daq
+import flask
+import time
+import uuid
 from dash.exceptions import PreventUpdate
-from algorithm.algorithm import NearestNeighbour
-from algorithm.christ import ChristAlgorithm
-from algorithm.concord import ConcordAlgorithm
+from algorithm.cache import DistanceCache
+from algorithm.solvers import SOLVERS
+from applog import configure_logging
+from catalogue import load_catalogue
+from jobs import JobManager, QueueFull, solve_into_store, stats_key, FAILED, CANCELLED, TIMEOUT, DONE, JOB_TIMEOUT
+import metrics
 from plotly_objects import BaseMap
+from sessions import SessionStore, new_session
+
+# JSON lines in app.log (APP_LOG), written by a background thread
+configure_logging()
 
 alg_lst = [{'label': 'Nearest Neighbor', 'value': 'NN'},
            {'label': 'Christofides Algorithm', 'value': 'CA'},
@@ -30,26 +39,106 @@ body = {
           'guarantees that its solutions will be within a factor of 3/2 of the optimal solution length, '
           'and is named after Nicos Christofides and Anatoliy I. Serdyukov, who discovered it independently in '
           '1976.',
-    "CC": 'Concorde algorithm (suboptimal)'}
+    "CC": 'Exact and near-optimal solver. Selections of up to 16 cities are solved exactly by the Held-Karp '
+          'dynamic programming. Larger ones run a chained 2-opt / Or-opt local search with random double bridge '
+          'kicks within a time limit, while the Held-Karp 1-tree lower bound shows how far the tour can be from '
+          'the optimum.'}
 
 interval_ms = 2000
 
+# 'client' - the solver frames are sent to the browser once and played there (assets/playback.js),
+# 'server' - the run-timer asks the server for every frame
+PLAYBACK = 'client'
+
 """ table loading 
 index - cities' names
 columns - long, lat
 """
 
-df = pd.read_excel('assets/gps_cities.xlsx')
-df['checked'] = False
-df.set_index('city', inplace=True, drop=True)
+df = load_catalogue('assets/gps_cities.xlsx', on_lookup=metrics.cache_lookup('catalogue'))
+
+# the catalogue distances are computed once and memory-mapped, the selections are sliced from them
+with metrics.DISTANCE_MATRIX_SECONDS.time():
+    catalogue = DistanceCache(on_lookup=metrics.cache_lookup('distances')).load(df)
+
+""" state of the sessions
+the small per-tab state (selection, zoom, animation counter) lives in the browser (dcc.Store),
+the solver results are written once to the server-side store shared by all the workers
+"""
+store = SessionStore(on_lookup=metrics.cache_lookup('results'))
+
+# solves run in separate processes, the run-timer polls the store for the result
+solver_jobs = JobManager(poll_interval=0.5, on_update=metrics.observe_jobs)
+# jobs submitted by this worker, run token: job id
+local_jobs = {}
+
+
+def render(session, result=None, index=None):
+    """
+    Map of the session state
+    :param session: session state, its shown frame is updated
+    :param result: solver result
+    :param index: number of the animation frame to highlight
+    :return: Plotly figure
+    """
+    selected = df.loc[df.index.isin(session['checked'])]
+    figure = BaseMap(cities=df, selected=selected if len(selected) > 0 else None)
+    if session['zoom'] is not None:
+        figure.zoom = session['zoom']
+    if result is None:
+        session['shown'] = None
+        return serialize(figure.get_map())
+    session['shown'] = index
+    return serialize(figure.get_map(*get_frame(result, index)))
+
+
+def serialize(figure):
+    """
+    The figure as the JSON-ready dict Dash sends, the conversion time goes to the metrics
+    """
+    with metrics.FIGURE_SECONDS.time():
+        return figure.to_plotly_json()
 
-path, path_2, nodes, time_tracking = {}, {}, {}, {}
-counter, distance, complexity = 0, 0, 0
-highlight_path, second_highlight_path, highlight_nodes = [], [], []
 
-pause_state = False
+def show_frame(session, result, index):
+    """
+    Figure update showing the animation frame: only the new edges if the previous frame
+    is on the screen, the whole figure otherwise
+    :param session: session state, its shown frame is updated
+    :param result: solver result
+    :param index: number of the animation frame
+    :return: figure and extendData values
+    """
+    if session['shown'] == index:
+        return dash.no_update, dash.no_update
+    if session['shown'] is not None and session['shown'] == index - 1:
+        delta = BaseMap(cities=df).frame_delta(get_frame(result, index - 1), get_frame(result, index))
+        if delta is not None:
+            session['shown'] = index
+            return dash.no_update, delta
+    return render(session, result, index), dash.no_update
 
-main_figure = BaseMap(cities=df)
+
+def get_frame(result, counter):
+    return result['path'][counter], result['path_2'][counter], result['nodes'][counter]
+
+
+def drop_run(session):
+    """
+    Cancels the session job (if it runs in this worker) and removes its result
+    """
+    job_id = local_jobs.pop(session['job'], None)
+    if job_id is not None:
+        solver_jobs.forget(job_id)
+    if session['result'] is not None:
+        store.delete(session['result'])
+    session.update(job=None, deadline=None, result=None, counter=0, pause=False, shown=None)
+    # the jobs whose results were picked up by the other workers
+    for token, job_id in list(local_jobs.items()):
+        try:
+            solver_jobs.poll(job_id)
+        except KeyError:
+            del local_jobs[token]
 
 
 def navBar():
@@ -73,6 +162,17 @@ def dashboard():
     :return:
     """
 
+    # animation player of the browser playback
+    player = dbc.Row(children=[
+        dbc.Button('<', id='step-back', color='secondary', className='mr-1',
+                   style={'width': '54px'}, disabled=True),
+        dbc.Button('Play', id='play', color='primary', className='mr-1',
+                   style={'width': '112px'}, disabled=True),
+        dbc.Button('>', id='step-forward', color='secondary', className='mr-1',
+                   style={'width': '54px'}, disabled=True)
+    ], justify='center', style={'margin-top': '8px'}
+    )
+
     # controls (left upper panel)
     controls = dbc.Card(
         [
@@ -90,7 +190,12 @@ def dashboard():
                                                 'margin-left': '-1px'})
                         )
                     ]
-                    )
+                    ),
+                    dbc.Checklist(id='improve',
+                                  options=[{'label': '2-opt / Or-opt improvement', 'value': 'LS'}],
+                                  value=[],
+                                  switch=True,
+                                  style={'margin-top': '8px'})
                 ]),
             dbc.Row(children=[
                 dbc.Button('Run', id='launch', color='success', className='mr-1',
@@ -99,10 +204,12 @@ def dashboard():
                            style={'width': '112px', 'margin-left': '10px'})
 
             ], justify='center'
-            ),
+            )] + ([player] if PLAYBACK == 'client' else []) + [
             dbc.Row(children=[
+                # the browser playback has the controls of its own
                 dbc.Button('Pause', id='pause', color='primary', className='mr-1',
-                           style={'width': '112px'}, disabled=True),
+                           style={'width': '112px', 'display': 'none'} if PLAYBACK == 'client' else {'width': '112px'},
+                           disabled=True),
                 dbc.Button('Info', id='help', color='secondary', className='mr-1',
                            style={'width': '112px', 'margin-left': '10px'})
 
@@ -134,7 +241,8 @@ def dashboard():
                 ], width='auto'
                 )
             ]
-            )
+            ),
+            html.Div(id='run-stats', style={'font-size': '11px', 'margin-top': '8px'})
         ], body=True, style={'margin-right': '20px', 'margin-left': '20px'}
     )
 
@@ -149,7 +257,7 @@ def dashboard():
             dbc.Col(children=[
                 # main graph constructor
                 dcc.Graph(id='main-graph',
-                          figure=main_figure.get_map(initial=True),
+                          figure=BaseMap(cities=df).get_map(initial=True),
                           style={'margin-top': '20px'},
                           config={'scrollZoom': True}),
 
@@ -171,9 +279,36 @@ def make_modal(alg_name):
             )]
 
 
+def stats_view(stats):
+    """
+    Operation counters, times and memory of a run for the gauges panel
+    :param stats: Instrumentation.as_dict of the run
+    :return: list of html elements
+    """
+    counters = stats['counters']
+    memory = 'traced peak' if stats['memory'] == 'traced' else 'peak RSS'
+    rows = [html.Div(f"{counters['distance_evaluations']:,} distance evaluations, "
+                     f"{counters['comparisons']:,} comparisons, {counters['relaxations']:,} relaxations"),
+            html.Div(f"wall {stats['wall_time']:.3f} s, CPU {stats['cpu_time']:.3f} s, "
+                     f"{memory} {stats['peak_memory'] / 2 ** 20:.1f} MB")]
+    rows += [html.Div(f"{name}: {phase['wall_time']:.3f} s, "
+                      f"{sum(phase[counter] for counter in counters):,} operations")
+             for name, phase in stats['phases'].items()]
+    return rows
+
+
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 app.config.suppress_callback_exceptions = True
 server = app.server
+metrics.register(server)
+
+
+@server.route('/stats')
+def solver_stats():
+    """
+    The latest run statistics of every algorithm (counters, times, memory, phases) as JSON
+    """
+    return flask.jsonify({alg: store.get(stats_key(alg)) for alg in SOLVERS})
 
 
 @app.callback(
@@ -226,7 +361,10 @@ def toggle_modal(n1, n2, is_open, alg_name):
      Output('distance-display', 'value'),
      Output('complex-display', 'value'),
      Output('pause', 'disabled'),
-     Output('pause', 'children')],
+     Output('pause', 'children'),
+     Output('session', 'data'),
+     Output('main-graph', 'extendData'),
+     Output('frames', 'data')],
     [Input('main-graph', 'clickData'),
      Input('launch', 'n_clicks'),
      Input('run-timer', 'n_intervals'),
@@ -234,9 +372,11 @@ def toggle_modal(n1, n2, is_open, alg_name):
      Input('reset', 'n_clicks'),
      Input('main-graph', 'relayoutData'),
      Input('pause', 'n_clicks')],
-    State('run-timer', 'disabled')
+    [State('run-timer', 'disabled'),
+     State('improve', 'value'),
+     State('session', 'data')]
 )
-def display_click_data(click_data, n, timer, alg, n2, rel_data, n3, run_timer_status):
+def display_click_data(click_data, n, timer, alg, n2, rel_data, n3, run_timer_status, improve, session):
     """
     Main callback updating the graph
     :param click_data: point selection callback
@@ -247,144 +387,277 @@ def display_click_data(click_data, n, timer, alg, n2, rel_data, n3, run_timer_st
     :param n3: pause button callback
     :param rel_data: layout data of the graph
     :param run_timer_status: run-timer state
-    :return: Plotly figure for the graph object
+    :param improve: chosen improvement options (local search after the construction)
+    :param session: state of the browser tab
+    :return: Plotly figure for the graph object and the updated session state
     """
-    global path, path_2, nodes, time_tracking, counter, highlight_nodes, highlight_path, second_highlight_path, \
-        distance, complexity, interval_ms, pause_state
+    session = dict(session) if session else new_session()
 
     # defines the object which emitted the callback signal
     _ctx = dash.callback_context.triggered[0]['prop_id']
     ctx, ctx_2 = _ctx.split('.')
-    main_figure.selected = df.loc[df.checked == True]
 
     # click on the main graph
     if ctx == 'main-graph':
         if ctx_2 == 'relayoutData':
-            if 'mapbox.zoom' in rel_data.keys():
-                main_figure.zoom = rel_data['mapbox.zoom']
+            if rel_data and 'mapbox.zoom' in rel_data.keys():
+                session['zoom'] = rel_data['mapbox.zoom']
+                return (dash.no_update,) * 6 + (session, dash.no_update, dash.no_update)
+            raise PreventUpdate
         else:
             if click_data:
-                df.loc[click_data['points'][0]['text'], 'checked'] = not (
-                df.loc[click_data['points'][0]['text'], 'checked'])
-                main_figure.selected = df.loc[df.checked == True]
-                return main_figure.get_map(),\
+                city = click_data['points'][0]['text']
+                if city in session['checked']:
+                    session['checked'].remove(city)
+                else:
+                    session['checked'].append(city)
+                return render(session),\
                        True,\
                        "0000",\
                        "0000",\
                        True,\
-                       'Pause'
+                       'Pause',\
+                       session,\
+                       dash.no_update,\
+                       dash.no_update
             else:
                 raise PreventUpdate
 
     # click on the Reset button
     if ctx == 'reset':
-        main_figure.cleaned_map(selected=True)
         if n2 > 0:
-            df.checked = False
-            return main_figure.get_map(initial=True),\
+            drop_run(session)
+            session['checked'] = []
+            return serialize(BaseMap(cities=df).get_map(initial=True)),\
                    True,\
                    "0000",\
                    "0000",\
                    True,\
-                   'Pause'
+                   'Pause',\
+                   session,\
+                   dash.no_update,\
+                   None
         else:
             raise PreventUpdate
 
     # click on the Launch button
     elif ctx == 'launch':
         if n > 0:
-            work_df = df.loc[df.checked == True].copy()
-            work_df.drop(columns=['checked'], inplace=True)
-            main_figure.cleaned_map()
+            work_df = df.loc[df.index.isin(session['checked'])].copy()
+            # the previous run of this page is not needed anymore
+            drop_run(session)
 
             if len(work_df) > 0:
-                if alg == 'NN':
-                    nn = NearestNeighbour(work_df, work_df.index[0])
-                elif alg == 'CA':
-                    nn = ChristAlgorithm(work_df)
-                elif alg == 'CC':
-                    nn = ConcordAlgorithm(work_df)
-                else:
-                    raise ValueError("Incorrect algorithm type")
-
-                path = nn.path_sequence
-
+                token = uuid.uuid4().hex
+                key = f"{session['sid']}:result:{token}"
                 try:
-                    path_2 = nn.second_path_sequence
-                except:
-                    path_2 = {k: [] for k, v in path.items()}
-                nodes = nn.nodes_sequence
-                distance = nn.distance
-                complexity = nn.complexity
-                return main_figure.get_map(),\
+                    local_jobs[token] = solver_jobs.submit(solve_into_store, store, key, token, alg, work_df,
+                                                           local_search='LS' in (improve or []),
+                                                           oracle=catalogue.subset(work_df.index))
+                except QueueFull:
+                    return render(session),\
+                           True,\
+                           "0000",\
+                           "0000",\
+                           True,\
+                           'Pause',\
+                           session,\
+                           dash.no_update,\
+                           None
+
+                # the run-timer polls the store for the result
+                session.update(job=token, result=key, deadline=time.time() + 2 * JOB_TIMEOUT)
+                return render(session),\
                        False,\
                        "0000",\
                        "0000",\
-                       False,\
-                       'Continue' if pause_state else 'Pause'
+                       True,\
+                       'Pause',\
+                       session,\
+                       dash.no_update,\
+                       None
 
-            return main_figure.get_map(),\
+            return render(session),\
                    True,\
                    "0000",\
                    "0000",\
                    False,\
-                   'Pause'
+                   'Pause',\
+                   session,\
+                   dash.no_update,\
+                   None
         else:
             raise PreventUpdate
 
     elif ctx == 'pause':
-        if counter != 0:
-            pause_state = not pause_state
-            return main_figure.get_map(highlight_path=highlight_path,
-                                       second_highlight_path=second_highlight_path,
-                                       highlight_nodes=highlight_nodes), \
+        result = store.get_cached(session['result']) if session['result'] and session['job'] is None else None
+        if session['counter'] != 0 and result is not None:
+            session['pause'] = not session['pause']
+            return render(session, result['result'], session['counter'] - 1), \
                 not run_timer_status,\
                    "0000",\
                    "0000",\
                    False, \
-                   'Continue' if pause_state else 'Pause'
+                   'Continue' if session['pause'] else 'Pause',\
+                   session,\
+                   dash.no_update,\
+                   dash.no_update
         else:
-            return main_figure.get_map(),\
+            return render(session),\
                    not run_timer_status,\
                    "0000",\
                    "0000",\
                    True, \
-                   'Pause'
+                   'Pause',\
+                   session,\
+                   dash.no_update,\
+                   dash.no_update
 
     # run-timer event (set for 1s interval)
     elif ctx == 'run-timer':
-        if counter < len(path):
-            highlight_path = path[counter]
-            second_highlight_path = path_2[counter]
-            highlight_nodes = nodes[counter]
-            counter += 1
-            return main_figure.get_map(highlight_path=highlight_path,
-                                       second_highlight_path=second_highlight_path,
-                                       highlight_nodes=highlight_nodes), \
+        if session['result'] is None:
+            raise PreventUpdate
+        result = store.get_cached(session['result'])
+
+        if session['job'] is not None:
+            state = result['state'] if result is not None else None
+            job_id = local_jobs.get(session['job'])
+            if state is None and job_id is not None:
+                # the job process may have died without writing to the store
+                try:
+                    if solver_jobs.poll(job_id)['state'] in (FAILED, CANCELLED, TIMEOUT):
+                        state = FAILED
+                except KeyError:
+                    state = FAILED
+            if state is None and time.time() > session['deadline']:
+                state = TIMEOUT
+            if state is None:
+                return dash.no_update,\
+                       False,\
+                       "0000",\
+                       "0000",\
+                       True,\
+                       'Pause',\
+                       dash.no_update,\
+                       dash.no_update,\
+                       dash.no_update
+            local_jobs.pop(session['job'], None)
+            session['job'] = None
+            if state == DONE:
+                run = result['result']
+                metrics.observe_solve(run['algorithm'], run['n'], run['stats']['wall_time'])
+            else:
+                # the job failed, was cancelled or timed out
+                drop_run(session)
+                return render(session),\
+                       True,\
+                       "0000",\
+                       "0000",\
+                       True,\
+                       'Pause',\
+                       session,\
+                       dash.no_update,\
+                       None
+            if PLAYBACK == 'client':
+                # the frames are sent once, the browser plays them (assets/playback.js)
+                result = result['result']
+                complexity = result['complexity']
+                return render(session),\
+                       True,\
+                       f"{result['distance']:04.0f}",\
+                       f'{float(complexity):04.0f}' if isinstance(complexity, int) else complexity,\
+                       True,\
+                       'Pause',\
+                       session,\
+                       dash.no_update,\
+                       BaseMap(cities=df).pack_frames(result['path'], result['path_2'], result['nodes'])
+
+        if result is None:
+            # the result expired
+            drop_run(session)
+            raise PreventUpdate
+        result = result['result']
+        if session['counter'] < len(result['path']):
+            figure, extend = show_frame(session, result, session['counter'])
+            session['counter'] += 1
+            return figure, \
                    False,\
                    "0000",\
                    "0000",\
                    False, \
-                   'Continue' if pause_state else 'Pause'
+                   'Continue' if session['pause'] else 'Pause',\
+                   session,\
+                   extend,\
+                   dash.no_update
         else:
-            counter = 0
-            return main_figure.get_map(highlight_path=highlight_path,
-                                       second_highlight_path=second_highlight_path,
-                                       highlight_nodes=highlight_nodes), \
+            figure, extend = show_frame(session, result, len(result['path']) - 1)
+            session['counter'] = 0
+            complexity = result['complexity']
+            return figure, \
                    True,\
-                   f'{distance:04.0f}',\
+                   f"{result['distance']:04.0f}",\
                    f'{float(complexity):04.0f}' if isinstance(complexity, int) else complexity,\
                    True,\
-                   'Pause'
+                   'Pause',\
+                   session,\
+                   extend,\
+                   dash.no_update
 
     # the figure shouldn't be updated
     else:
         raise PreventUpdate
 
 
+@app.callback(
+    Output('run-stats', 'children'),
+    [Input('complex-display', 'value')],
+    [State('session', 'data')]
+)
+def display_stats(complexity, session):
+    """
+    Shows the operation counters and the resources of the finished run
+    :param complexity: complexity display value, set when a run finishes and reset by the other actions
+    :param session: state of the browser tab
+    :return: children of the stats panel
+    """
+    if not session or session['result'] is None or session['job'] is not None:
+        return []
+    result = store.get_cached(session['result'])
+    if result is None or result.get('state') != DONE:
+        return []
+    return stats_view(result['result']['stats'])
+
+
+if PLAYBACK == 'client':
+    app.clientside_callback(
+        ClientsideFunction(namespace='playback', function_name='step'),
+        [Output('main-graph', 'prependData'),
+         Output('play-timer', 'disabled'),
+         Output('playback', 'data'),
+         Output('play', 'children'),
+         Output('play', 'disabled')],
+        [Input('frames', 'data'),
+         Input('play-timer', 'n_intervals'),
+         Input('play', 'n_clicks'),
+         Input('step-back', 'n_clicks'),
+         Input('step-forward', 'n_clicks')],
+        [State('playback', 'data')]
+    )
+    app.clientside_callback(
+        "function (disabled) { return [disabled, disabled]; }",
+        [Output('step-back', 'disabled'),
+         Output('step-forward', 'disabled')],
+        [Input('play', 'disabled')]
+    )
+
+
 # main application layout
 app.layout = html.Div([dcc.Location(id='loc', refresh=True),
                        dcc.Interval(id='run-timer', interval=interval_ms, disabled=True),
+                       dcc.Store(id='session', storage_type='session'),
+                       dcc.Store(id='frames'),
+                       dcc.Store(id='playback'),
+                       dcc.Interval(id='play-timer', interval=interval_ms, disabled=True),
                        navBar(),
                        html.Div(id='page-content', children=[dashboard()]),
                        dbc.Modal(children=make_modal("NN"), id="modal")
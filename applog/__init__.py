@@ -0,0 +1,198 @@
+"""
+Logging of the app: JSON lines written by a background thread
+
+The code logs through the standard loggers and attaches the structured data as
+    logger.info('euler tour', extra={'event': 'euler_tour', 'data': {'tour': steps}})
+Nothing is configured on import: configure_logging puts a QueueHandler on the root
+logger, the caller only cuts the large payloads, formats a traceback and enqueues the
+record, while the JSON formatting and the file writes run in the QueueListener thread.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+
+DEFAULT_PATH = os.environ.get('APP_LOG', 'app.log')
+# list-like payloads are cut to the first items, strings to the first characters
+MAX_ITEMS = 50
+MAX_CHARS = 2000
+# records waiting for the writer thread, the new ones are dropped when it is full
+QUEUE_SIZE = 10000
+
+_listener = None
+
+
+def cap(value, max_items=MAX_ITEMS, max_chars=MAX_CHARS):
+    """
+    Bounded copy of a payload value
+    :param value: list / tuple / set / dict / array / string or a scalar
+    :return: the value itself if small, otherwise {'size': length, 'head': first items}
+    """
+    if isinstance(value, str):
+        return value if len(value) <= max_chars else {'size': len(value), 'head': value[:max_chars]}
+    if hasattr(value, 'tolist') and getattr(value, 'ndim', 0) > 0:
+        # numpy array: the head is copied, the solver may change the array after the call
+        head = value[:max_items].tolist()
+    elif isinstance(value, dict):
+        head = dict(item for _, item in zip(range(max_items), value.items()))
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        head = [item for _, item in zip(range(max_items), value)]
+    else:
+        return value
+    return head if len(value) <= max_items else {'size': len(value), 'head': head}
+
+
+class PayloadFilter(logging.Filter):
+    """
+    Samples the events and caps their data, runs in the logging thread before the record is queued
+    """
+
+    def __init__(self, rates=None, max_items=MAX_ITEMS, max_chars=MAX_CHARS):
+        """
+        Class constructor
+        :param rates: event name: share of the records kept (0..1), the other events are all kept
+        :param max_items: list-like payloads are cut to this number of items
+        :param max_chars: strings are cut to this number of characters
+        """
+        super().__init__()
+        self.rates = dict(rates or {})
+        self.max_items = max_items
+        self.max_chars = max_chars
+
+    def filter(self, record):
+        rate = self.rates.get(getattr(record, 'event', None))
+        if rate is not None and random.random() >= rate:
+            return False
+        data = getattr(record, 'data', None)
+        if isinstance(data, dict):
+            record.data = {key: cap(value, self.max_items, self.max_chars) for key, value in data.items()}
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler which drops the records when the queue is full instead of blocking or failing
+    """
+
+    def __init__(self, target, max_chars=MAX_CHARS):
+        """
+        Class constructor
+        :param target: queue of the listener
+        :param max_chars: the message is cut to this number of characters, the traceback to its last ones
+        """
+        super().__init__(target)
+        self.max_chars = max_chars
+        self.dropped = 0
+
+    def prepare(self, record):
+        # the base class formats the traceback into msg and drops exc_info: the traceback is kept
+        # in exc_text for the exception field instead, the message is the formatted one
+        record = copy.copy(record)
+        record.msg = record.getMessage()[:self.max_chars]
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        if record.exc_text and len(record.exc_text) > self.max_chars:
+            record.exc_text = '...' + record.exc_text[-self.max_chars:]
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    A record as one JSON line: time, level, logger, process, message, event and data
+    """
+
+    def format(self, record):
+        entry = {'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+                 'level': record.levelname,
+                 'logger': record.name,
+                 'process': record.process,
+                 'message': record.getMessage()}
+        if getattr(record, 'event', None) is not None:
+            entry['event'] = record.event
+        if getattr(record, 'data', None) is not None:
+            entry['data'] = record.data
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+def _start(handlers):
+    global _listener
+    records = queue.Queue(QUEUE_SIZE)
+    _listener = QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    return records
+
+
+def _restart_in_child():
+    # the writer thread doesn't survive fork: the job processes get their own one,
+    # stopped (and flushed) by the multiprocessing exit handlers
+    if _listener is None:
+        return
+    import multiprocessing.util
+    handlers = _listener.handlers
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, DroppingQueueHandler):
+            handler.queue = _start(handlers)
+    multiprocessing.util.Finalize(None, shutdown_logging, exitpriority=10)
+
+
+def configure_logging(path=DEFAULT_PATH, level='INFO', rates=None, max_items=MAX_ITEMS, max_chars=MAX_CHARS):
+    """
+    Routes the records of all the loggers to the JSON file through the queue
+    Called again it replaces the previous configuration.
+    :param path: log file (None - stderr)
+    :param level: root logger level
+    :param rates: sampling rates of the events (see PayloadFilter)
+    :param max_items: cap of the list-like payloads
+    :param max_chars: cap of the strings
+    :return: QueueListener
+    """
+    shutdown_logging()
+    writer = logging.FileHandler(path) if path is not None else logging.StreamHandler()
+    writer.setFormatter(JsonFormatter())
+    handler = DroppingQueueHandler(_start([writer]), max_chars)
+    handler.addFilter(PayloadFilter(rates, max_items, max_chars))
+
+    root = logging.getLogger()
+    for old in [old for old in root.handlers if isinstance(old, DroppingQueueHandler)]:
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+    return _listener
+
+
+def shutdown_logging():
+    """
+    Writes the queued records and stops the writer thread
+    """
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    try:
+        listener.stop()
+    except AttributeError:
+        # stopped already
+        pass
+    for handler in listener.handlers:
+        handler.close()
+
+
+atexit.register(shutdown_logging)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_in_child)
@@ -0,0 +1,69 @@
+/*
+ Playback of the solver animation in the browser
+ The server sends the frames once (BaseMap.pack_frames), then play, pause and stepping
+ run here. A frame replaces the edge and node traces of the map by prependData:
+ maxPoints equal to the new length drops the old points.
+ */
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    playback: {
+        step: function (packed, tick, play, back, forward, state) {
+            const no_update = window.dash_clientside.no_update;
+            const triggered = window.dash_clientside.callback_context.triggered;
+            const trigger = triggered.length ? triggered[0].prop_id.split('.')[0] : '';
+            state = state || {index: -1, playing: false};
+
+            if (!packed) {
+                return [no_update, true, {index: -1, playing: false}, 'Play', true];
+            }
+            const last = packed.frames.length - 1;
+            let index = state.index, playing = state.playing;
+
+            if (trigger === 'frames') {
+                index = 0;
+                playing = true;
+            } else if (trigger === 'play-timer') {
+                if (!playing) {
+                    return [no_update, true, state, 'Play', false];
+                }
+                index = Math.min(index + 1, last);
+            } else if (trigger === 'play') {
+                playing = !playing;
+                if (playing && index >= last) {
+                    index = 0;
+                }
+            } else if (trigger === 'step-back') {
+                playing = false;
+                index = Math.max(index - 1, 0);
+            } else if (trigger === 'step-forward') {
+                playing = false;
+                index = Math.min(index + 1, last);
+            }
+            if (index >= last) {
+                playing = false;
+            }
+
+            const frame = packed.frames[index];
+            const lat = [], lon = [];
+            [frame[0], frame[1]].forEach(function (pairs) {
+                const trace_lat = [], trace_lon = [];
+                for (let i = 0; i < pairs.length; i += 2) {
+                    trace_lat.push(packed.lat[pairs[i]], packed.lat[pairs[i + 1]], null);
+                    trace_lon.push(packed.lon[pairs[i]], packed.lon[pairs[i + 1]], null);
+                }
+                lat.push(trace_lat);
+                lon.push(trace_lon);
+            });
+            lat.push(frame[2].map(function (id) { return packed.lat[id]; }));
+            lon.push(frame[2].map(function (id) { return packed.lon[id]; }));
+            // a trace can't be emptied this way, a null point is drawn as nothing
+            for (let i = 0; i < lat.length; i++) {
+                if (!lat[i].length) {
+                    lat[i] = [null];
+                    lon[i] = [null];
+                }
+            }
+            const update = [{lat: lat, lon: lon}, packed.traces, lat.map(function (values) { return values.length; })];
+            return [update, !playing, {index: index, playing: playing}, playing ? 'Pause' : 'Play', false];
+        }
+    }
+});
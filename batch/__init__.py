@@ -0,0 +1,206 @@
+"""
+Headless solving of many route instances
+
+An instance is a JSON object (a JSONL line or a Parquet row):
+    {"id": "r1", "algorithm": "CA", "cities": ["Berlin", "Paris", "Rome"]}
+    {"id": "r2", "points": [{"name": "a", "lat": 52.5, "long": 13.4}, ...], "local_search": true}
+cities are the names of the catalogue, the distances are sliced from its cached matrix
+(one oracle for all the instances); points are the instances of their own.
+algorithm ('NN', 'CA' or 'CC'), local_search, start (NN), starts (NN: the number of the start
+points of a multi-start run), time_limit (NN multi-start and CC, seconds) and shortcut
+(CA: 'first' or 'best') are optional.
+"""
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import pandas as pd
+from algorithm.cache import DistanceCache, CACHE_DIR, STORAGE
+from algorithm.oracle import DistanceOracle
+from algorithm.solvers import make_solver
+from catalogue import load_catalogue
+
+DEFAULT_ALGORITHM = 'NN'
+# instance fields passed to the solver of the algorithm
+SOLVER_OPTIONS = {'NN': ('start', 'starts', 'time_limit'), 'CA': ('shortcut',), 'CC': ('time_limit',)}
+# instances submitted to the pool per worker at once, the input is never read whole
+IN_FLIGHT = 4
+# Parquet rows converted to dicts at once
+PARQUET_BATCH = 1024
+
+# catalogue and its oracle in the worker process
+_catalogue = None
+
+
+def read_instances(path):
+    """
+    Reads the instances one by one
+    :param path: .jsonl file ('-' - stdin) or .parquet file
+    :return: generator of dicts
+    """
+    if str(path).lower().endswith('.parquet'):
+        import pyarrow.parquet as pq
+        # a batch of rows at a time, the missing (null) fields are dropped as in a JSON line
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=PARQUET_BATCH):
+            columns = batch.to_pydict()
+            for values in zip(*columns.values()):
+                yield {key: value for key, value in zip(columns, values) if value is not None}
+        return
+    file = sys.stdin if path == '-' else open(path)
+    try:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+    finally:
+        if file is not sys.stdin:
+            file.close()
+
+
+def load_shared(catalogue_path, cache_dir=CACHE_DIR, storage=STORAGE, workers=1):
+    """
+    Catalogue and its oracle over the cached memory-mapped matrix
+    :param storage: matrix storage of the cache (see algorithm.shared.STORAGES)
+    :param workers: processes computing the matrix if it isn't cached
+    :return: (DataFrame, DistanceOracle)
+    """
+    df = load_catalogue(catalogue_path)
+    return df, DistanceCache(cache_dir, storage=storage, workers=workers).load(df)
+
+
+def _init_worker(catalogue_path, cache_dir, storage):
+    global _catalogue
+    if catalogue_path is not None:
+        _catalogue = load_shared(catalogue_path, cache_dir, storage)
+
+
+def instance_frame(record, catalogue=None):
+    """
+    Cities of the instance with the oracle
+    :param record: instance dict
+    :param catalogue: (DataFrame, DistanceOracle) for the instances given by the city names
+    :return: DataFrame (index - names, columns - lat, long) and DistanceOracle
+    """
+    if 'points' in record:
+        points = record['points']
+        if points and not isinstance(points[0], dict):
+            points = [{'name': str(i), 'lat': point[0], 'long': point[1]} for i, point in enumerate(points)]
+        df = pd.DataFrame({'lat': [point['lat'] for point in points], 'long': [point['long'] for point in points]},
+                          index=pd.Index([str(point['name']) for point in points], name='city'))
+        return df, DistanceOracle.from_frame(df)
+    if catalogue is None:
+        raise ValueError("The instance has city names but no catalogue is given")
+    df, oracle = catalogue
+    # the catalogue order, the same as a selection in the UI
+    work_df = df.loc[df.index.isin(record['cities'])]
+    if len(work_df) != len(set(record['cities'])):
+        missing = sorted(set(record['cities']) - set(work_df.index))
+        raise ValueError(f"Unknown cities: {', '.join(map(str, missing))}")
+    return work_df, oracle.subset(work_df.index)
+
+
+def solve_instance(record, catalogue=None, algorithm=DEFAULT_ALGORITHM, local_search=False, options=None):
+    """
+    Solves one instance
+    :param record: instance dict
+    :param catalogue: (DataFrame, DistanceOracle) for the instances given by the city names
+    :param algorithm: algorithm of the instances without one
+    :param local_search: improvement stage of the instances without the option
+    :param options: solver options of the instances without them (see SOLVER_OPTIONS)
+    :return: result dict: id, algorithm, n, tour (closed), length, complexity, runtime (seconds)
+        and stats (operation counters and phases, see Instrumentation.as_dict);
+        id and error if the instance failed
+    """
+    try:
+        alg = record.get('algorithm', algorithm)
+        df, oracle = instance_frame(record, catalogue)
+        kwargs = {key: value for key, value in (options or {}).items() if key in SOLVER_OPTIONS.get(alg, ())}
+        kwargs.update({key: record[key] for key in SOLVER_OPTIONS.get(alg, ()) if key in record})
+        start = time.perf_counter()
+        result = make_solver(alg, df, oracle=oracle, local_search=record.get('local_search', local_search),
+                             **kwargs).solve()
+        runtime = time.perf_counter() - start
+        complexity = result.complexity
+        return {'id': record.get('id'),
+                'algorithm': alg,
+                'n': len(df),
+                'tour': list(result.path),
+                'length': float(result.distance),
+                'complexity': int(complexity) if isinstance(complexity, (int, float)) else complexity,
+                'runtime': runtime,
+                'stats': result.stats}
+    except Exception:
+        return {'id': record.get('id'), 'error': traceback.format_exc(limit=3)}
+
+
+def _solve_in_worker(record, algorithm, local_search, options):
+    return solve_instance(record, _catalogue, algorithm, local_search, options)
+
+
+def solve_batch(instances, catalogue_path=None, workers=None, algorithm=DEFAULT_ALGORITHM, local_search=False,
+                cache_dir=CACHE_DIR, storage=STORAGE, options=None):
+    """
+    Solves the instances in a process pool, the results are yielded as they are ready (not in the input order)
+    :param instances: iterable of instance dicts
+    :param catalogue_path: catalogue file for the instances given by the city names
+    :param workers: number of processes (None - all the cores, 1 - in the calling process)
+    :param algorithm: algorithm of the instances without one
+    :param local_search: improvement stage of the instances without the option
+    :param cache_dir: distance cache folder
+    :param storage: matrix storage of the cache (see algorithm.shared.STORAGES)
+    :param options: solver options of the instances without them (see SOLVER_OPTIONS)
+    :return: generator of the result dicts
+    """
+    workers = os.cpu_count() if workers is None else max(1, workers)
+    if workers == 1:
+        catalogue = load_shared(catalogue_path, cache_dir, storage) if catalogue_path is not None else None
+        for record in instances:
+            yield solve_instance(record, catalogue, algorithm, local_search, options)
+        return
+
+    if catalogue_path is not None:
+        # the matrix is computed here once (its tiles in parallel), the workers only map the file
+        load_shared(catalogue_path, cache_dir, storage, workers)
+    instances = iter(instances)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(catalogue_path, cache_dir, storage)) as pool:
+        pending = set()
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < workers * IN_FLIGHT:
+                try:
+                    record = next(instances)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.add(pool.submit(_solve_in_worker, record, algorithm, local_search, options))
+            if pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+
+def run_batch(input_path, output_path, catalogue_path=None, workers=None, algorithm=DEFAULT_ALGORITHM,
+              local_search=False, cache_dir=CACHE_DIR, storage=STORAGE, options=None):
+    """
+    Solves the instances of the file and writes the results as JSONL, a line per finished instance
+    :param input_path: .jsonl / .parquet instances file ('-' - stdin)
+    :param output_path: results file ('-' - stdout)
+    :return: number of the solved and the failed instances
+    """
+    solved = failed = 0
+    output = sys.stdout if output_path == '-' else open(output_path, 'w')
+    try:
+        for result in solve_batch(read_instances(input_path), catalogue_path, workers, algorithm, local_search,
+                                  cache_dir, storage, options):
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+            if 'error' in result:
+                failed += 1
+            else:
+                solved += 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return solved, failed
@@ -0,0 +1,37 @@
+"""
+    python -m batch instances.jsonl results.jsonl [--catalogue assets/gps_cities.xlsx] [--workers 4] [--log batch.log]
+"""
+import argparse
+import sys
+from . import __doc__ as description, run_batch, DEFAULT_ALGORITHM
+from algorithm.cache import CACHE_DIR, STORAGE
+from algorithm.shared import STORAGES
+from algorithm.solvers import SOLVERS
+from applog import configure_logging
+
+parser = argparse.ArgumentParser(description=description + __doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument('input', help="instances, .jsonl or .parquet ('-' - stdin)")
+parser.add_argument('output', help="results .jsonl ('-' - stdout)")
+parser.add_argument('--catalogue', help="catalogue of the cities referenced by name")
+parser.add_argument('--workers', type=int, default=None, help="processes, all the cores by default")
+parser.add_argument('--algorithm', choices=sorted(SOLVERS), default=DEFAULT_ALGORITHM,
+                    help="algorithm of the instances without one")
+parser.add_argument('--local-search', action='store_true', help="improve the tours by 2-opt / Or-opt")
+parser.add_argument('--starts', type=int, help="NN: start points of a multi-start run for the instances without one")
+parser.add_argument('--time-limit', type=float,
+                    help="NN multi-start and CC budget of the instances without one, seconds")
+parser.add_argument('--cache-dir', default=CACHE_DIR, help="distance cache folder")
+parser.add_argument('--storage', choices=list(STORAGES), default=STORAGE,
+                    help="catalogue matrix storage: float32 halves it, packed keeps the upper triangle")
+parser.add_argument('--log', help="JSON log of the solvers, only the warnings to stderr if omitted")
+args = parser.parse_args()
+if args.log:
+    configure_logging(args.log)
+
+options = {key: value for key, value in (('starts', args.starts), ('time_limit', args.time_limit))
+           if value is not None}
+solved, failed = run_batch(args.input, args.output, args.catalogue, args.workers, args.algorithm,
+                           args.local_search, args.cache_dir, args.storage, options)
+print(f'{solved} solved, {failed} failed', file=sys.stderr)
+sys.exit(1 if failed else 0)
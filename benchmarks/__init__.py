@@ -0,0 +1,5 @@
+"""
+Performance benchmarks of the algorithms, run as modules:
+    python -m benchmarks.matching
+    python -m benchmarks.solvers
+"""
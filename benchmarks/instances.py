@@ -0,0 +1,50 @@
+"""
+Reproducible geographic instances for the benchmarks
+"""
+import numpy as np
+
+# Europe bounding box: lat, long ranges
+LAT_RANGE = (36, 60)
+LONG_RANGE = (-10, 30)
+
+DISTRIBUTIONS = ('uniform', 'clustered')
+
+
+def random_points(n, seed=0):
+    """
+    Random points within the Europe bounding box
+    :return: lat, long arrays
+    """
+    rng = np.random.default_rng(seed)
+    return rng.uniform(*LAT_RANGE, n), rng.uniform(*LONG_RANGE, n)
+
+
+def clustered_points(n, seed=0, clusters=None, spread=0.6):
+    """
+    Points around random centres within the Europe bounding box (like the cities around the capitals)
+    :param n: number of points
+    :param seed: random seed
+    :param clusters: number of centres, about sqrt(n) / 2 by default
+    :param spread: standard deviation around a centre, degrees
+    :return: lat, long arrays
+    """
+    rng = np.random.default_rng(seed)
+    clusters = max(1, int(np.sqrt(n) / 2)) if clusters is None else clusters
+    centres_lat, centres_long = rng.uniform(*LAT_RANGE, clusters), rng.uniform(*LONG_RANGE, clusters)
+    # cluster sizes vary, some centres are much denser
+    owner = rng.choice(clusters, size=n, p=rng.dirichlet(np.ones(clusters)))
+    lat = np.clip(centres_lat[owner] + rng.normal(0, spread, n), -89.9, 89.9)
+    long = centres_long[owner] + rng.normal(0, spread, n)
+    return lat, long
+
+
+def make_instance(distribution, n, seed=0):
+    """
+    :param distribution: 'uniform' or 'clustered'
+    :return: lat, long arrays
+    """
+    if distribution == 'uniform':
+        return random_points(n, seed)
+    if distribution == 'clustered':
+        return clustered_points(n, seed)
+    raise ValueError(f"Unknown distribution '{distribution}', expected one of {DISTRIBUTIONS}")
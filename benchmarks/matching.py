@@ -0,0 +1,72 @@
+"""
+Runtime of the Christofides matching stage against the number of odd vertices
+    python -m benchmarks.matching [--sizes 4 8 16 ...] [--legacy-limit 12]
+"""
+import argparse
+import time
+from itertools import combinations, product
+import numpy as np
+import pandas as pd
+import networkx as nx
+from networkx.algorithms.bipartite import minimum_weight_full_matching as mwfm
+from algorithm.distances import distance_matrix
+from algorithm.matching import min_weight_matching
+from .instances import random_points
+
+DEFAULT_SIZES = [4, 8, 10, 12, 16, 32, 64, 128, 256, 512]
+
+
+def legacy_matching(matrix):
+    """
+    The former implementation: the best bipartite full matching over all the bipartitions
+    """
+    nodes = list(range(len(matrix)))
+    best, best_pairs = np.inf, None
+    for nodes_set_1 in combinations(nodes, len(nodes) // 2):
+        nodes_set_2 = [node for node in nodes if node not in nodes_set_1]
+        bipart_graph = nx.Graph()
+        bipart_graph.add_nodes_from(nodes_set_1, bipartite=0)
+        bipart_graph.add_nodes_from(nodes_set_2, bipartite=1)
+        for node1, node2 in product(nodes_set_1, nodes_set_2):
+            bipart_graph.add_edge(node1, node2, weight=matrix[node1, node2])
+        mwm = mwfm(bipart_graph, top_nodes=nodes_set_1, weight='weight')
+        pairs = [(k, mwm[k]) for k in nodes_set_1]
+        dist = sum(matrix[i, j] for i, j in pairs)
+        if dist < best:
+            best, best_pairs = dist, pairs
+    return np.array(best_pairs)
+
+
+def timed(func, matrix):
+    start = time.perf_counter()
+    pairs = func(matrix)
+    return time.perf_counter() - start, matrix[pairs[:, 0], pairs[:, 1]].sum()
+
+
+def run(sizes=DEFAULT_SIZES, legacy_limit=12, seed=0) -> pd.DataFrame:
+    """
+    Times every matching mode for each number of odd vertices
+    :return: DataFrame with the columns odd_vertices, mode, seconds, weight
+    """
+    records = []
+    for m in sizes:
+        lat, long = random_points(m, seed)
+        matrix = distance_matrix(lat, long)
+        modes = {'exact': lambda x: min_weight_matching(x, 'exact'),
+                 'greedy': lambda x: min_weight_matching(x, 'greedy')}
+        if m <= legacy_limit:
+            modes['legacy'] = legacy_matching
+        for mode, func in modes.items():
+            seconds, weight = timed(func, matrix)
+            records.append({'odd_vertices': m, 'mode': mode, 'seconds': seconds, 'weight': weight})
+    return pd.DataFrame(records)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--legacy-limit', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    result = run(args.sizes, args.legacy_limit, args.seed)
+    print(result.pivot(index='odd_vertices', columns='mode', values='seconds').to_string())
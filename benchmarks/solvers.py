@@ -0,0 +1,248 @@
+"""
+Tour quality and per-stage runtime of the solvers on random instances
+    python -m benchmarks.solvers [--sizes 10 100 1000 10000] [--distributions uniform clustered]
+                                 [--seeds 0 1] [--output results.json] [--baseline previous.json]
+Up to DENSE_LIMIT points the stages run on the dense distance matrix, the larger instances
+(up to 100k points) run on the k-nearest candidate graph. The quality is the excess over
+the best known tour: the Held-Karp optimum for the small instances, the shortest tour of the
+run otherwise; lower_bound is the 1-tree bound where it is computed.
+With --baseline the run is compared with a saved one and the exit code is 1 on a regression.
+"""
+import argparse
+import sys
+import time
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from algorithm.algorithm import nearest_neighbour_tour
+from algorithm.candidates import candidate_graph, sparse_nearest_neighbour_tour
+from algorithm.christ import ChristAlgorithm
+from algorithm.distances import distance_matrix
+from algorithm.exact import solve, held_karp, one_tree_bound
+from algorithm.local_search import LocalSearch
+from algorithm.multistart import multi_start
+from algorithm.oracle import DistanceOracle
+from algorithm.solvers import make_solver
+from algorithm.tour import tour_length
+from .instances import make_instance, DISTRIBUTIONS
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+# CA, CA+BS - ChristAlgorithm with the first / best shortcut of the Euler circuit,
+# MS - multi-start NN+LS and CA+LS from the spread starts on all the cores,
+# NN-solver - the NearestNeighbour class through make_solver (oracle subset, orchestration, frames)
+SOLVERS = ('NN', 'NN+LS', 'CA', 'CA+BS', 'CA+LS', 'MS', 'CC', 'NN-solver')
+# the solvers with a time budget, their tours depend on the speed of the machine
+TIME_LIMITED = ('MS', 'CC')
+
+# the largest instance with the dense matrix
+DENSE_LIMIT = 5000
+# candidate list length of the sparse instances
+K = 8
+# the largest instances of the reference computations and of the slow solvers
+HELD_KARP_LIMIT = 12
+BOUND_LIMIT = 1000
+CC_LIMIT = 1000
+MS_LIMIT = 1000
+MS_STARTS = 8
+# NearestNeighbour keeps an animation frame per step, O(n^2)
+SOLVER_CLASS_LIMIT = 1000
+LOCAL_SEARCH_LIMIT = 10000
+
+# a run is a regression if it is this much slower (the runs shorter than MIN_SECONDS aren't compared)
+TIME_TOLERANCE = 1.5
+MIN_SECONDS = 0.05
+# a longer tour is a regression: any for the deterministic solvers, by this share for TIME_LIMITED
+QUALITY_TOLERANCE = 1e-6
+TIME_LIMITED_TOLERANCE = 0.02
+
+
+class Timer:
+    """
+    Wall-clock time of the named stages
+    """
+
+    def __init__(self, stages=None):
+        self.stages = dict(stages or {})
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    @property
+    def total(self):
+        return sum(self.stages.values())
+
+
+def christofides(df, timer, oracle=None, graph=None, shortcut_mode='first'):
+    """
+    ChristAlgorithm run, its phases are the stages of the timer
+    :param df: DataFrame of the points, index - names, columns - lat, long
+    :param oracle: DistanceOracle of the dense instances
+    :param graph: CandidateGraph of the sparse ones
+    :param shortcut_mode: 'first' or 'best' shortcut of the Euler circuit
+    :return: closed tour array
+    """
+    start = time.perf_counter()
+    solver = ChristAlgorithm(df, oracle=oracle, candidates=graph, shortcut=shortcut_mode)
+    path = solver.solve().path
+    stages = {name: record['wall_time'] for name, record in solver.instrumentation.phases.items() if record['top']}
+    # the orchestration outside the phases: the names and the animation frames
+    stages['other'] = time.perf_counter() - start - sum(stages.values())
+    for name, seconds in stages.items():
+        timer.stages[name] = timer.stages.get(name, 0.0) + seconds
+    return df.index.get_indexer(path)
+
+
+def bench_instance(distribution, n, seed=0, solvers=SOLVERS, time_limit=10):
+    """
+    Runs the solvers on one instance
+    :param distribution: 'uniform' or 'clustered'
+    :param n: number of points
+    :param seed: random seed of the instance
+    :param solvers: solver names (see SOLVERS)
+    :param time_limit: time budget of CC and MS, seconds
+    :return: list of the result dicts
+    """
+    lat, long = make_instance(distribution, n, seed)
+    df = pd.DataFrame({'lat': lat, 'long': long}, index=pd.Index([f'c{i}' for i in range(n)], name='city'))
+    shared = Timer()
+    matrix = graph = oracle = None
+    if n <= DENSE_LIMIT:
+        with shared.stage('matrix'):
+            matrix = distance_matrix(lat, long)
+        oracle = DistanceOracle(df.index, matrix)
+
+        def length(tour):
+            return tour_length(matrix, tour)
+    else:
+        with shared.stage('candidates'):
+            graph = candidate_graph(lat, long, k=K)
+        length = graph.tour_length
+
+    tours = {}
+    if {'NN', 'NN+LS'} & set(solvers):
+        timer = Timer(shared.stages)
+        with timer.stage('nn'):
+            tour = nearest_neighbour_tour(matrix, 0) if matrix is not None else sparse_nearest_neighbour_tour(graph, 0)
+        tours['NN'] = tour, timer
+        if 'NN+LS' in solvers and n <= LOCAL_SEARCH_LIMIT:
+            timer = Timer(timer.stages)
+            with timer.stage('local_search'):
+                tours['NN+LS'] = LocalSearch().run(tour, matrix=matrix, candidates=graph), timer
+    if {'CA', 'CA+LS'} & set(solvers) and n >= 3:
+        timer = Timer(shared.stages)
+        tour = christofides(df, timer, oracle, graph)
+        tours['CA'] = tour, timer
+        if 'CA+LS' in solvers and n <= LOCAL_SEARCH_LIMIT:
+            timer = Timer(timer.stages)
+            with timer.stage('local_search'):
+                tours['CA+LS'] = LocalSearch().run(tour, matrix=matrix, candidates=graph), timer
+    if 'CA+BS' in solvers and n >= 3:
+        timer = Timer(shared.stages)
+        tours['CA+BS'] = christofides(df, timer, oracle, graph, 'best'), timer
+    if 'MS' in solvers and matrix is not None and n <= MS_LIMIT:
+        timer = Timer(shared.stages)
+        with timer.stage('multi_start'):
+            tours['MS'] = multi_start(matrix, starts=MS_STARTS, variants=('nn+ls', 'ca+ls'), workers=None,
+                                      time_limit=time_limit).tour, timer
+    if 'CC' in solvers and matrix is not None and n <= CC_LIMIT:
+        timer = Timer(shared.stages)
+        with timer.stage('solve'):
+            tours['CC'] = solve(matrix, time_limit=time_limit).tour, timer
+    if 'NN-solver' in solvers and matrix is not None and n <= SOLVER_CLASS_LIMIT:
+        timer = Timer(shared.stages)
+        with timer.stage('solver'):
+            result = make_solver('NN', df, oracle=oracle.subset(df.index)).solve()
+        tours['NN-solver'] = oracle.ids(result.path), timer
+
+    lengths = {name: length(tour) for name, (tour, timer) in tours.items()}
+    optimal = matrix is not None and n <= HELD_KARP_LIMIT
+    best_known = held_karp(matrix)[1] if optimal else min(lengths.values())
+    lower_bound = one_tree_bound(matrix, upper=best_known) if matrix is not None and n <= BOUND_LIMIT else None
+
+    records = []
+    for name, (tour, timer) in tours.items():
+        if name not in solvers:
+            continue
+        if sorted(tour[:-1].tolist()) != list(range(n)):
+            raise AssertionError(f"{name} returned an incorrect tour for {distribution} n={n} seed={seed}")
+        record = {'distribution': distribution, 'n': n, 'seed': seed, 'solver': name,
+                  'length': lengths[name], 'best_known': best_known, 'optimal': optimal,
+                  'excess': lengths[name] / best_known - 1 if best_known > 0 else 0.0,
+                  'lower_bound': lower_bound, 'seconds': timer.total}
+        record.update({f'time_{stage}': seconds for stage, seconds in timer.stages.items()})
+        records.append(record)
+    return records
+
+
+def run(sizes=DEFAULT_SIZES, distributions=DISTRIBUTIONS, seeds=(0,), solvers=SOLVERS, time_limit=10) -> pd.DataFrame:
+    """
+    Benchmarks all the combinations
+    :return: DataFrame, a row per (distribution, n, seed, solver)
+    """
+    records = []
+    for distribution in distributions:
+        for n in sizes:
+            for seed in seeds:
+                records.extend(bench_instance(distribution, n, seed, solvers, time_limit))
+    return pd.DataFrame(records)
+
+
+def compare(current, baseline, time_tolerance=TIME_TOLERANCE, quality_tolerance=QUALITY_TOLERANCE,
+            time_limited_tolerance=TIME_LIMITED_TOLERANCE) -> pd.DataFrame:
+    """
+    Rows of the current run which are slower or give longer tours than the baseline
+    :param current: DataFrame of run
+    :param baseline: DataFrame of an earlier run
+    :param time_tolerance: slowdown factor of a regression
+    :param quality_tolerance: relative length increase of a regression, the deterministic solvers
+    :param time_limited_tolerance: the same for the TIME_LIMITED solvers
+    :return: DataFrame with the current and the baseline seconds and lengths of the regressed rows
+    """
+    keys = ['distribution', 'n', 'seed', 'solver']
+    merged = current[keys + ['seconds', 'length']].merge(baseline[keys + ['seconds', 'length']], on=keys,
+                                                        suffixes=('', '_baseline'))
+    slower = (merged.seconds > time_tolerance * merged.seconds_baseline) & (merged.seconds > MIN_SECONDS)
+    tolerance = np.where(merged.solver.isin(TIME_LIMITED), time_limited_tolerance, quality_tolerance)
+    longer = merged.length > merged.length_baseline * (1 + tolerance)
+    return merged.loc[slower | longer]
+
+
+def write(df, path):
+    if path.lower().endswith('.csv'):
+        df.to_csv(path, index=False)
+    else:
+        df.to_json(path, orient='records', indent=1)
+
+
+def read(path) -> pd.DataFrame:
+    return pd.read_csv(path) if path.lower().endswith('.csv') else pd.read_json(path, orient='records')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--distributions', nargs='+', choices=DISTRIBUTIONS, default=list(DISTRIBUTIONS))
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0])
+    parser.add_argument('--solvers', nargs='+', choices=SOLVERS, default=list(SOLVERS))
+    parser.add_argument('--time-limit', type=float, default=10, help="CC budget, seconds")
+    parser.add_argument('--output', help="results file, .json or .csv")
+    parser.add_argument('--baseline', help="earlier results file to compare with")
+    args = parser.parse_args()
+
+    result = run(args.sizes, args.distributions, args.seeds, args.solvers, args.time_limit)
+    if args.output:
+        write(result, args.output)
+    print(result.pivot_table(index=['distribution', 'n'], columns='solver', values='excess').to_string(
+        float_format='{:.2%}'.format))
+    print(result.pivot_table(index=['distribution', 'n'], columns='solver', values='seconds').to_string(
+        float_format='{:.3f}'.format))
+    if args.baseline:
+        regressions = compare(result, read(args.baseline))
+        if len(regressions):
+            print('Regressions:\n' + regressions.to_string(index=False))
+            sys.exit(1)
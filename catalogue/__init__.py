@@ -0,0 +1,269 @@
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = os.environ.get('CATALOGUE_CACHE', os.path.join(tempfile.gettempdir(), 'graphs2-catalogue'))
+# names, lat and long columns of a cached catalogue, next to its meta.json
+CACHE_FILE = 'catalogue.parquet'
+
+# accepted column / property names, the first found is used
+NAME_COLUMNS = ('city', 'name')
+LAT_COLUMNS = ('lat', 'latitude')
+LONG_COLUMNS = ('long', 'lon', 'lng', 'longitude')
+
+FORMATS = ('.xlsx', '.xls', '.csv', '.geojson', '.json')
+# characters of a GeoJSON file read at once, the features are decoded one by one from them
+GEOJSON_CHUNK = 1 << 20
+
+
+def file_hash(path, chunk=1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(chunk), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def pick(columns, accepted, what):
+    lowered = {str(column).lower(): column for column in columns}
+    for name in accepted:
+        if name in lowered:
+            return lowered[name]
+    raise ValueError(f"The catalogue has no {what} column (one of {', '.join(accepted)})")
+
+
+def read_table(path):
+    """
+    Reads a spreadsheet or CSV catalogue
+    :param path: .xlsx / .xls / .csv file
+    :return: names, lat and long arrays
+    """
+    if path.lower().endswith('.csv'):
+        header = pd.read_csv(path, nrows=0).columns
+        columns = [pick(header, NAME_COLUMNS, 'name'), pick(header, LAT_COLUMNS, 'latitude'),
+                   pick(header, LONG_COLUMNS, 'longitude')]
+        df = pd.read_csv(path, usecols=columns, dtype={columns[0]: str, columns[1]: np.float64,
+                                                       columns[2]: np.float64})
+    else:
+        df = pd.read_excel(path)
+        columns = [pick(df.columns, NAME_COLUMNS, 'name'), pick(df.columns, LAT_COLUMNS, 'latitude'),
+                   pick(df.columns, LONG_COLUMNS, 'longitude')]
+    return df[columns[0]].astype(str).values, df[columns[1]].values, df[columns[2]].values
+
+
+class JsonStream:
+    """
+    JSON text read by chunks and decoded a value at a time
+    """
+
+    def __init__(self, file, chunk=GEOJSON_CHUNK):
+        self.file = file
+        self.chunk = chunk
+        self.buffer = ''
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+
+    def more(self) -> bool:
+        data = self.file.read(self.chunk)
+        if not data:
+            return False
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """
+        The next character after the whitespace, '' at the end of the file
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self.more():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def skip(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Malformed JSON: '{char}' expected at '{self.buffer[self.pos:self.pos + 20]}'")
+        self.pos += 1
+
+    def value(self):
+        """
+        The next value, decoded whole
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # the value goes on in the next chunk
+                if self.more():
+                    continue
+                raise
+            # so may a number at the end of the buffer
+            if end == len(self.buffer) and self.more():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_features(path, chunk=GEOJSON_CHUNK):
+    """
+    Features of a GeoJSON FeatureCollection one by one
+    The top-level members are decoded whole except the features array, which is decoded
+    an element at a time: the memory is bounded by the chunk, not by the file
+    :param path: .geojson / .json file
+    :param chunk: characters read at once
+    :return: generator of the feature dicts
+    """
+    with open(path, encoding='utf-8') as file:
+        stream = JsonStream(file, chunk)
+        stream.skip('{')
+        while stream.peek() != '}':
+            key = stream.value()
+            stream.skip(':')
+            if key != 'features':
+                stream.value()
+            else:
+                stream.skip('[')
+                while stream.peek() != ']':
+                    yield stream.value()
+                    if stream.peek() == ',':
+                        stream.skip(',')
+                stream.skip(']')
+            if stream.peek() == ',':
+                stream.skip(',')
+
+
+def read_geojson(path):
+    """
+    Reads the Point features of a GeoJSON catalogue, the name is taken from the properties
+    The file is streamed (see iter_features), only the three columns are collected
+    :param path: .geojson / .json file
+    :return: names, lat and long arrays
+    """
+    names, lat, long = [], [], []
+    key = None
+    for feature in iter_features(path):
+        geometry = feature.get('geometry') or {}
+        if geometry.get('type') != 'Point':
+            continue
+        properties = feature.get('properties') or {}
+        if key not in properties:
+            # the features share the property names as a rule, the name is picked again only if missing
+            key = pick(properties, NAME_COLUMNS, 'name')
+        names.append(str(properties[key]))
+        long.append(geometry['coordinates'][0])
+        lat.append(geometry['coordinates'][1])
+    return np.array(names, dtype=str), np.array(lat, dtype=np.float64), np.array(long, dtype=np.float64)
+
+
+def read_source(path):
+    """
+    Parses the catalogue file
+    :param path: catalogue file (see FORMATS)
+    :return: names, lat and long arrays
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.geojson', '.json'):
+        return read_geojson(path)
+    if extension in ('.xlsx', '.xls', '.csv'):
+        return read_table(path)
+    raise ValueError(f"Unsupported catalogue format {extension}")
+
+
+class CatalogueCache:
+    """
+    Columnar binary copy of a catalogue file
+    names, lat and long are kept as a Parquet file with the source mtime, size and hash.
+    The columns are reused while the source stays the same: a changed mtime or size
+    is checked against the hash first, so a touched file isn't parsed again.
+    """
+
+    def __init__(self, directory=CACHE_DIR, on_lookup=None):
+        """
+        Class constructor
+        :param directory: cache folder, created if missing
+        :param on_lookup: callback(hit) called on every load
+        """
+        self.directory = directory
+        self.on_lookup = on_lookup
+
+    def folder(self, path):
+        key = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:16]
+        return os.path.join(self.directory, key)
+
+    def load(self, path):
+        """
+        Catalogue arrays, parsed from the source only if the cache is missing or stale
+        :param path: catalogue file
+        :return: names, lat and long arrays
+        """
+        folder = self.folder(path)
+        stat = os.stat(path)
+        meta_path = os.path.join(folder, 'meta.json')
+        try:
+            with open(meta_path) as file:
+                meta = json.load(file)
+        except (OSError, ValueError):
+            meta = None
+
+        if meta is not None:
+            same = meta['mtime_ns'] == stat.st_mtime_ns and meta['size'] == stat.st_size
+            if not same and meta['size'] == stat.st_size and meta['sha256'] == file_hash(path):
+                same = True
+                self.write_meta(folder, path, stat, meta['sha256'])
+            if same:
+                try:
+                    # a cache of the former .npy layout has no Parquet file, it is parsed again
+                    table = pd.read_parquet(os.path.join(folder, CACHE_FILE))
+                    arrays = (table['names'].to_numpy(dtype=str), table['lat'].to_numpy(dtype=np.float64),
+                              table['long'].to_numpy(dtype=np.float64))
+                    if self.on_lookup is not None:
+                        self.on_lookup(True)
+                    return arrays
+                except (OSError, ValueError):
+                    pass
+
+        names, lat, long = read_source(path)
+        self.save(folder, path, stat, names, lat, long)
+        if self.on_lookup is not None:
+            self.on_lookup(False)
+        return names, lat, long
+
+    def save(self, folder, path, stat, names, lat, long):
+        os.makedirs(folder, exist_ok=True)
+        table = pd.DataFrame({'names': np.asarray(names, dtype=str), 'lat': np.asarray(lat, dtype=np.float64),
+                              'long': np.asarray(long, dtype=np.float64)})
+        handle, temporary = tempfile.mkstemp(dir=folder, suffix='.tmp')
+        with os.fdopen(handle, 'wb') as file:
+            table.to_parquet(file, index=False)
+        os.replace(temporary, os.path.join(folder, CACHE_FILE))
+        # the meta is written last, it validates the arrays
+        self.write_meta(folder, path, stat, file_hash(path))
+
+    @staticmethod
+    def write_meta(folder, path, stat, sha256):
+        handle, temporary = tempfile.mkstemp(dir=folder, suffix='.tmp')
+        with os.fdopen(handle, 'w') as file:
+            json.dump({'source': os.path.abspath(path), 'mtime_ns': stat.st_mtime_ns,
+                       'size': stat.st_size, 'sha256': sha256}, file)
+        os.replace(temporary, os.path.join(folder, 'meta.json'))
+
+
+def load_catalogue(path, cache_dir=CACHE_DIR, on_lookup=None) -> pd.DataFrame:
+    """
+    Cities catalogue
+    :param path: .xlsx / .xls / .csv / .geojson file with the names and coordinates
+    :param cache_dir: folder of the binary cache (None - parse the file every time)
+    :param on_lookup: callback(hit) of the cache lookup
+    :return: DataFrame, index - city names, columns - long, lat
+    """
+    path = str(path)
+    if cache_dir is None:
+        names, lat, long = read_source(path)
+    else:
+        names, lat, long = CatalogueCache(cache_dir, on_lookup).load(path)
+    return pd.DataFrame({'long': long, 'lat': lat}, index=pd.Index(names, name='city'))
@@ -1,2 +1,23 @@
+import os
+import shutil
+import tempfile
+
 bind = "0.0.0.0:8080"
-workers = 2
\ No newline at end of file
+workers = 2
+
+# the workers write their metrics here, /metrics aggregates them (set before the workers import prometheus_client)
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'graphs2-metrics'))
+
+
+def on_starting(server):
+    # the files of the previous run would be counted again
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    # the live gauges (solver queue) of the exited worker are dropped; the metrics module
+    # isn't imported here, it would create the metric files of the master process
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,308 @@
+import atexit
+import logging
+import multiprocessing
+import threading
+import time
+import traceback
+import uuid
+from algorithm.solvers import make_solver
+from algorithm.utils import get_oracle
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+TIMEOUT = 'timeout'
+
+FINISHED = (DONE, FAILED, CANCELLED, TIMEOUT)
+
+MAX_WORKERS = 2
+MAX_PENDING = 8
+JOB_TIMEOUT = 300
+# finished jobs nobody asked for are dropped after this time, seconds
+KEEP_FINISHED = 600
+
+
+# the latest run statistics are kept this long, seconds
+STATS_TTL = 7 * 24 * 3600
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    pass
+
+
+def stats_key(alg):
+    return f'stats:{alg}'
+
+
+def solve_selection(alg, work_df, local_search=False, oracle=None):
+    """
+    Builds and runs the solver for the selection (executed in the job process)
+    :param alg: algorithm code: 'NN', 'CA' or 'CC'
+    :param work_df: DataFrame of the selected cities, index - city names, columns - lat, long
+    :param local_search: run the improvement stage after the construction
+    :param oracle: DistanceOracle of the selection (sliced from the catalogue cache),
+        the distances are computed if None
+    :return: dict with the animation sequences, distance, complexity (operations count), stats
+        (see Instrumentation.as_dict), algorithm and n
+    """
+    # distances are computed once per selection and shared
+    oracle = get_oracle(work_df, oracle)
+    result = make_solver(alg, work_df, oracle=oracle, local_search=local_search).solve()
+    return {'path': result.path_sequence,
+            'path_2': result.second_path_sequence,
+            'nodes': result.nodes_sequence,
+            'distance': result.distance,
+            'complexity': result.complexity,
+            'stats': result.stats,
+            'algorithm': alg,
+            'n': len(work_df)}
+
+
+def solve_into_store(store, key, token, alg, work_df, local_search=False, oracle=None):
+    """
+    Runs solve_selection and writes the outcome to the session store, so that any
+    web worker can pick it up, not only the one which submitted the job
+    :param store: SessionStore
+    :param key: store key of the session result
+    :param token: run token, the pollers ignore the results of the other runs
+    :param alg: algorithm code: 'NN', 'CA' or 'CC'
+    :param work_df: DataFrame of the selected cities
+    :param local_search: run the improvement stage after the construction
+    :param oracle: DistanceOracle of the selection
+    """
+    try:
+        result = solve_selection(alg, work_df, local_search=local_search, oracle=oracle)
+        store.set(key, {'token': token, 'state': DONE, 'result': result})
+    except Exception:
+        store.set(key, {'token': token, 'state': FAILED, 'error': traceback.format_exc()})
+        raise
+    # the latest run of the algorithm, served by the stats route; the solved result stays if this fails
+    try:
+        store.set(stats_key(alg), dict(result['stats'], algorithm=alg, n=len(work_df), finished=time.time()),
+                  ttl=STATS_TTL)
+    except Exception:
+        logger.exception('stats write failed', extra={'event': 'stats_write_failed', 'data': {'algorithm': alg}})
+
+
+def _run(connection, target, args, kwargs):
+    """
+    Job process entry point, sends (state, result or error text) back
+    """
+    try:
+        connection.send((DONE, target(*args, **kwargs)))
+    except Exception:
+        connection.send((FAILED, traceback.format_exc()))
+    finally:
+        connection.close()
+
+
+class Job:
+    """
+    One submitted solve
+    """
+
+    def __init__(self, job_id, target, args, kwargs, timeout):
+        self.id = job_id
+        self.target = target
+        self.args = args
+        self.kwargs = kwargs
+        self.timeout = timeout
+        self.state = PENDING
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.process = None
+        self.connection = None
+        self.result = None
+        self.error = None
+
+    def status(self):
+        now = self.finished or time.time()
+        return {'id': self.id,
+                'state': self.state,
+                'waiting': (self.started or now) - self.submitted,
+                'running': now - self.started if self.started else 0.0,
+                'error': self.error}
+
+
+class JobManager:
+    """
+    Runs solver jobs in separate processes so that the web workers are never blocked
+    At most max_workers jobs run at once and at most max_pending wait for a slot.
+    Every job is a process of its own, so a cancelled or timed out job is terminated
+    right away instead of occupying the slot till the end.
+    The state advances on every call (submit / poll / cancel) and, if poll_interval is set,
+    in a background thread, so the queue moves on even when the polls go to another worker.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, max_pending=MAX_PENDING, timeout=JOB_TIMEOUT, context=None,
+                 poll_interval=None, on_update=None):
+        """
+        Class constructor
+        :param max_workers: number of jobs running at once
+        :param max_pending: number of jobs waiting for a slot
+        :param timeout: default job timeout, seconds (None - no timeout)
+        :param context: multiprocessing start method ('fork', 'spawn'...), default of the platform if None
+        :param poll_interval: period of the background state updates, seconds (None - no thread)
+        :param on_update: callback(pending, running) called with the job counts after every state update
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.on_update = on_update
+        self._context = multiprocessing.get_context(context)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+        atexit.register(self.shutdown)
+
+    @property
+    def queue_depth(self):
+        with self._lock:
+            self._update()
+            return sum(job.state == PENDING for job in self._jobs.values())
+
+    @property
+    def running(self):
+        with self._lock:
+            self._update()
+            return sum(job.state == RUNNING for job in self._jobs.values())
+
+    def submit(self, target, *args, timeout=None, **kwargs):
+        """
+        Queues the job
+        :param target: picklable function, its return value is the job result
+        :param timeout: seconds since the start, the manager default if None
+        :return: job id
+        """
+        with self._lock:
+            self._update()
+            if sum(job.state == PENDING for job in self._jobs.values()) >= self.max_pending:
+                raise QueueFull("Too many pending jobs")
+            job = Job(uuid.uuid4().hex, target, args, kwargs, self.timeout if timeout is None else timeout)
+            self._jobs[job.id] = job
+            self._update()
+            if self.poll_interval is not None and self._thread is None:
+                # started lazily: the worker processes of a preloading server fork after the import
+                self._thread = threading.Thread(target=self._watch, daemon=True)
+                self._thread.start()
+            return job.id
+
+    def poll(self, job_id):
+        """
+        Job status
+        :param job_id: job id
+        :return: dict with the state, waiting / running seconds and the error text
+        """
+        with self._lock:
+            self._update()
+            return self._jobs[job_id].status()
+
+    def result(self, job_id, forget=True):
+        """
+        Result of the finished job
+        :param job_id: job id
+        :param forget: drop the job from the manager after reading
+        :return: the target return value, None if the job isn't done
+        """
+        with self._lock:
+            self._update()
+            job = self._jobs[job_id]
+            if job.state != DONE:
+                return None
+            if forget:
+                del self._jobs[job_id]
+            return job.result
+
+    def cancel(self, job_id):
+        """
+        Cancels the job, terminates its process if it is running
+        :param job_id: job id
+        :return: True if the job was pending or running
+        """
+        with self._lock:
+            self._update()
+            job = self._jobs.get(job_id)
+            if job is None or job.state in FINISHED:
+                return False
+            self._stop(job, CANCELLED)
+            self._update()
+            return True
+
+    def forget(self, job_id):
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+            if job is not None and job.state not in FINISHED:
+                self._stop(job, CANCELLED)
+
+    def shutdown(self):
+        self._stopped.set()
+        with self._lock:
+            for job in self._jobs.values():
+                if job.state not in FINISHED:
+                    self._stop(job, CANCELLED)
+            self._jobs.clear()
+
+    def _watch(self):
+        while not self._stopped.wait(self.poll_interval):
+            with self._lock:
+                self._update()
+
+    def _stop(self, job, state):
+        if job.process is not None:
+            job.process.terminate()
+            job.process.join()
+            job.connection.close()
+        job.state = state
+        job.finished = time.time()
+
+    def _update(self):
+        now = time.time()
+        for job in [job for job in self._jobs.values() if job.state in FINISHED and now - job.finished > KEEP_FINISHED]:
+            del self._jobs[job.id]
+
+        for job in self._jobs.values():
+            if job.state != RUNNING:
+                continue
+            if job.connection.poll():
+                try:
+                    job.state, payload = job.connection.recv()
+                except EOFError:
+                    job.state, payload = FAILED, 'The job process exited without a result'
+                if job.state == DONE:
+                    job.result = payload
+                else:
+                    job.error = payload
+                job.finished = now
+                job.process.join()
+                job.connection.close()
+            elif not job.process.is_alive():
+                job.state, job.finished = FAILED, now
+                job.error = f'The job process exited with the code {job.process.exitcode}'
+                job.connection.close()
+            elif job.timeout is not None and now - job.started > job.timeout:
+                self._stop(job, TIMEOUT)
+
+        slots = self.max_workers - sum(job.state == RUNNING for job in self._jobs.values())
+        for job in self._jobs.values():
+            if slots <= 0:
+                break
+            if job.state == PENDING:
+                receiver, sender = self._context.Pipe(duplex=False)
+                # not a daemon: the solvers may start process pools of their own
+                job.process = self._context.Process(target=_run, args=(sender, job.target, job.args, job.kwargs))
+                job.process.start()
+                sender.close()
+                job.connection = receiver
+                job.state, job.started = RUNNING, time.time()
+                slots -= 1
+
+        if self.on_update is not None:
+            self.on_update(sum(job.state == PENDING for job in self._jobs.values()),
+                           sum(job.state == RUNNING for job in self._jobs.values()))
@@ -0,0 +1,112 @@
+"""
+Prometheus metrics of the web app, served at /metrics
+
+The gunicorn workers are separate processes, so the metrics are written to the
+directory of PROMETHEUS_MULTIPROC_DIR (set by gunicorn_config.py before the workers
+start) and /metrics aggregates the files of all the workers. Without the variable
+the metrics of the current process are served.
+"""
+import os
+import time
+import flask
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST, \
+    generate_latest, multiprocess
+
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+# upper limits of the instance size label, a bounded number of series per algorithm
+SIZE_CLASSES = (10, 50, 200, 1000, 5000)
+
+SOLVE_SECONDS = Histogram('graphs2_solve_seconds', 'Solver run time (all the phases)', ['algorithm', 'size'],
+                          buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300))
+DISTANCE_MATRIX_SECONDS = Histogram('graphs2_distance_matrix_seconds',
+                                    'Catalogue distance matrix build (cache miss) or mapping (hit) time')
+FIGURE_SECONDS = Histogram('graphs2_figure_serialization_seconds', 'Map figure conversion to the JSON data',
+                           buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1))
+CALLBACK_SECONDS = Histogram('graphs2_callback_seconds', 'Dash callback request time', ['output'],
+                             buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5))
+PAYLOAD_BYTES = Histogram('graphs2_callback_payload_bytes', 'Dash callback response size (uncompressed)', ['output'],
+                          buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304))
+QUEUE_DEPTH = Gauge('graphs2_solver_queue_depth', 'Solves waiting for a slot', multiprocess_mode='livesum')
+RUNNING = Gauge('graphs2_solver_running', 'Solves running', multiprocess_mode='livesum')
+CACHE_LOOKUPS = Counter('graphs2_cache_lookups', 'Cache lookups by the result', ['cache', 'result'])
+
+
+def size_class(n):
+    """
+    Instance size label
+    :param n: number of cities
+    :return: '<=10', '<=50'... or '>5000'
+    """
+    for limit in SIZE_CLASSES:
+        if n <= limit:
+            return f'<={limit}'
+    return f'>{SIZE_CLASSES[-1]}'
+
+
+def observe_solve(algorithm, n, seconds):
+    SOLVE_SECONDS.labels(algorithm, size_class(n)).observe(seconds)
+
+
+def observe_jobs(pending, running):
+    """
+    JobManager update hook: the queue of this worker
+    """
+    QUEUE_DEPTH.set(pending)
+    RUNNING.set(running)
+
+
+def cache_lookup(cache):
+    """
+    Lookup hook of a cache
+    :param cache: cache name label
+    :return: function(hit) counting the lookups
+    """
+    hits, misses = CACHE_LOOKUPS.labels(cache, 'hit'), CACHE_LOOKUPS.labels(cache, 'miss')
+
+    def lookup(hit):
+        (hits if hit else misses).inc()
+    return lookup
+
+
+def callback_output(request):
+    """
+    Label of a Dash callback request: the first output of the callback
+    """
+    body = request.get_json(silent=True) or {}
+    output = str(body.get('output', ''))
+    return output.strip('.').split('...')[0] or 'unknown'
+
+
+def registry():
+    if MULTIPROC_DIR is None:
+        return REGISTRY
+    collected = CollectorRegistry()
+    multiprocess.MultiProcessCollector(collected)
+    return collected
+
+
+def register(server, path='/metrics'):
+    """
+    Adds the metrics route and the Dash callback measurements to the Flask server
+    :param server: Flask app (dash.Dash.server)
+    :param path: route of the metrics
+    """
+
+    @server.before_request
+    def start_timer():
+        flask.g.metrics_start = time.perf_counter()
+
+    @server.after_request
+    def observe_callback(response):
+        # Flask-Compress runs after this hook, the size is the uncompressed one
+        if flask.request.path.endswith('_dash-update-component') and 'metrics_start' in flask.g:
+            output = callback_output(flask.request)
+            CALLBACK_SECONDS.labels(output).observe(time.perf_counter() - flask.g.metrics_start)
+            if not response.is_streamed:
+                PAYLOAD_BYTES.labels(output).observe(len(response.get_data()))
+        return response
+
+    @server.route(path)
+    def metrics():
+        return flask.Response(generate_latest(registry()), mimetype=CONTENT_TYPE_LATEST)
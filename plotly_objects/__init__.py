@@ -10,6 +10,13 @@ BASE_MARKER_COLOR = 'blue'
 SELECTED_MARKER_COLOR = 'red'
 HIGHLIGHTED_NODE_COLOR = 'green'
 
+# trace order of the map figure
+PATH_TRACE = 0
+SECOND_PATH_TRACE = 1
+CITIES_TRACE = 2
+SELECTED_TRACE = 3
+NODES_TRACE = 4
+
 
 class BaseMap:
 
@@ -59,72 +66,114 @@ class BaseMap:
         if selected:
             self._selected = None
 
-        self._fig.data = []
+        self._fig = go.Figure()
         return self.get_map()
 
+    @staticmethod
+    def edges(path):
+        """
+        Edges of a highlighted path
+        :param path: list of cities (consecutive ones are connected) or dict of [city, city] pairs
+        :return: list of (city, city) tuples
+        """
+        if path is None:
+            return []
+        if isinstance(path, list):
+            return list(zip(path[:-1], path[1:]))
+        if isinstance(path, dict):
+            return [tuple(edge) for edge in path.values()]
+        raise TypeError("Incorrect input type")
+
+    def line_coordinates(self, edges):
+        """
+        Coordinates of the edges for one line trace, the edges are separated by None
+        :param edges: list of (city, city) tuples
+        :return: lat and lon lists
+        """
+        lat, lon = [], []
+        for a, b in edges:
+            lat += [self._cities.at[a, 'lat'], self._cities.at[b, 'lat'], None]
+            lon += [self._cities.at[a, 'long'], self._cities.at[b, 'long'], None]
+        return lat, lon
+
+    def node_coordinates(self, nodes):
+        nodes = list(nodes or [])
+        # an empty trace can't be set by extendData, a None point is drawn as nothing
+        if not nodes:
+            return [None], [None]
+        return [self._cities.at[item, 'lat'] for item in nodes], [self._cities.at[item, 'long'] for item in nodes]
+
+    def frame_delta(self, previous, current):
+        """
+        Update of the figure showing the previous frame to the current one as the dcc.Graph extendData value
+        The edge traces are extended by the new edges only, the highlighted nodes are replaced
+        :param previous: (highlight_path, second_highlight_path, highlight_nodes) of the shown frame
+        :param current: (highlight_path, second_highlight_path, highlight_nodes) of the next frame
+        :return: [update, trace indices, max points] or None if some edges disappear and the figure is to be redrawn
+        """
+        lat, lon, max_points = [], [], []
+        for old, new in zip(previous[:2], current[:2]):
+            old, new = self.edges(old), self.edges(new)
+            if new[:len(old)] != old:
+                return None
+            trace_lat, trace_lon = self.line_coordinates(new[len(old):])
+            lat.append(trace_lat)
+            lon.append(trace_lon)
+            max_points.append(3 * len(new))
+        trace_lat, trace_lon = self.node_coordinates(current[2])
+        lat.append(trace_lat)
+        lon.append(trace_lon)
+        max_points.append(len(trace_lat))
+        return [dict(lat=lat, lon=lon), [PATH_TRACE, SECOND_PATH_TRACE, NODES_TRACE], max_points]
+
+    def pack_frames(self, path_sequence, second_path_sequence, nodes_sequence):
+        """
+        Animation frames packed once for the playback in the browser (assets/playback.js)
+        The cities of the frames are listed once with their coordinates, a frame keeps only
+        the ids: the flat [a, b, a, b...] edge pairs of both paths and the highlighted nodes
+        :param path_sequence: {step: highlight_path}
+        :param second_path_sequence: {step: second_highlight_path}
+        :param nodes_sequence: {step: highlight_nodes}
+        :return: JSON-ready dict
+        """
+        index, frames = {}, []
+
+        def ids(cities):
+            return [index.setdefault(city, len(index)) for city in cities]
+
+        for step in range(len(path_sequence)):
+            frames.append([ids([city for edge in self.edges(path_sequence[step]) for city in edge]),
+                           ids([city for edge in self.edges(second_path_sequence.get(step)) for city in edge]),
+                           ids(nodes_sequence[step] or [])])
+        cities = list(index)
+        return {'lat': self._cities.loc[cities, 'lat'].tolist(),
+                'lon': self._cities.loc[cities, 'long'].tolist(),
+                'traces': [PATH_TRACE, SECOND_PATH_TRACE, NODES_TRACE],
+                'frames': frames}
+
     def get_map(self, highlight_path=None, second_highlight_path=None, highlight_nodes=None, initial=False):
+        """
+        Figure of the map, a new one on every call
+        The traces always go in the same order (PATH_TRACE ... NODES_TRACE), the empty ones included,
+        so that the figure can be updated by frame_delta
+        """
+        self._fig = go.Figure()
 
-        if highlight_path is not None:
-            if isinstance(highlight_path, list):
-                connect = self._cities.loc[self._cities.index.isin(highlight_path)]
-                connect = connect.reindex(index=highlight_path)
-                self._fig.add_trace(go.Scattermapbox(
-                    lat=connect.lat,
-                    lon=connect.long,
-                    mode='lines',
-                    line=go.scattermapbox.Line(
-                        color='yellow',
-                        width=4
-                    )
-                ))
-            elif isinstance(highlight_path, dict):
-                for k in highlight_path.keys():
-                    lat_lst = [self._cities.at[highlight_path[k][0], 'lat'],
-                               self._cities.at[highlight_path[k][1], 'lat']]
-                    long_lst = [self._cities.at[highlight_path[k][0], 'long'],
-                                self._cities.at[highlight_path[k][1], 'long']]
-                    self._fig.add_trace(go.Scattermapbox(
-                        lat=lat_lst,
-                        lon=long_lst,
-                        mode='lines',
-                        line=go.scattermapbox.Line(
-                            color='yellow',
-                            width=4
-                        )
-                    ))
-            else:
-                raise TypeError("Incorrect input type")
-
-        if second_highlight_path is not None:
-            if isinstance(second_highlight_path, list):
-                connect = self._cities.loc[self._cities.index.isin(second_highlight_path)]
-                connect = connect.reindex(index=highlight_path)
-                self._fig.add_trace(go.Scattermapbox(
-                    lat=connect.lat,
-                    lon=connect.long,
-                    mode='lines',
-                    line=go.scattermapbox.Line(
-                        color='green',
-                        width=2
-                    )
-                ))
-            elif isinstance(second_highlight_path, dict):
-                for k in second_highlight_path.keys():
-                    lat_lst = [self._cities.at[second_highlight_path[k][0], 'lat'],
-                               self._cities.at[second_highlight_path[k][1], 'lat']]
-                    long_lst = [self._cities.at[second_highlight_path[k][0], 'long'],
-                                self._cities.at[second_highlight_path[k][1], 'long']]
-                    self._fig.add_trace(go.Scattermapbox(
-                        lat=lat_lst,
-                        lon=long_lst,
-                        mode='lines',
-                        line=go.scattermapbox.Line(
-                            color='green',
-                            width=2
-                        )
-                    ))
-            else:
-                raise TypeError("Incorrect input type")
+        """
+        Highlighted edges, one trace per path
+        """
+        for path, color, width in ((highlight_path, 'yellow', 4), (second_highlight_path, 'green', 2)):
+            lat, lon = self.line_coordinates(self.edges(path))
+            self._fig.add_trace(go.Scattermapbox(
+                lat=lat,
+                lon=lon,
+                mode='lines',
+                line=go.scattermapbox.Line(
+                    color=color,
+                    width=width
+                ),
+                hoverinfo='skip'
+            ))
 
         """
         Base markers
@@ -145,76 +194,55 @@ class BaseMap:
         """
         Selected items
         """
-        if self._selected is not None:
-            self._fig.add_trace(go.Scattermapbox(
-                lat=self._selected.lat,
-                lon=self._selected.long,
-                mode='markers',
-                marker=go.scattermapbox.Marker(
-                    size=MARKER_SIZE,
-                    color=SELECTED_MARKER_COLOR,
-                    opacity=1
-                ),
-                hoverinfo='text'
-            ))
+        selected = self._selected if self._selected is not None else self._cities.iloc[:0]
+        self._fig.add_trace(go.Scattermapbox(
+            lat=selected.lat,
+            lon=selected.long,
+            mode='markers',
+            marker=go.scattermapbox.Marker(
+                size=MARKER_SIZE,
+                color=SELECTED_MARKER_COLOR,
+                opacity=1
+            ),
+            text=selected.index,
+            hoverinfo='text'
+        ))
 
         """
         Highlighting nodes
         """
-        if highlight_nodes is not None:
-            highlight_lat, highlight_lon = [], []
-            for item in highlight_nodes:
-                highlight_lon.append(self._cities.at[item, 'long'])
-                highlight_lat.append(self._cities.at[item, 'lat'])
-            self._fig.add_trace(go.Scattermapbox(
-                lat=highlight_lat,
-                lon=highlight_lon,
-                mode='markers',
-                marker=go.scattermapbox.Marker(
-                    size=NODE_SIZE,
-                    color=HIGHLIGHTED_NODE_COLOR,
-                    opacity=1
-                ),
-                hoverinfo='text'
-            ))
-
-
-
+        lat, lon = self.node_coordinates(highlight_nodes)
+        self._fig.add_trace(go.Scattermapbox(
+            lat=lat,
+            lon=lon,
+            mode='markers',
+            marker=go.scattermapbox.Marker(
+                size=NODE_SIZE,
+                color=HIGHLIGHTED_NODE_COLOR,
+                opacity=1
+            ),
+            hoverinfo='skip'
+        ))
 
         if initial:
             self._zoom = ZOOM
-            self._fig.update_layout(
-                autosize=True,
-                clickmode='event',
-                showlegend=False,
-                margin_l=0,
-                margin_t=0,
-                mapbox=dict(
-                    accesstoken=map_token,
-                    bearing=0,
-                    center=dict(
-                        lat=self._cities.lat.mean(),
-                        lon=self._cities.long.mean(),
-                    ),
-                    pitch=0,
-                    zoom=self._zoom,
-                    style='light'
+        self._fig.update_layout(
+            autosize=True,
+            clickmode='event',
+            showlegend=False,
+            margin_l=0,
+            margin_t=0,
+            mapbox=dict(
+                accesstoken=map_token,
+                bearing=0,
+                center=dict(
+                    lat=self._cities.lat.mean(),
+                    lon=self._cities.long.mean(),
                 ),
-            )
-        else:
-            self._fig.update_layout(
-                autosize=True,
-                clickmode='event',
-                showlegend=False,
-                margin_l=0,
-                margin_t=0,
-                mapbox=dict(
-                    accesstoken=map_token,
-                    bearing=0,
-                    pitch=0,
-                    zoom=self._zoom,
-                    style='light'
-                ),
-            )
+                pitch=0,
+                zoom=self._zoom,
+                style='light'
+            ),
+        )
 
         return self._fig
@@ -0,0 +1,130 @@
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+SESSION_TTL = 3600
+# recently read values kept in the process, the stored values are never changed in place
+LOCAL_CACHE_SIZE = 32
+
+DEFAULT_PATH = os.environ.get('SESSION_STORE', os.path.join(tempfile.gettempdir(), 'graphs2-sessions.sqlite'))
+
+
+class SessionStore:
+    """
+    Server-side key-value store for the session state shared by all the workers
+    Values are pickled into an SQLite file, so any gunicorn worker and any job process
+    sees the same data. Every key has a TTL, expired keys are evicted on writes.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, ttl=SESSION_TTL, on_lookup=None):
+        """
+        Class constructor
+        :param path: SQLite file path
+        :param ttl: default time to live of the keys, seconds
+        :param on_lookup: callback(hit) called on every get_cached, hit - served from the process memory
+        """
+        self.path = path
+        self.ttl = ttl
+        self.on_lookup = on_lookup
+        self._connection = None
+        self._pid = None
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # the store is passed to the job processes, they open their own connections (and report nothing)
+        return {'path': self.path, 'ttl': self.ttl}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @property
+    def connection(self):
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                               check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS store '
+                                     '(key TEXT PRIMARY KEY, value BLOB, expires REAL)')
+            self._pid = os.getpid()
+            self._local.clear()
+        return self._connection
+
+    def get(self, key, default=None):
+        """
+        Value of the key
+        :param key: key
+        :param default: returned for missing or expired keys
+        :return: stored value
+        """
+        with self._lock:
+            row = self.connection.execute('SELECT value, expires FROM store WHERE key = ?', (key,)).fetchone()
+            if row is None or row[1] < time.time():
+                return default
+            return pickle.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        """
+        Stores the value
+        :param key: key
+        :param value: picklable value
+        :param ttl: time to live, seconds (the store default if None)
+        """
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self.connection.execute('INSERT OR REPLACE INTO store (key, value, expires) VALUES (?, ?, ?)',
+                                    (key, blob, expires))
+            self.connection.execute('DELETE FROM store WHERE expires < ?', (time.time(),))
+
+    def delete(self, key):
+        with self._lock:
+            self._local.pop(key, None)
+            self.connection.execute('DELETE FROM store WHERE key = ?', (key,))
+
+    def get_cached(self, key):
+        """
+        Value of a key written once and never changed (a solver result),
+        the recent ones are served from the process memory without unpickling
+        :param key: key
+        :return: stored value or None
+        """
+        with self._lock:
+            hit = key in self._local
+            if hit:
+                self._local.move_to_end(key)
+                value = self._local[key]
+        if self.on_lookup is not None:
+            self.on_lookup(hit)
+        if hit:
+            return value
+        value = self.get(key)
+        if value is not None:
+            with self._lock:
+                self._local[key] = value
+                while len(self._local) > LOCAL_CACHE_SIZE:
+                    self._local.popitem(last=False)
+        return value
+
+
+def new_session():
+    """
+    Initial client-side state of a browser tab (kept in dcc.Store, small values only)
+    checked - selected city names, counter - next animation frame,
+    job - token of the running solve, result - store key of its result,
+    shown - animation frame on the screen (None if the figure shows no frame)
+    """
+    return {'sid': uuid.uuid4().hex,
+            'checked': [],
+            'zoom': None,
+            'counter': 0,
+            'pause': False,
+            'job': None,
+            'deadline': None,
+            'result': None,
+            'shown': None}
@@ -0,0 +1,63 @@
+from unittest import TestCase
+import json
+import logging
+import os
+import tempfile
+import numpy as np
+from applog import DroppingQueueHandler, cap, configure_logging, shutdown_logging
+
+
+class TestAppLog(TestCase):
+
+    def setUp(self) -> None:
+        self.path = os.path.join(tempfile.mkdtemp(), 'test.log')
+
+    def tearDown(self) -> None:
+        shutdown_logging()
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            if isinstance(handler, DroppingQueueHandler):
+                root.removeHandler(handler)
+
+    def read(self):
+        shutdown_logging()
+        with open(self.path) as file:
+            return [json.loads(line) for line in file]
+
+    def test_cap(self):
+        self.assertEqual(cap([1, 2, 3], max_items=5), [1, 2, 3])
+        self.assertEqual(cap(list(range(100)), max_items=5), {'size': 100, 'head': [0, 1, 2, 3, 4]})
+        self.assertEqual(cap(np.arange(100, dtype=np.int32), max_items=2), {'size': 100, 'head': [0, 1]})
+        self.assertEqual(cap({i: str(i) for i in range(10)}, max_items=1), {'size': 10, 'head': {0: '0'}})
+        self.assertEqual(cap('x' * 10, max_chars=4), {'size': 10, 'head': 'xxxx'})
+        self.assertEqual(cap(0.5), 0.5)
+
+    def test_events(self):
+        configure_logging(self.path, rates={'skipped': 0.0}, max_items=3)
+        logger = logging.getLogger('algorithm.test')
+        tour = list(range(1000))
+        logger.info('tour', extra={'event': 'tour', 'data': {'tour': tour, 'gap': 0.01}})
+        logger.info('never', extra={'event': 'skipped', 'data': {'tour': tour}})
+        logger.debug('below the level')
+        entries = self.read()
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]['event'], 'tour')
+        self.assertEqual(entries[0]['logger'], 'algorithm.test')
+        self.assertEqual(entries[0]['data'], {'tour': {'size': 1000, 'head': [0, 1, 2]}, 'gap': 0.01})
+        # the record holds a copy, the payload of the caller is untouched
+        self.assertEqual(len(tour), 1000)
+
+    def test_exception(self):
+        configure_logging(self.path, max_chars=100)
+        logger = logging.getLogger('algorithm.test')
+        try:
+            raise ValueError('x' * 300)
+        except ValueError:
+            logger.exception('solve %s failed', 'r1', extra={'event': 'failure'})
+        entry = self.read()[0]
+        self.assertEqual(entry['message'], 'solve r1 failed')
+        self.assertEqual(entry['event'], 'failure')
+        # the traceback is a field of its own, cut to its end
+        self.assertTrue(entry['exception'].startswith('...'))
+        self.assertTrue(entry['exception'].endswith('x' * 50))
+        self.assertEqual(len(entry['exception']), 103)
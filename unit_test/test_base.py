@@ -0,0 +1,35 @@
+from unittest import TestCase
+from pathlib import Path
+from algorithm.base import SolverResult
+from algorithm.solvers import SOLVERS, make_solver
+from catalogue import load_catalogue
+
+
+class TestBaseSolver(TestCase):
+
+    def setUp(self) -> None:
+        self.df = load_catalogue(str(Path(__file__).parent.parent) + '/assets/gps_cities.xlsx', cache_dir=None)
+
+    def test_solve_once(self):
+        for alg in SOLVERS:
+            solver = make_solver(alg, self.df.iloc[:8].copy())
+            self.assertFalse(solver.solved)
+            result = solver.solve()
+            self.assertIsInstance(result, SolverResult)
+            operations = solver.instrumentation.operations
+            self.assertIs(solver.get_scenario(), result)
+            self.assertEqual(solver.path, result.path)
+            self.assertEqual(solver.complexity, operations)
+            self.assertEqual(solver.instrumentation.operations, operations)
+            self.assertEqual(len(solver.path_sequence), len(solver.second_path_sequence))
+            with self.assertRaises(AttributeError):
+                result.distance = 0
+
+    def test_single_city(self):
+        for alg in SOLVERS:
+            solver = make_solver(alg, self.df.iloc[:1].copy())
+            self.assertEqual(solver.distance, 0)
+            self.assertEqual(solver.path, [self.df.index[0]] * 2)
+            operations = solver.instrumentation.operations
+            self.assertEqual(solver.distance, 0)
+            self.assertEqual(solver.instrumentation.operations, operations)
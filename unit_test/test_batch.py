@@ -0,0 +1,73 @@
+from unittest import TestCase
+from pathlib import Path
+import json
+import os
+import tempfile
+import pyarrow as pa
+import pyarrow.parquet as pq
+from batch import read_instances, run_batch, solve_batch
+from catalogue import load_catalogue
+
+
+class TestBatch(TestCase):
+
+    def setUp(self) -> None:
+        ROOT_PATH = str(Path(__file__).parent.parent)
+        self.catalogue = ROOT_PATH + '/assets/gps_cities.xlsx'
+        self.cities = list(load_catalogue(self.catalogue, cache_dir=None).index)
+        self.folder = tempfile.TemporaryDirectory()
+        self.instances = [{'id': i, 'algorithm': alg, 'cities': self.cities[i:i + 8]}
+                          for i, alg in enumerate(['NN', 'CA', 'CC', 'NN', 'CA', 'CC'])]
+        self.instances.append({'id': 'points', 'points': [[52.5, 13.4], [48.8, 2.3], [41.9, 12.5], [40.4, -3.7]]})
+
+    def tearDown(self) -> None:
+        self.folder.cleanup()
+
+    def test_inline(self):
+        results = list(solve_batch(self.instances, self.catalogue, workers=1, cache_dir=self.folder.name))
+        self.assertEqual([result['id'] for result in results], [record['id'] for record in self.instances])
+        for result in results:
+            self.assertNotIn('error', result)
+            self.assertEqual(result['tour'][0], result['tour'][-1])
+            self.assertEqual(len(set(result['tour'])), result['n'])
+            self.assertGreater(result['length'], 0)
+
+    def test_options(self):
+        record = {'id': 'ms', 'algorithm': 'NN', 'cities': self.cities[:12], 'start': self.cities[3]}
+        single, = solve_batch([record], self.catalogue, workers=1, cache_dir=self.folder.name)
+        # the CLI defaults apply to the instances without the options, shortcut isn't one of NN
+        multi, = solve_batch([record], self.catalogue, workers=1, cache_dir=self.folder.name,
+                             options={'starts': 3, 'time_limit': 5, 'shortcut': 'best'})
+        self.assertEqual(multi['tour'][0], self.cities[3])
+        self.assertLessEqual(multi['length'], single['length'] + 1e-9)
+        self.assertGreater(multi['stats']['counters']['comparisons'], single['stats']['counters']['comparisons'])
+
+    def test_pool_stream(self):
+        input_path = os.path.join(self.folder.name, 'instances.jsonl')
+        output_path = os.path.join(self.folder.name, 'results.jsonl')
+        with open(input_path, 'w') as file:
+            for record in self.instances + [{'id': 'bad', 'cities': ['Atlantis']}]:
+                file.write(json.dumps(record) + '\n')
+        solved, failed = run_batch(input_path, output_path, self.catalogue, workers=2, cache_dir=self.folder.name)
+        self.assertEqual((solved, failed), (len(self.instances), 1))
+        with open(output_path) as file:
+            results = {result['id']: result for result in map(json.loads, file)}
+        self.assertIn('Atlantis', results['bad']['error'])
+        inline = {result['id']: result for result in solve_batch(self.instances, self.catalogue, workers=1,
+                                                                 cache_dir=self.folder.name)}
+        for key, result in inline.items():
+            self.assertAlmostEqual(results[key]['length'], result['length'])
+
+    def test_parquet(self):
+        input_path = os.path.join(self.folder.name, 'instances.parquet')
+        table = pa.table({'id': [str(record['id']) for record in self.instances],
+                          'algorithm': [record.get('algorithm') for record in self.instances],
+                          'cities': [record.get('cities') for record in self.instances],
+                          'points': [record.get('points') for record in self.instances]})
+        # several row groups, read batch by batch
+        pq.write_table(table, input_path, row_group_size=3)
+        records = list(read_instances(input_path))
+        self.assertEqual(records[0], {'id': '0', 'algorithm': 'NN', 'cities': self.cities[:8]})
+        self.assertEqual(records[-1], {'id': 'points', 'points': self.instances[-1]['points']})
+        results = list(solve_batch(records, self.catalogue, workers=1, cache_dir=self.folder.name))
+        self.assertFalse([result for result in results if 'error' in result])
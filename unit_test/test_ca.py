@@ -1,13 +1,16 @@
 from unittest import TestCase
 import unittest
 from pathlib import Path
-import pandas as pd
 from algorithm.christ import get_distance
 from algorithm.christ import optimal_matching as om
-from algorithm.christ import distances_table
+from algorithm.utils import distances_table
+from algorithm.distances import distance_matrix
+from algorithm.matching import EXACT_MATCHING_LIMIT, min_weight_matching
 
 from algorithm.christ import ChristAlgorithm
 import numpy as np
+import pandas as pd
+from catalogue import load_catalogue
 
 
 class TestApp(TestCase):
@@ -15,7 +18,7 @@ class TestApp(TestCase):
     def setUp(self) -> None:
         ROOT_PATH = str(Path(__file__).parent.parent)
         DATA_PATH = ROOT_PATH + '/assets/gps_cities.xlsx'
-        self.df = pd.read_excel(DATA_PATH, index_col=0)
+        self.df = load_catalogue(DATA_PATH, cache_dir=None)
         try:
             self.ca = ChristAlgorithm(self.df)
         except Exception as e:
@@ -41,9 +44,51 @@ class TestApp(TestCase):
         nodes = list(self.df.index)[:6]
         mwfm = om(nodes, self.ca.df_dist)
 
+    def test_matching_modes(self):
+        nodes = list(self.df.index)[:10]
+        exact = om(nodes, self.ca.oracle)
+        greedy = om(nodes, self.ca.oracle, mode='greedy')
+        for matching in (exact, greedy):
+            self.assertEqual(sorted(node for pair in matching for node in pair), sorted(nodes))
+        weight = lambda matching: sum(get_distance(node1, node2, self.ca.oracle) for node1, node2 in matching)
+        self.assertLessEqual(weight(exact), weight(greedy) + 1e-9)
+        with self.assertRaises(ValueError):
+            om(nodes[:3], self.ca.oracle)
+        # the auto mode is exact up to the limit, greedy above
+        rng = np.random.default_rng(3)
+        m = EXACT_MATCHING_LIMIT + 2
+        matrix = distance_matrix(rng.uniform(36, 60, m), rng.uniform(-10, 30, m))
+        np.testing.assert_array_equal(min_weight_matching(matrix), min_weight_matching(matrix, 'greedy'))
+
     def test_get_scenario(self):
         self.ca.get_scenario()
 
+    def test_shortcut_modes(self):
+        best = ChristAlgorithm(self.df, oracle=self.ca.oracle, shortcut='best')
+        self.assertEqual(sorted(best.path[:-1]), sorted(self.df.index))
+        self.assertEqual(best.path[0], best.path[-1])
+        with self.assertRaises(ValueError):
+            ChristAlgorithm(self.df, shortcut='last')
+
+    def test_doubled_edge(self):
+        # a star: the centre is odd and is matched to its nearest leaf over the MST edge,
+        # the Euler circuit has to keep both copies of the edge
+        df = pd.DataFrame({'lat': [50.0, 51.0, 49.0, 49.0], 'long': [10.0, 10.0, 9.0, 11.0]},
+                          index=pd.Index(['centre', 'north', 'west', 'east'], name='city'))
+        ca = ChristAlgorithm(df)
+        self.assertEqual(ca.path[0], ca.path[-1])
+        self.assertEqual(sorted(ca.path[:-1]), sorted(df.index))
+
+    def test_candidate_matching(self):
+        # the greedy matching of the candidate mode runs on the candidate graph of the odd vertices
+        ca = ChristAlgorithm(self.df, candidates=4, matching='greedy')
+        self.assertEqual(sorted(ca.path[:-1]), sorted(self.df.index))
+        odd = np.array([ca.names.index(node) for node in ca.odd_vertexes])
+        pairs = ca.match_odd(odd)
+        self.assertEqual(sorted(pairs.ravel().tolist()), sorted(odd.tolist()))
+        with self.assertRaises(ValueError):
+            ChristAlgorithm(self.df, matching='optimal')
+
     @unittest.skip('Too long test')
     def test_distance_with_external(self):
         cities = list(self.df.index)
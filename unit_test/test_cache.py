@@ -0,0 +1,50 @@
+from unittest import TestCase
+from pathlib import Path
+import os
+import tempfile
+import numpy as np
+from algorithm.cache import DistanceCache
+from algorithm.oracle import DistanceOracle
+from catalogue import load_catalogue
+
+
+class TestDistanceCache(TestCase):
+
+    def setUp(self) -> None:
+        ROOT_PATH = str(Path(__file__).parent.parent)
+        self.df = load_catalogue(ROOT_PATH + '/assets/gps_cities.xlsx', cache_dir=None)
+        self.folder = tempfile.TemporaryDirectory()
+        self.cache = DistanceCache(self.folder.name, max_entries=2)
+
+    def tearDown(self) -> None:
+        self.folder.cleanup()
+
+    def test_reuse(self):
+        first = self.cache.load(self.df)
+        second = self.cache.load(self.df)
+        self.assertIsInstance(second.matrix.base, np.memmap)
+        self.assertFalse(second.matrix.flags.writeable)
+        np.testing.assert_allclose(first.matrix, DistanceOracle.from_frame(self.df).matrix)
+        self.assertEqual(len([name for name in os.listdir(self.folder.name) if name.endswith('.npy')]), 1)
+
+    def test_subset(self):
+        selection = self.df.iloc[[3, 0, 7]]
+        oracle = self.cache.load(self.df).subset(selection.index)
+        np.testing.assert_allclose(oracle.matrix, DistanceOracle.from_frame(selection).matrix)
+
+    def test_invalidation(self):
+        self.cache.load(self.df)
+        moved = self.df.copy()
+        moved.iloc[0, moved.columns.get_loc('lat')] += 0.5
+        oracle = self.cache.load(moved)
+        np.testing.assert_allclose(oracle.matrix, DistanceOracle.from_frame(moved).matrix)
+        self.cache.load(self.df.iloc[:5])
+        self.assertEqual(len([name for name in os.listdir(self.folder.name) if name.endswith('.npy')]), 2)
+
+    def test_storage(self):
+        dense = self.cache.load(self.df)
+        for storage, size in (('float32', 4 * len(self.df) ** 2), ('packed32', 2 * len(self.df) * (len(self.df) - 1))):
+            oracle = DistanceCache(self.folder.name, storage=storage).load(self.df)
+            self.assertEqual(oracle.matrix.nbytes, size)
+            selection = self.df.index[[3, 0, 7]]
+            np.testing.assert_allclose(oracle.subset(selection).matrix, dense.subset(selection).matrix, rtol=1e-6)
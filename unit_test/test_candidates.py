@@ -0,0 +1,41 @@
+from unittest import TestCase
+import numpy as np
+from scipy.sparse.csgraph import minimum_spanning_tree
+from algorithm.algorithm import nearest_neighbour_tour
+from algorithm.candidates import candidate_graph, sparse_nearest_neighbour_tour, sparse_minimum_spanning_tree
+from algorithm.distances import distance_matrix
+from algorithm.matching import sparse_greedy_matching
+
+
+class TestCandidates(TestCase):
+
+    def setUp(self) -> None:
+        rng = np.random.default_rng(7)
+        self.lat, self.long = rng.uniform(36, 60, 300), rng.uniform(-10, 30, 300)
+        self.matrix = distance_matrix(self.lat, self.long)
+
+    def test_knn_lists(self):
+        graph = candidate_graph(self.lat, self.long, k=6)
+        self.assertEqual(graph.neighbours.shape, (300, 6))
+        self.assertFalse(np.any(graph.neighbours == np.arange(300)[:, None]))
+        self.assertTrue(np.all(np.diff(graph.weights, axis=1) >= 0))
+        expected = np.sort(self.matrix + np.diag(np.full(300, np.inf)), axis=1)[:, :6]
+        self.assertTrue(np.allclose(graph.weights, expected))
+
+    def test_sparse_nearest_neighbour(self):
+        graph = candidate_graph(self.lat, self.long, k=4)
+        tour = sparse_nearest_neighbour_tour(graph, 3)
+        self.assertTrue(np.array_equal(tour, nearest_neighbour_tour(self.matrix, 3)))
+
+    def test_sparse_mst(self):
+        expected = minimum_spanning_tree(self.matrix).sum()
+        for method in ('knn', 'delaunay', 'both'):
+            edges = sparse_minimum_spanning_tree(candidate_graph(self.lat, self.long, k=3, method=method))
+            self.assertEqual(len(edges), 299)
+            self.assertAlmostEqual(self.matrix[edges[:, 0], edges[:, 1]].sum(), expected, places=6)
+
+    def test_sparse_greedy_matching(self):
+        odd = np.arange(0, 300, 3)
+        pairs = sparse_greedy_matching(candidate_graph(self.lat[odd], self.long[odd], k=2))
+        self.assertEqual(pairs.shape, (50, 2))
+        self.assertTrue(np.array_equal(np.sort(pairs.ravel()), np.arange(100)))
@@ -0,0 +1,71 @@
+from unittest import TestCase
+from unittest import mock
+from pathlib import Path
+import json
+import os
+import tempfile
+import pandas as pd
+import catalogue
+from catalogue import load_catalogue
+
+
+class TestCatalogue(TestCase):
+
+    def setUp(self) -> None:
+        ROOT_PATH = str(Path(__file__).parent.parent)
+        self.excel = ROOT_PATH + '/assets/gps_cities.xlsx'
+        self.df = load_catalogue(self.excel, cache_dir=None)
+        self.folder = tempfile.TemporaryDirectory()
+        self.cache = os.path.join(self.folder.name, 'cache')
+
+    def tearDown(self) -> None:
+        self.folder.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.folder.name, name)
+
+    def test_excel(self):
+        self.assertEqual(self.df.index.name, 'city')
+        self.assertEqual(list(self.df.columns), ['long', 'lat'])
+        pd.testing.assert_frame_equal(load_catalogue(self.excel, self.cache), self.df)
+        with mock.patch.object(catalogue, 'read_source') as read_source:
+            pd.testing.assert_frame_equal(load_catalogue(self.excel, self.cache), self.df)
+        read_source.assert_not_called()
+
+    def test_csv(self):
+        self.df.rename(columns={'long': 'Longitude', 'lat': 'Latitude'}).to_csv(self.path('cities.csv'))
+        pd.testing.assert_frame_equal(load_catalogue(self.path('cities.csv'), self.cache), self.df)
+
+    def test_geojson(self):
+        features = [{'type': 'Feature', 'properties': {'name': city},
+                     'geometry': {'type': 'Point', 'coordinates': [row.long, row.lat]}}
+                    for city, row in self.df.iterrows()]
+        with open(self.path('cities.geojson'), 'w') as file:
+            json.dump({'type': 'FeatureCollection', 'features': features}, file)
+        pd.testing.assert_frame_equal(load_catalogue(self.path('cities.geojson'), self.cache), self.df)
+        # the features are decoded one by one, whatever the chunks cut through and the other members around
+        with open(self.path('cities.geojson'), 'w') as file:
+            json.dump({'type': 'FeatureCollection', 'bbox': [-10.5, 36, 30, 60.25], 'crs': {'type': 'name'},
+                       'features': features + [{'type': 'Feature', 'properties': {}, 'geometry': None}],
+                       'name': 'cities'}, file, indent=1)
+        features = list(catalogue.iter_features(self.path('cities.geojson'), chunk=7))
+        self.assertEqual(len(features), len(self.df) + 1)
+        self.assertEqual(features[0]['geometry']['coordinates'], [self.df.long.iloc[0], self.df.lat.iloc[0]])
+        names, lat, long = catalogue.read_geojson(self.path('cities.geojson'))
+        self.assertEqual(list(names), list(self.df.index))
+
+    def test_invalidation(self):
+        path = self.path('cities.csv')
+        self.df.to_csv(path)
+        load_catalogue(path, self.cache)
+        # the same content with a new mtime is checked by the hash, not parsed
+        os.utime(path, ns=(0, 0))
+        with mock.patch.object(catalogue, 'read_source') as read_source:
+            load_catalogue(path, self.cache)
+        read_source.assert_not_called()
+        folder = catalogue.CatalogueCache(self.cache).folder(path)
+        self.assertTrue(os.path.exists(os.path.join(folder, catalogue.CACHE_FILE)))
+        moved = self.df.copy()
+        moved['lat'] += 1
+        moved.to_csv(path)
+        pd.testing.assert_frame_equal(load_catalogue(path, self.cache), moved)
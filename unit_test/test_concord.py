@@ -1,15 +1,15 @@
 from tsp_solver.greedy import solve_tsp
 from unittest import TestCase
 from pathlib import Path
-import pandas as pd
-from algorithm.christ import distances_table
+from algorithm.utils import distances_table
+from catalogue import load_catalogue
 
 
 class TestConcord(TestCase):
     def setUp(self) -> None:
         ROOT_PATH = str(Path(__file__).parent.parent)
         DATA_PATH = ROOT_PATH + '/assets/gps_cities.xlsx'
-        self.df = pd.read_excel(DATA_PATH, index_col=0)
+        self.df = load_catalogue(DATA_PATH, cache_dir=None)
         distance_table = distances_table(self.df, permute=True)
         self.distance_matrix = distance_table.pivot(index='city1', columns='city2', values='dist').fillna(0)
 
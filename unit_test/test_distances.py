@@ -0,0 +1,82 @@
+from unittest import TestCase
+from pathlib import Path
+import numpy as np
+from geopy.distance import geodesic
+from algorithm.distances import distance_matrix, long_form, METRICS
+from algorithm.oracle import DistanceOracle
+from algorithm.utils import distances_table, get_distance
+from catalogue import load_catalogue
+
+
+class TestDistances(TestCase):
+
+    def setUp(self) -> None:
+        ROOT_PATH = str(Path(__file__).parent.parent)
+        DATA_PATH = ROOT_PATH + '/assets/gps_cities.xlsx'
+        self.df = load_catalogue(DATA_PATH, cache_dir=None)
+
+    def test_matrix_shape(self):
+        for metric in METRICS:
+            matrix = distance_matrix(self.df.lat, self.df.long, metric=metric)
+            self.assertEqual(matrix.shape, (len(self.df), len(self.df)))
+            self.assertEqual(matrix.dtype, np.float64)
+            self.assertTrue(np.array_equal(matrix, matrix.T))
+            self.assertTrue(np.all(np.diag(matrix) == 0))
+            # the tiles only bound the temporaries, the values are the same
+            tiled = distance_matrix(self.df.lat, self.df.long, metric=metric, tile=3)
+            self.assertTrue(np.array_equal(tiled, tiled.T))
+            np.testing.assert_allclose(tiled, matrix, rtol=1e-12)
+
+    def test_vincenty_against_geodesic(self):
+        matrix = distance_matrix(self.df.lat, self.df.long, metric='vincenty')
+        row = self.df.iloc[0]
+        for j, other in enumerate(self.df.itertuples()):
+            expected = geodesic((row.lat, row.long), (other.lat, other.long)).km
+            self.assertAlmostEqual(matrix[0, j], expected, places=4)
+
+    def test_long_form(self):
+        matrix = distance_matrix(self.df.lat, self.df.long)
+        n = len(self.df)
+        self.assertEqual(len(long_form(matrix, self.df.index)), n * (n + 1) // 2)
+        self.assertEqual(len(long_form(matrix, self.df.index, permute=True)), n * n)
+
+        df_dist = distances_table(self.df)
+        first = df_dist.iloc[1]
+        self.assertEqual((first.city1, first.city2), (self.df.index[0], self.df.index[1]))
+        self.assertAlmostEqual(first.dist, matrix[0, 1])
+        self.assertEqual(df_dist.city1.dtype, 'category')
+
+    def test_unknown_metric(self):
+        with self.assertRaises(ValueError):
+            distance_matrix(self.df.lat, self.df.long, metric='manhattan')
+
+
+class TestDistanceOracle(TestCase):
+
+    def setUp(self) -> None:
+        ROOT_PATH = str(Path(__file__).parent.parent)
+        DATA_PATH = ROOT_PATH + '/assets/gps_cities.xlsx'
+        self.df = load_catalogue(DATA_PATH, cache_dir=None)
+        self.oracle = DistanceOracle.from_frame(self.df)
+        self.df_dist = distances_table(self.df)
+
+    def test_lookup_matches_table(self):
+        city1, city2 = self.df.index[3], self.df.index[7]
+        expected = get_distance(city1, city2, self.df_dist)
+        self.assertAlmostEqual(self.oracle.distance(city1, city2), expected)
+        self.assertAlmostEqual(get_distance(city2, city1, self.oracle), expected)
+
+    def test_pairs_and_tour(self):
+        tour = list(self.df.index[:5])
+        pairs = list(zip(tour[:-1], tour[1:]))
+        lengths = self.oracle.pair_distances(pairs)
+        self.assertEqual(len(lengths), 4)
+        self.assertAlmostEqual(self.oracle.tour_length(tour), lengths.sum())
+        self.assertAlmostEqual(self.oracle.tour_length(tour, closed=True),
+                               lengths.sum() + self.oracle.distance(tour[-1], tour[0]))
+
+    def test_subset(self):
+        names = list(self.df.index[[5, 2, 9]])
+        sub = self.oracle.subset(names)
+        self.assertEqual(sub.names, names)
+        self.assertAlmostEqual(sub.distance(names[0], names[2]), self.oracle.distance(names[0], names[2]))
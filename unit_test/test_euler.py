@@ -0,0 +1,54 @@
+from unittest import TestCase
+from collections import Counter
+import numpy as np
+from algorithm.distances import distance_matrix
+from algorithm.euler import euler_circuit, odd_vertices, shortcut, to_networkx
+from algorithm.exact import dense_prim
+from algorithm.matching import min_weight_matching
+from algorithm.tour import tour_length
+
+
+class TestEuler(TestCase):
+
+    def setUp(self) -> None:
+        # a path 0-1-2-3 with its odd ends matched and the doubled edge 1-2
+        self.edges = np.array([[0, 1], [1, 2], [2, 3], [3, 0], [1, 2], [2, 1]])
+
+    def test_odd_vertices(self):
+        self.assertEqual(odd_vertices(5, [[0, 1], [1, 2], [2, 3]]).tolist(), [0, 3])
+        self.assertEqual(odd_vertices(3, np.zeros((0, 2), dtype=int)).tolist(), [])
+
+    def test_euler_circuit(self):
+        walk = euler_circuit(4, self.edges, start=2)
+        self.assertEqual(len(walk), len(self.edges) + 1)
+        self.assertEqual(walk[0], 2)
+        self.assertEqual(walk[-1], 2)
+        steps = Counter(tuple(sorted(step)) for step in zip(walk[:-1].tolist(), walk[1:].tolist()))
+        self.assertEqual(steps, Counter(tuple(sorted(edge)) for edge in self.edges.tolist()))
+        self.assertEqual(euler_circuit(1, np.zeros((0, 2), dtype=int)).tolist(), [0])
+
+    def test_shortcut(self):
+        self.assertEqual(shortcut([0, 1, 2, 1, 3, 0], 4).tolist(), [0, 1, 2, 3])
+        with self.assertRaises(ValueError):
+            shortcut([0, 1, 2, 1, 3, 0], 4, mode='last')
+        with self.assertRaises(ValueError):
+            shortcut([0, 1, 2, 1, 3, 0], 4, mode='best')
+
+    def test_best_shortcut(self):
+        rng = np.random.default_rng(5)
+        n = 200
+        matrix = distance_matrix(rng.uniform(36, 60, n), rng.uniform(-10, 30, n))
+        parent, _ = dense_prim(matrix)
+        tree = np.column_stack((np.arange(1, n), parent[1:]))
+        odd = odd_vertices(n, tree)
+        walk = euler_circuit(n, np.concatenate((tree, odd[min_weight_matching(matrix[np.ix_(odd, odd)])])))
+        first = shortcut(walk, n)
+        best = shortcut(walk, n, mode='best', matrix=matrix)
+        self.assertEqual(best[0], walk[0])
+        self.assertEqual(sorted(best.tolist()), list(range(n)))
+        self.assertLess(tour_length(matrix, best), tour_length(matrix, first))
+
+    def test_to_networkx(self):
+        graph = to_networkx(['a', 'b', 'c', 'd'], self.edges, multigraph=True)
+        self.assertEqual(graph.number_of_edges(), len(self.edges))
+        self.assertEqual(graph.degree('c'), 4)
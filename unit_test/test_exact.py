@@ -0,0 +1,38 @@
+from unittest import TestCase
+from itertools import permutations
+import numpy as np
+from algorithm.distances import distance_matrix
+from algorithm.exact import held_karp, one_tree_bound, solve, tour_cost
+
+
+class TestExact(TestCase):
+
+    def setUp(self) -> None:
+        rng = np.random.default_rng(11)
+        self.lat, self.long = rng.uniform(36, 60, 40), rng.uniform(-10, 30, 40)
+        self.matrix = distance_matrix(self.lat, self.long)
+
+    def test_held_karp(self):
+        matrix = self.matrix[:8, :8]
+        tour, length, _ = held_karp(matrix)
+        brute = min(tour_cost(matrix, np.array((0,) + combo + (0,))) for combo in permutations(range(1, 8)))
+        self.assertAlmostEqual(length, brute)
+        self.assertAlmostEqual(tour_cost(matrix, tour), brute)
+        self.assertEqual(sorted(tour[:-1]), list(range(8)))
+        self.assertLessEqual(one_tree_bound(matrix, upper=length), length + 1e-6)
+
+    def test_solve_small_is_optimal(self):
+        solution = solve(self.matrix[:12, :12])
+        self.assertTrue(solution.optimal)
+        self.assertEqual(solution.gap, 0)
+        self.assertAlmostEqual(solution.length, held_karp(self.matrix[:12, :12])[1])
+
+    def test_solve_large(self):
+        for workers in (1, 2):
+            solution = solve(self.matrix, time_limit=1, workers=workers)
+            self.assertEqual(solution.tour[0], 0)
+            self.assertEqual(sorted(solution.tour[:-1]), list(range(40)))
+            self.assertAlmostEqual(solution.length, tour_cost(self.matrix, solution.tour))
+            self.assertLessEqual(solution.lower_bound, solution.length)
+            self.assertGreaterEqual(solution.gap, 0)
+            self.assertLess(solution.gap, 0.1)
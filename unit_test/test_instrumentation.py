@@ -0,0 +1,55 @@
+from unittest import TestCase
+import numpy as np
+import pandas as pd
+from algorithm.algorithm import NearestNeighbour, nearest_neighbour_tour
+from algorithm.christ import ChristAlgorithm
+from algorithm.concord import ConcordAlgorithm
+from algorithm.exact import dense_prim
+from algorithm.instrumentation import Instrumentation, COUNTERS
+
+
+class TestInstrumentation(TestCase):
+
+    def setUp(self) -> None:
+        rng = np.random.default_rng(5)
+        self.df = pd.DataFrame({'lat': rng.uniform(36, 60, 20), 'long': rng.uniform(-10, 30, 20)},
+                               index=pd.Index([f'c{i}' for i in range(20)], name='city'))
+
+    def test_phases(self):
+        stats = Instrumentation(memory=True)
+        with stats.phase('outer'):
+            stats.count(comparisons=2)
+            with stats.phase('inner'):
+                stats.count(distance_evaluations=3, relaxations=1)
+                block = np.ones(1 << 20)
+            del block
+        self.assertEqual(stats.operations, 6)
+        self.assertEqual(stats.phases['inner']['distance_evaluations'], 3)
+        self.assertEqual(stats.phases['outer']['comparisons'], 2)
+        self.assertEqual(stats.phases['outer']['distance_evaluations'], 3)
+        # the inner peak counts in the outer one
+        self.assertGreaterEqual(stats.phases['inner']['peak_memory'], 8 << 20)
+        self.assertGreaterEqual(stats.phases['outer']['peak_memory'], 8 << 20)
+        self.assertAlmostEqual(stats.wall_time, stats.phases['outer']['wall_time'])
+        self.assertEqual(stats.as_dict()['memory'], 'traced')
+
+    def test_counts(self):
+        matrix = np.random.default_rng(1).uniform(1, 2, (10, 10))
+        stats = Instrumentation()
+        nearest_neighbour_tour(matrix, 0, stats)
+        self.assertEqual(stats.counters['distance_evaluations'], 10 * 9)
+        stats = Instrumentation()
+        dense_prim(matrix, stats)
+        self.assertEqual(stats.counters['distance_evaluations'], 10 * 9)
+        self.assertGreaterEqual(stats.counters['relaxations'], 9)
+
+    def test_solvers(self):
+        for solver in (NearestNeighbour(self.df, 'c0', local_search=True),
+                       ChristAlgorithm(self.df, local_search=True),
+                       ConcordAlgorithm(self.df, time_limit=1)):
+            stats = solver.stats
+            self.assertEqual(solver.complexity, stats['operations'])
+            self.assertGreater(stats['counters']['distance_evaluations'], 0)
+            self.assertGreater(stats['peak_memory'], 0)
+            self.assertEqual(set(COUNTERS) | {'wall_time', 'cpu_time'},
+                             set(stats['phases'][next(iter(stats['phases']))]))
@@ -0,0 +1,50 @@
+from unittest import TestCase
+from pathlib import Path
+import time
+from jobs import JobManager, QueueFull, solve_selection, DONE, CANCELLED, TIMEOUT, FAILED, FINISHED
+from catalogue import load_catalogue
+
+
+def wait(manager, job_id, limit=30):
+    deadline = time.time() + limit
+    while manager.poll(job_id)['state'] not in FINISHED and time.time() < deadline:
+        time.sleep(0.05)
+    return manager.poll(job_id)['state']
+
+
+class TestJobs(TestCase):
+
+    def setUp(self) -> None:
+        ROOT_PATH = str(Path(__file__).parent.parent)
+        self.df = load_catalogue(ROOT_PATH + '/assets/gps_cities.xlsx', cache_dir=None).iloc[:6]
+        self.manager = JobManager(max_workers=1, max_pending=1, timeout=10)
+
+    def tearDown(self) -> None:
+        self.manager.shutdown()
+
+    def test_solve(self):
+        job_id = self.manager.submit(solve_selection, 'NN', self.df)
+        self.assertEqual(wait(self.manager, job_id), DONE)
+        result = self.manager.result(job_id)
+        self.assertGreater(result['distance'], 0)
+        self.assertEqual(len(result['path']), len(result['nodes']))
+
+    def test_failure(self):
+        job_id = self.manager.submit(solve_selection, 'XX', self.df)
+        self.assertEqual(wait(self.manager, job_id), FAILED)
+        self.assertIn('ValueError', self.manager.poll(job_id)['error'])
+
+    def test_queue_and_cancel(self):
+        running = self.manager.submit(time.sleep, 30)
+        pending = self.manager.submit(time.sleep, 30)
+        with self.assertRaises(QueueFull):
+            self.manager.submit(time.sleep, 30)
+        self.assertEqual(self.manager.queue_depth, 1)
+        self.assertTrue(self.manager.cancel(running))
+        self.assertEqual(self.manager.poll(running)['state'], CANCELLED)
+        self.assertTrue(self.manager.cancel(pending))
+        self.assertFalse(self.manager.cancel(pending))
+
+    def test_timeout(self):
+        job_id = self.manager.submit(time.sleep, 30, timeout=0.2)
+        self.assertEqual(wait(self.manager, job_id), TIMEOUT)
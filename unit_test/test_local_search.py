@@ -0,0 +1,52 @@
+from unittest import TestCase
+from pathlib import Path
+import numpy as np
+from algorithm.algorithm import NearestNeighbour, nearest_neighbour_tour
+from algorithm.candidates import candidate_graph
+from algorithm.distances import distance_matrix
+from algorithm.local_search import LocalSearch
+from catalogue import load_catalogue
+
+
+class TestLocalSearch(TestCase):
+
+    def setUp(self) -> None:
+        rng = np.random.default_rng(3)
+        self.lat, self.long = rng.uniform(36, 60, 200), rng.uniform(-10, 30, 200)
+        self.matrix = distance_matrix(self.lat, self.long)
+        self.tour = nearest_neighbour_tour(self.matrix, 0)
+
+    def length(self, tour):
+        return self.matrix[tour[:-1], tour[1:]].sum()
+
+    def test_improves(self):
+        lengths = []
+        tour = LocalSearch().run(self.tour, self.matrix,
+                                 on_move=lambda t, nodes: lengths.append(self.length(np.append(t, t[0]))))
+        self.assertEqual(tour[0], 0)
+        self.assertEqual(tour[-1], 0)
+        self.assertEqual(sorted(tour[:-1]), list(range(200)))
+        self.assertLess(self.length(tour), self.length(self.tour))
+        self.assertTrue(np.all(np.diff([self.length(self.tour)] + lengths) < 0))
+        self.assertAlmostEqual(lengths[-1], self.length(tour))
+
+    def test_budget(self):
+        moves = []
+        LocalSearch(max_moves=5).run(self.tour, self.matrix, on_move=lambda t, nodes: moves.append(nodes))
+        self.assertEqual(len(moves), 5)
+
+    def test_sparse(self):
+        graph = candidate_graph(self.lat, self.long, k=8)
+        tour = LocalSearch().run(self.tour, candidates=graph)
+        self.assertEqual(sorted(tour[:-1]), list(range(200)))
+        self.assertLess(self.length(tour), self.length(self.tour))
+
+    def test_solver_frames(self):
+        ROOT_PATH = str(Path(__file__).parent.parent)
+        df = load_catalogue(ROOT_PATH + '/assets/gps_cities.xlsx', cache_dir=None)
+        plain = NearestNeighbour(df, 'Berlin')
+        improved = NearestNeighbour(df, 'Berlin', local_search=True)
+        self.assertLess(improved.distance, plain.distance)
+        self.assertGreater(len(improved.path_sequence), len(plain.path_sequence))
+        self.assertEqual(improved.path_sequence[len(improved.path_sequence) - 1], improved.path)
+        self.assertEqual(len(improved.path_sequence), len(improved.nodes_sequence))
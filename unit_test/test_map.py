@@ -0,0 +1,61 @@
+from unittest import TestCase
+from pathlib import Path
+from algorithm.algorithm import NearestNeighbour
+from plotly_objects import BaseMap, PATH_TRACE, NODES_TRACE
+from catalogue import load_catalogue
+
+
+def extend(figure, delta):
+    """
+    Applies the extendData value like dcc.Graph does
+    """
+    update, traces, max_points = delta
+    for i, trace in enumerate(traces):
+        for key in ('lat', 'lon'):
+            values = list(figure.data[trace][key]) + list(update[key][i])
+            figure.data[trace][key] = values[len(values) - max_points[i]:]
+
+
+class TestBaseMap(TestCase):
+
+    def setUp(self) -> None:
+        ROOT_PATH = str(Path(__file__).parent.parent)
+        self.df = load_catalogue(ROOT_PATH + '/assets/gps_cities.xlsx', cache_dir=None)
+        self.map = BaseMap(cities=self.df)
+
+    def test_fixed_traces(self):
+        nn = NearestNeighbour(self.df.iloc[:8], self.df.index[0])
+        for i in range(len(nn.path_sequence)):
+            figure = self.map.get_map(nn.path_sequence[i], None, nn.nodes_sequence[i])
+            self.assertEqual(len(figure.data), NODES_TRACE + 1)
+            self.assertEqual(len(figure.data[PATH_TRACE].lat), 3 * (len(nn.path_sequence[i]) - 1))
+
+    def test_delta(self):
+        nn = NearestNeighbour(self.df.iloc[:8], self.df.index[0])
+        frames = [(nn.path_sequence[i], [], nn.nodes_sequence[i]) for i in range(len(nn.path_sequence))]
+        figure = self.map.get_map(*frames[0])
+        for previous, current in zip(frames[:-1], frames[1:]):
+            delta = self.map.frame_delta(previous, current)
+            self.assertEqual(len(delta[0]['lat'][PATH_TRACE]), 3)
+            extend(figure, delta)
+            expected = BaseMap(cities=self.df).get_map(*current)
+            for trace in delta[1]:
+                self.assertEqual(list(figure.data[trace].lat), list(expected.data[trace].lat))
+                self.assertEqual(list(figure.data[trace].lon), list(expected.data[trace].lon))
+
+    def test_removed_edges(self):
+        cities = list(self.df.index[:4])
+        self.assertIsNone(self.map.frame_delta((cities, [], []), (cities[::-1], [], [])))
+
+    def test_pack_frames(self):
+        nn = NearestNeighbour(self.df.iloc[:8], self.df.index[0], local_search=True)
+        second = {k: [] for k in nn.path_sequence}
+        packed = self.map.pack_frames(nn.path_sequence, second, nn.nodes_sequence)
+        self.assertEqual(len(packed['frames']), len(nn.path_sequence))
+        self.assertEqual(len(packed['lat']), 8)
+        self.assertEqual(sorted(packed['lat']), sorted(self.df.lat.iloc[:8]))
+        for step, (path, second_path, nodes) in enumerate(packed['frames']):
+            self.assertEqual(len(path), 2 * (len(nn.path_sequence[step]) - 1))
+            self.assertEqual(second_path, [])
+            self.assertEqual([packed['lat'][i] for i in nodes],
+                             [self.df.at[city, 'lat'] for city in nn.nodes_sequence[step]])
@@ -0,0 +1,34 @@
+from unittest import TestCase
+import flask
+import metrics
+
+
+class TestMetrics(TestCase):
+
+    def setUp(self) -> None:
+        self.server = flask.Flask(__name__)
+        metrics.register(self.server)
+
+        @self.server.route('/_dash-update-component', methods=['POST'])
+        def update():
+            return flask.jsonify({'response': 'x' * 1000})
+
+        self.client = self.server.test_client()
+
+    def test_size_class(self):
+        self.assertEqual(metrics.size_class(3), '<=10')
+        self.assertEqual(metrics.size_class(200), '<=200')
+        self.assertEqual(metrics.size_class(10 ** 5), '>5000')
+
+    def test_endpoint(self):
+        metrics.observe_solve('NN', 24, 0.2)
+        metrics.cache_lookup('test')(True)
+        metrics.observe_jobs(3, 1)
+        self.client.post('/_dash-update-component', json={'output': '..main-graph.figure...session.data..'})
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        text = response.get_data(as_text=True)
+        self.assertIn('graphs2_solve_seconds_count{algorithm="NN",size="<=50"}', text)
+        self.assertIn('graphs2_cache_lookups_total{cache="test",result="hit"}', text)
+        self.assertIn('graphs2_solver_queue_depth 3.0', text)
+        self.assertIn('graphs2_callback_payload_bytes_count{output="main-graph.figure"}', text)
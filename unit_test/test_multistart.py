@@ -0,0 +1,57 @@
+from unittest import TestCase
+import time
+import numpy as np
+from algorithm.distances import distance_matrix
+from algorithm.multistart import multi_start, spread_starts, _worker
+from algorithm.tour import tour_length
+
+
+class TestMultiStart(TestCase):
+
+    def setUp(self) -> None:
+        rng = np.random.default_rng(4)
+        self.n = 40
+        self.matrix = distance_matrix(rng.uniform(36, 60, self.n), rng.uniform(-10, 30, self.n))
+
+    def check(self, result):
+        self.assertEqual(sorted(result.tour[:-1].tolist()), list(range(self.n)))
+        self.assertAlmostEqual(tour_length(self.matrix, result.tour), result.length)
+        done = result.table[result.table.status == 'done']
+        self.assertAlmostEqual(done.length.min(), result.length)
+
+    def test_spread_starts(self):
+        starts = spread_starts(self.matrix, 5)
+        self.assertEqual(len(set(starts.tolist())), 5)
+        self.assertEqual(starts[0], 0)
+        self.assertEqual(len(spread_starts(self.matrix, 100)), self.n)
+
+    def test_single_process(self):
+        result = multi_start(self.matrix, starts=4, seeds=(0, 1), variants=('nn', 'ca+ls', 'random+ls'))
+        self.check(result)
+        self.assertEqual(result.stopped, 'completed')
+        # the deterministic variants run once per start
+        self.assertEqual(len(result.table), 4 * (1 + 1 + 2))
+        with self.assertRaises(ValueError):
+            multi_start(self.matrix, variants=('greedy',))
+
+    def test_pool(self):
+        result = multi_start(self.matrix, starts=[0, 5, 9], variants=('nn+ls', 'random+ls'), workers=2, time_limit=5)
+        self.check(result)
+        self.assertEqual(set(result.table.status), {'done'})
+
+    def test_early_stop(self):
+        result = multi_start(self.matrix, starts=20, variants=('nn',), patience=1)
+        self.assertEqual(result.stopped, 'patience')
+        self.assertIn('cancelled', set(result.table.status))
+        result = multi_start(self.matrix, starts=20, variants=('nn',), workers=2, target=np.inf)
+        self.assertEqual(result.stopped, 'target')
+        self.check(result)
+
+    def test_timeout(self):
+        # a task picked up after the deadline is skipped, not reported as done
+        tour, length, _, _ = _worker('nn+ls', 0, 0, time.time())
+        self.assertIsNone(tour)
+        result = multi_start(self.matrix, starts=4, variants=('nn+ls',), workers=2, time_limit=0)
+        self.assertIsNone(result.tour)
+        self.assertEqual(result.stopped, 'time_limit')
+        self.assertNotIn('done', set(result.table.status))
@@ -0,0 +1,48 @@
+from unittest import TestCase
+from pathlib import Path
+import numpy as np
+from algorithm.algorithm import NearestNeighbour, nearest_neighbour_tour, nearest_neighbour_tours, \
+    best_nearest_neighbour
+from catalogue import load_catalogue
+
+
+class TestNearestNeighbour(TestCase):
+
+    def setUp(self) -> None:
+        ROOT_PATH = str(Path(__file__).parent.parent)
+        DATA_PATH = ROOT_PATH + '/assets/gps_cities.xlsx'
+        self.df = load_catalogue(DATA_PATH, cache_dir=None)
+        self.nn = NearestNeighbour(self.df, 'Berlin')
+        self.matrix = self.nn.oracle.matrix
+
+    def test_path(self):
+        path = self.nn.path
+        self.assertEqual(path[0], 'Berlin')
+        self.assertEqual(path[-1], 'Berlin')
+        self.assertEqual(sorted(path[:-1]), sorted(self.df.index))
+        self.assertAlmostEqual(self.nn.distance, self.nn.oracle.tour_length(path))
+        self.assertEqual(len(self.nn.path_sequence), len(path) - 1)
+        self.assertEqual(len(self.nn.nodes_sequence), len(path) - 1)
+
+    def test_each_step_is_nearest(self):
+        path = self.nn.path
+        for i in range(1, len(path) - 1):
+            self.assertEqual(self.nn.neighbour(path[i - 1], path[:i]), path[i])
+
+    def test_batch(self):
+        tours = nearest_neighbour_tours(self.matrix, np.arange(len(self.matrix)))
+        for start in (0, 5, 11):
+            self.assertTrue(np.array_equal(tours[start], nearest_neighbour_tour(self.matrix, start)))
+        lengths = self.matrix[tours[:, :-1], tours[:, 1:]].sum(axis=1)
+        _, best = best_nearest_neighbour(self.matrix, batch=5)
+        self.assertAlmostEqual(best, lengths.min())
+        self.assertAlmostEqual(NearestNeighbour(self.df, None).distance, lengths.min())
+
+    def test_multi_start(self):
+        nn = NearestNeighbour(self.df, 'Berlin', oracle=self.nn.oracle, starts=4, time_limit=5)
+        path = nn.path
+        self.assertEqual(path[0], 'Berlin')
+        self.assertEqual(sorted(path[:-1]), sorted(self.df.index))
+        # the improved tour from the same start is among the runs
+        self.assertLessEqual(nn.distance, self.nn.distance + 1e-9)
+        self.assertEqual(len(nn.runs.table), 4)
@@ -0,0 +1,67 @@
+from unittest import TestCase
+from pathlib import Path
+import os
+import tempfile
+import time
+from jobs import JobManager, solve_into_store, stats_key, DONE, FAILED
+from sessions import SessionStore, new_session
+from catalogue import load_catalogue
+
+
+class TestSessionStore(TestCase):
+
+    def setUp(self) -> None:
+        self.folder = tempfile.TemporaryDirectory()
+        self.store = SessionStore(os.path.join(self.folder.name, 'store.sqlite'))
+
+    def tearDown(self) -> None:
+        self.folder.cleanup()
+
+    def test_values(self):
+        self.store.set('a', {'path': [1, 2]})
+        self.assertEqual(self.store.get('a'), {'path': [1, 2]})
+        self.store.set('b', 1, ttl=-1)
+        self.assertIsNone(self.store.get('b'))
+        self.store.delete('a')
+        self.assertEqual(self.store.get('a', 0), 0)
+
+    def test_cached(self):
+        self.store.set('r', [1])
+        self.assertIs(self.store.get_cached('r'), self.store.get_cached('r'))
+        self.store.delete('r')
+        self.assertIsNone(self.store.get_cached('r'))
+
+    def test_shared_between_processes(self):
+        ROOT_PATH = str(Path(__file__).parent.parent)
+        df = load_catalogue(ROOT_PATH + '/assets/gps_cities.xlsx', cache_dir=None).iloc[:6]
+        manager = JobManager(poll_interval=0.05)
+        try:
+            manager.submit(solve_into_store, self.store, 'ok', 't1', 'NN', df)
+            manager.submit(solve_into_store, self.store, 'bad', 't2', 'XX', df)
+            deadline = time.time() + 30
+            while (self.store.get('ok') is None or self.store.get('bad') is None) and time.time() < deadline:
+                time.sleep(0.05)
+        finally:
+            manager.shutdown()
+        self.assertEqual(self.store.get('ok')['state'], DONE)
+        self.assertEqual(self.store.get('ok')['token'], 't1')
+        self.assertGreater(self.store.get('ok')['result']['distance'], 0)
+        self.assertEqual(self.store.get('bad')['state'], FAILED)
+
+    def test_stats_write_failure(self):
+        ROOT_PATH = str(Path(__file__).parent.parent)
+        df = load_catalogue(ROOT_PATH + '/assets/gps_cities.xlsx', cache_dir=None).iloc[:6]
+        store = self.store
+
+        class FailingStats(SessionStore):
+            def set(self, key, value, ttl=None):
+                if key == stats_key('NN'):
+                    raise OSError('disk full')
+                store.set(key, value, ttl)
+
+        with self.assertLogs('jobs', 'ERROR'):
+            solve_into_store(FailingStats(), 'ok', 't1', 'NN', df)
+        self.assertEqual(self.store.get('ok')['state'], DONE)
+
+    def test_new_session(self):
+        self.assertNotEqual(new_session()['sid'], new_session()['sid'])
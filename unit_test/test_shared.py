@@ -0,0 +1,78 @@
+from unittest import TestCase
+import pickle
+import numpy as np
+from algorithm.distances import distance_matrix
+from algorithm.exact import dense_prim, solve
+from algorithm.local_search import LocalSearch, neighbour_lists
+from algorithm.multistart import multi_start
+from algorithm.oracle import DistanceOracle
+from algorithm.shared import PackedMatrix, SharedMatrix, pack
+
+
+class Denseless(PackedMatrix):
+    # fails on any hidden dense copy
+    def __array__(self, dtype=None, copy=None):
+        raise AssertionError("The packed matrix was unpacked")
+
+
+class TestSharedMatrix(TestCase):
+
+    def setUp(self) -> None:
+        rng = np.random.default_rng(6)
+        self.n = 30
+        self.matrix = distance_matrix(rng.uniform(36, 60, self.n), rng.uniform(-10, 30, self.n))
+
+    def test_packed(self):
+        packed = PackedMatrix(pack(self.matrix), self.n)
+        self.assertEqual(packed.nbytes, self.n * (self.n - 1) // 2 * 8)
+        np.testing.assert_array_equal(np.asarray(packed), self.matrix)
+        np.testing.assert_array_equal(packed[7], self.matrix[7])
+        self.assertEqual(packed[3, 3], 0)
+        self.assertEqual(packed[9, 2], self.matrix[9, 2])
+        ids = np.array([4, 0, 29, 4])
+        np.testing.assert_array_equal(packed[np.ix_(ids, ids)], self.matrix[np.ix_(ids, ids)])
+        self.assertEqual(len(PackedMatrix(pack(np.zeros((1, 1))), 1)[0]), 1)
+
+    def test_packed_access(self):
+        packed = Denseless(pack(self.matrix), self.n)
+        self.assertEqual(packed.item(4, 17), self.matrix[4, 17])
+        np.testing.assert_array_equal(neighbour_lists(packed, 5), neighbour_lists(self.matrix, 5))
+        np.testing.assert_array_equal(dense_prim(packed)[0], dense_prim(self.matrix)[0])
+        tour = np.random.default_rng(1).permutation(self.n)
+        np.testing.assert_array_equal(LocalSearch().run(tour, packed), LocalSearch().run(tour, self.matrix))
+        with self.assertRaises(TypeError):
+            solve(packed)
+        solution = solve(self.matrix.astype(np.float32), time_limit=0.2, patience=20)
+        self.assertEqual(sorted(solution.tour[:-1].tolist()), list(range(self.n)))
+
+    def test_oracle(self):
+        names = [f'c{i}' for i in range(self.n)]
+        dense = DistanceOracle(names, self.matrix)
+        packed = DistanceOracle(names, PackedMatrix(pack(self.matrix, dtype=np.float32), self.n))
+        self.assertIsInstance(packed.matrix, PackedMatrix)
+        subset = packed.subset(['c5', 'c1', 'c20'])
+        self.assertEqual(subset.matrix.dtype, np.float64)
+        np.testing.assert_allclose(subset.matrix, dense.subset(['c5', 'c1', 'c20']).matrix, rtol=1e-6)
+        self.assertAlmostEqual(packed.tour_length(names, closed=True), dense.tour_length(names, closed=True), 1)
+
+    def test_shared(self):
+        with SharedMatrix.create(self.matrix, storage='packed32') as shared:
+            self.assertEqual(shared.nbytes, self.n * (self.n - 1) // 2 * 4)
+            attached = pickle.loads(pickle.dumps(shared))
+            self.assertFalse(attached.owner)
+            np.testing.assert_allclose(attached.matrix[np.arange(self.n)[:, None], np.arange(self.n)], self.matrix,
+                                       rtol=1e-6)
+            attached.close()
+        with self.assertRaises(ValueError):
+            SharedMatrix.create(self.matrix, storage='float16')
+
+    def test_pool(self):
+        with SharedMatrix.create(self.matrix) as shared:
+            result = multi_start(shared, starts=3, variants=('nn+ls',), workers=2, time_limit=5)
+            self.assertAlmostEqual(result.length, multi_start(self.matrix, starts=3, variants=('nn+ls',)).length)
+        # a packed matrix is shared packed
+        packed = multi_start(PackedMatrix(pack(self.matrix), self.n), starts=3, variants=('nn+ls',), workers=2,
+                             time_limit=5)
+        self.assertAlmostEqual(packed.length, result.length)
+        solution = solve(self.matrix, time_limit=0.5, workers=2, patience=50)
+        self.assertEqual(sorted(solution.tour[:-1].tolist()), list(range(self.n)))
@@ -0,0 +1,50 @@
+from unittest import TestCase
+import os
+import tempfile
+import numpy as np
+from algorithm.algorithm import nearest_neighbour_tour
+from algorithm.distances import distance_matrix
+from algorithm.shared import PackedMatrix
+from algorithm.tiles import compute_matrix, open_matrix, tile_bounds
+
+
+class TestTiles(TestCase):
+
+    def setUp(self) -> None:
+        rng = np.random.default_rng(7)
+        self.lat, self.long = rng.uniform(36, 60, 70), rng.uniform(-10, 30, 70)
+        self.matrix = distance_matrix(self.lat, self.long)
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.folder.cleanup()
+
+    def test_tile_bounds(self):
+        bounds = tile_bounds(70, 32)
+        self.assertEqual(len(bounds), 6)
+        self.assertEqual(bounds[-1], (64, 70, 64, 70))
+        covered = np.zeros((70, 70), dtype=int)
+        for r0, r1, c0, c1 in bounds:
+            covered[r0:r1, c0:c1] += 1
+            if r0 != c0:
+                covered[c0:c1, r0:r1] += 1
+        self.assertTrue((covered == 1).all())
+
+    def test_dense(self):
+        progress = []
+        path = os.path.join(self.folder.name, 'dense.npy')
+        matrix = compute_matrix(self.lat, self.long, path, tile=32, on_progress=lambda *args: progress.append(args))
+        self.assertIsInstance(matrix, np.memmap)
+        np.testing.assert_array_equal(matrix, self.matrix)
+        self.assertEqual(progress, [(i, 6) for i in range(1, 7)])
+        with self.assertRaises(ValueError):
+            open_matrix(path, 71)
+
+    def test_packed_pool(self):
+        path = os.path.join(self.folder.name, 'packed.npy')
+        matrix = compute_matrix(self.lat, self.long, path, storage='packed32', tile=16, workers=2)
+        self.assertIsInstance(matrix, PackedMatrix)
+        np.testing.assert_allclose(np.asarray(matrix), self.matrix, rtol=1e-6)
+        # the construction reads the rows it needs only
+        np.testing.assert_array_equal(nearest_neighbour_tour(open_matrix(path, 70), 3),
+                                      nearest_neighbour_tour(self.matrix.astype(np.float32), 3))
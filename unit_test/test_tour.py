@@ -0,0 +1,43 @@
+from unittest import TestCase
+import numpy as np
+from algorithm.distances import distance_matrix
+from algorithm.tour import TOUR_DTYPE, as_tour, close, tour_length, tour_lengths, two_opt_delta, apply_two_opt, \
+    or_opt_delta, apply_or_opt
+
+
+class TestTour(TestCase):
+
+    def setUp(self) -> None:
+        rng = np.random.default_rng(3)
+        self.matrix = distance_matrix(rng.uniform(36, 60, 30), rng.uniform(-10, 30, 30))
+        self.tour = as_tour(rng.permutation(30))
+
+    def test_length(self):
+        expected = sum(self.matrix[self.tour[i], self.tour[(i + 1) % 30]] for i in range(30))
+        self.assertEqual(self.tour.dtype, TOUR_DTYPE)
+        self.assertAlmostEqual(tour_length(self.matrix, self.tour), expected)
+        self.assertAlmostEqual(tour_length(self.matrix, close(self.tour)), expected)
+        tours = np.array([np.roll(self.tour, shift) for shift in range(5)])
+        self.assertTrue(np.allclose(tour_lengths(self.matrix, tours), expected))
+        self.assertTrue(np.allclose(tour_lengths(self.matrix, np.column_stack((tours, tours[:, 0])), batch=2),
+                                    expected))
+
+    def test_two_opt_delta(self):
+        base = tour_length(self.matrix, self.tour)
+        i, j = np.triu_indices(30)
+        deltas = two_opt_delta(self.matrix, self.tour, i, j)
+        for k in range(0, len(i), 37):
+            moved = apply_two_opt(self.tour, i[k], j[k])
+            self.assertAlmostEqual(deltas[k], tour_length(self.matrix, moved) - base)
+        # a segment over the tour end reverses the same cycle as the rest of the tour
+        rest = np.flatnonzero((i == 4) & (j == 24))[0]
+        self.assertAlmostEqual(two_opt_delta(self.matrix, self.tour, 25, 3), deltas[rest])
+
+    def test_or_opt_delta(self):
+        base = tour_length(self.matrix, self.tour)
+        for i, length, k in ((3, 1, 10), (5, 3, 20), (28, 2, 4), (10, 3, 1)):
+            for reverse in (False, True):
+                moved = apply_or_opt(self.tour, i, length, k, reverse)
+                self.assertEqual(sorted(moved.tolist()), list(range(30)))
+                self.assertAlmostEqual(or_opt_delta(self.matrix, self.tour, i, length, k, reverse),
+                                       tour_length(self.matrix, moved) - base)